@@ -0,0 +1,203 @@
+import os
+import json
+import base64
+import sqlite3
+import threading
+from datetime import datetime
+
+LABELS = ("unsorted", "with_tabs", "without_tabs")
+SORT_COLUMNS = ("file_name", "max_score", "download_date")
+# NULL scores sort as -1 so the keyset comparison stays well defined; indexed as written here
+SORT_EXPRESSIONS = {"file_name": "file_name", "max_score": "COALESCE(max_score, -1)", "download_date": "download_date"}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return [last_value, last_name] from a cursor; raises ValueError for anything encode_cursor did not make."""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if (not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], str)
+            or not isinstance(values[0], (str, int, float, type(None)))):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+class Catalog:
+    """
+    Index of every image file the app serves, kept up to date as files land:
+    - The downloader adds images as "unsorted"; the sorter and re-classifier set their label and score.
+    - Each image's content-hashed thumbnail name is kept alongside it.
+    - Pages are read with keyset (cursor) pagination on indexed columns, never a directory scan.
+    - A version number bumps on every write so unchanged pages can be answered with 304.
+    """
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS catalog (
+                   file_name TEXT PRIMARY KEY,
+                   label TEXT,
+                   max_score REAL,
+                   download_date TEXT,
+                   updated TEXT,
+                   thumbnail TEXT
+               )"""
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(catalog)")]
+        if "thumbnail" not in columns:
+            self.conn.execute("ALTER TABLE catalog ADD COLUMN thumbnail TEXT")
+        for column in SORT_COLUMNS[1:]:
+            # Same expression and tie-breaker as page() sorts by, so a page is a plain index range scan
+            self.conn.execute(f"DROP INDEX IF EXISTS idx_catalog_{column}")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_catalog_{column}_key "
+                              f"ON catalog (label, {SORT_EXPRESSIONS[column]}, file_name)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute("INSERT OR IGNORE INTO catalog_meta VALUES ('version', 0)")
+        self.conn.commit()
+
+    def _bump(self):
+        self.conn.execute("UPDATE catalog_meta SET value = value + 1 WHERE key = 'version'")
+
+    def version(self):
+        with self.lock:
+            return self.conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()[0]
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+
+    def get(self, file_name):
+        """Return (label, max_score, thumbnail) for an image, or None if it is not indexed."""
+        with self.lock:
+            row = self.conn.execute("SELECT label, max_score, thumbnail FROM catalog WHERE file_name = ?",
+                                    (file_name,)).fetchone()
+        return tuple(row) if row else None
+
+    def add(self, file_name, label="unsorted", max_score=None, download_date=None, thumbnail=None):
+        """Add or replace an image; download_date defaults to now. An existing thumbnail is kept unless one is given."""
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO catalog (file_name, label, max_score, download_date, updated, thumbnail) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (file_name) DO UPDATE SET label = excluded.label, "
+                "max_score = excluded.max_score, download_date = excluded.download_date, "
+                "updated = excluded.updated, thumbnail = COALESCE(excluded.thumbnail, thumbnail)",
+                (file_name, label, max_score, download_date or now, now, thumbnail),
+            )
+            self._bump()
+            self.conn.commit()
+
+    def set_label(self, file_name, label, max_score=None):
+        """Record where the sorter put an image, adding it if the downloader never did."""
+        now = datetime.now().isoformat()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE catalog SET label = ?, max_score = COALESCE(?, max_score), updated = ? WHERE file_name = ?",
+                (label, max_score, now, file_name),
+            )
+            if cursor.rowcount == 0:
+                self.conn.execute("INSERT INTO catalog (file_name, label, max_score, download_date, updated) "
+                                  "VALUES (?, ?, ?, ?, ?)", (file_name, label, max_score, now, now))
+            self._bump()
+            self.conn.commit()
+
+    def set_thumbnail(self, file_name, thumbnail):
+        with self.lock:
+            self.conn.execute("UPDATE catalog SET thumbnail = ? WHERE file_name = ?", (thumbnail, file_name))
+            self._bump()
+            self.conn.commit()
+
+    def thumbnail_settings(self):
+        """The thumbnail size/quality the stored thumbnail names were made with, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM catalog_meta WHERE key = 'thumbnail_settings'").fetchone()
+        return row[0] if row else None
+
+    def reset_thumbnails(self, settings):
+        """Forget every thumbnail name (made with other settings) so they are all regenerated."""
+        with self.lock:
+            self.conn.execute("UPDATE catalog SET thumbnail = NULL")
+            self.conn.execute("INSERT OR REPLACE INTO catalog_meta VALUES ('thumbnail_settings', ?)", (settings,))
+            self._bump()
+            self.conn.commit()
+
+    def missing_thumbnails(self, after="", limit=1000):
+        """Return (file_name, label) for images after `after` (by name) that have no thumbnail yet."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT file_name, label FROM catalog WHERE thumbnail IS NULL AND file_name > ? "
+                "ORDER BY file_name LIMIT ?", (after, limit)
+            ).fetchall()
+
+    def sync_folder(self, folder, label):
+        """One-time backfill of files that landed before the catalog existed."""
+        if not os.path.isdir(folder):
+            return 0
+        rows = []
+        for file_name in os.listdir(folder):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                mtime = datetime.fromtimestamp(os.path.getmtime(os.path.join(folder, file_name))).isoformat()
+                rows.append((file_name, label, None, mtime, mtime))
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO catalog (file_name, label, max_score, download_date, "
+                                  "updated) VALUES (?, ?, ?, ?, ?)", rows)
+            self._bump()
+            self.conn.commit()
+        return len(rows)
+
+    def page(self, label="with_tabs", min_score=None, max_score=None, since=None, until=None,
+             sort="file_name", order="asc", limit=100, cursor=None):
+        """
+        Return (rows, next_cursor) for one page of the catalog.
+        Filters: label ("all" for every label), score range and download date range (ISO strings).
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {SORT_COLUMNS}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+
+        where, params = [], []
+        if label != "all":
+            where.append("label = ?")
+            params.append(label)
+        if min_score is not None:
+            where.append("max_score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            where.append("max_score <= ?")
+            params.append(max_score)
+        if since:
+            where.append("download_date >= ?")
+            params.append(since)
+        if until:
+            where.append("download_date < ?")
+            params.append(until)
+
+        sort_expr = SORT_EXPRESSIONS[sort]
+        if cursor:
+            last_value, last_name = decode_cursor(cursor)
+            op = ">" if order == "asc" else "<"
+            # The redundant bound on the sort key lets SQLite seek the index instead of scanning from the start
+            where.append(f"{sort_expr} {op}= ? AND ({sort_expr}, file_name) {op} (?, ?)")
+            params.extend([last_value, last_value, last_name])
+
+        query = f"SELECT file_name, label, max_score, download_date, thumbnail, {sort_expr} FROM catalog"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {sort_expr} {order}, file_name {order} LIMIT ?"
+        params.append(limit + 1)
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][5], rows[-1][0]])
+        return [row[:5] for row in rows], next_cursor
@@ -0,0 +1,169 @@
+import hashlib
+import cv2
+import numpy as np
+
+BANDS = 4  # dHash is split into 4 x 16-bit bands for near-neighbor lookup
+
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash of a BGR or grayscale image."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _signed(value):
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _bands(value):
+    return [(value >> (16 * i)) & 0xFFFF for i in range(BANDS)]
+
+
+class DedupIndex:
+    """
+    Content dedup for listing photos, stored in the image log database:
+    - Exact matches by SHA-256 of the downloaded bytes.
+    - Near matches by dHash: any two hashes within BANDS - 1 bits share at least one
+      16-bit band exactly, so indexed band lookups find every candidate without a full scan.
+    - Tables live on the ImageStore's connection and lock, and are committed with its batches:
+      a second connection would wait on the store's open write transaction.
+    - Duplicates are linked to the first copy; the streaming sorter records labels here
+      so copies of an image it classified skip the model.
+    """
+
+    def __init__(self, store, max_distance=BANDS - 1):
+        if not 0 <= max_distance < BANDS:
+            # Beyond BANDS - 1 bits two hashes may share no band, and the band lookup would miss them
+            raise ValueError(f"max_distance must be between 0 and {BANDS - 1}, got {max_distance}")
+        self.max_distance = max_distance
+        self.lock = store.lock
+        self.conn = store.conn
+        with self.lock:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS image_hashes (
+                       image_key TEXT PRIMARY KEY,
+                       sha256 TEXT,
+                       dhash INTEGER,
+                       band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+                       label TEXT,
+                       score REAL
+                   )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_hashes_sha ON image_hashes (sha256)")
+            for band in range(BANDS):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_hashes_band{band} ON image_hashes (band{band})")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS image_links (
+                       image_key TEXT PRIMARY KEY,
+                       canonical_key TEXT,
+                       distance INTEGER
+                   )"""
+            )
+            self.conn.commit()
+
+    def fingerprint(self, content, image=None):
+        """Return (sha256, dhash) for downloaded bytes; pass the decoded image if you already have it."""
+        sha = hashlib.sha256(content).hexdigest()
+        if image is None:
+            image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        return sha, (dhash(image) if image is not None else None)
+
+    def _find(self, sha, image_hash):
+        row = self.conn.execute(
+            "SELECT image_key, label, score FROM image_hashes WHERE sha256 = ? LIMIT 1", (sha,)
+        ).fetchone()
+        if row:
+            return {"image_key": row[0], "label": row[1], "score": row[2], "distance": 0}
+        if image_hash is None:
+            return None
+        candidates = self.conn.execute(
+            "SELECT image_key, dhash, label, score FROM image_hashes "
+            "WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?",
+            _bands(image_hash),
+        ).fetchall()
+
+        best = None
+        for image_key, other_hash, label, score in candidates:
+            distance = hamming(image_hash, _unsigned(other_hash))
+            if distance <= self.max_distance and (best is None or distance < best["distance"]):
+                best = {"image_key": image_key, "label": label, "score": score, "distance": distance}
+        return best
+
+    def _add(self, image_key, sha, image_hash, label=None, score=None):
+        bands = _bands(image_hash) if image_hash is not None else [None] * BANDS
+        stored_hash = _signed(image_hash) if image_hash is not None else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (image_key, sha, stored_hash, *bands, label, score),
+        )
+
+    def _link(self, image_key, canonical_key, distance=0):
+        self.conn.execute("INSERT OR REPLACE INTO image_links VALUES (?, ?, ?)",
+                          (image_key, canonical_key, distance))
+
+    def find(self, sha, image_hash):
+        """
+        Return the closest known image as {"image_key", "label", "score", "distance"}, or None.
+        Exact byte matches have distance 0.
+        """
+        with self.lock:
+            return self._find(sha, image_hash)
+
+    def add(self, image_key, sha, image_hash, label=None, score=None):
+        with self.lock:
+            self._add(image_key, sha, image_hash, label, score)
+
+    def match_or_add(self, image_key, sha, image_hash):
+        """
+        Find the known copy of an image and link to it, or index the image as new, in one step:
+        two download threads with the same photo can never both index it as new.
+        Returns the match (see find) or None.
+        """
+        with self.lock:
+            match = self._find(sha, image_hash)
+            if match:
+                self._link(image_key, match["image_key"], match["distance"])
+            else:
+                self._add(image_key, sha, image_hash)
+        return match
+
+    def link(self, image_key, canonical_key, distance=0):
+        """Record that image_key is a copy of canonical_key."""
+        with self.lock:
+            self._link(image_key, canonical_key, distance)
+
+    def canonical(self, image_key):
+        """Return the key image_key was linked to as a copy, or image_key itself."""
+        with self.lock:
+            link = self.conn.execute(
+                "SELECT canonical_key FROM image_links WHERE image_key = ?", (image_key,)
+            ).fetchone()
+        return link[0] if link else image_key
+
+    def set_label(self, image_key, label, score=None):
+        """Store the classification of an image so its duplicates can reuse it."""
+        with self.lock:
+            self.conn.execute("UPDATE image_hashes SET label = ?, score = ? WHERE image_key = ?",
+                              (label, score, image_key))
+
+    def label_for(self, image_key):
+        """Return (label, score) for an image or the image it was linked to."""
+        with self.lock:
+            link = self.conn.execute(
+                "SELECT canonical_key FROM image_links WHERE image_key = ?", (image_key,)
+            ).fetchone()
+            row = self.conn.execute(
+                "SELECT label, score FROM image_hashes WHERE image_key = ?", (link[0] if link else image_key,)
+            ).fetchone()
+        return tuple(row) if row else (None, None)
@@ -0,0 +1,92 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Global requests-per-second limiter shared by every thread:
+    - Tokens refill continuously at `rate` per second, up to `burst`.
+    - acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return  # Unlimited
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size=10, retries=3, backoff_factor=0.5):
+    """
+    Build a requests.Session that keeps TLS connections open between calls
+    and retries 429/5xx responses with exponential backoff (honouring Retry-After).
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class DownloadStats:
+    """Thread-safe counters for one download run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.url_duplicates = 0
+        self.content_duplicates = 0
+        self.bytes = 0
+        self.bytes_saved = 0
+
+    def record(self, outcome, size=0, saved=0):
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.bytes += size
+            self.bytes_saved += saved
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "downloaded": self.downloaded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "url_duplicates": self.url_duplicates,
+            "content_duplicates": self.content_duplicates,
+            "bytes": self.bytes,
+            "bytes_saved": self.bytes_saved,
+            "seconds": round(elapsed, 3),
+            "images_per_second": round(self.downloaded / elapsed, 2) if elapsed else 0.0,
+            "megabytes_per_second": round(self.bytes / elapsed / 1e6, 3) if elapsed else 0.0,
+        }
@@ -0,0 +1,179 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class ImageStore:
+    """
+    Durable log of downloaded images backed by SQLite in WAL mode:
+    - Keyed on "<item_id>_<image_number>" with O(1) membership checks.
+    - Writes are batched and committed every `commit_every` records (or on commit()).
+    - Secondary indexes allow lookups by image URL and download date.
+    - A legacy image_log.json is imported once and renamed to *.migrated.
+    - Also keeps a per-query high-water mark for incremental crawls.
+    """
+
+    def __init__(self, db_path, legacy_json=None, commit_every=50):
+        self.db_path = Path(db_path)
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS images (
+                   image_key TEXT PRIMARY KEY,
+                   item_id TEXT,
+                   image_number INTEGER,
+                   image_url TEXT,
+                   download_date TEXT
+               )"""
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(images)")]
+        if "file_name" not in columns:
+            # Added with size variants: which file holds the image, and whether it is the full-size original
+            self.conn.execute("ALTER TABLE images ADD COLUMN file_name TEXT")
+            self.conn.execute("ALTER TABLE images ADD COLUMN full_size INTEGER DEFAULT 1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_images_url ON images (image_url)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_images_file ON images (file_name)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_images_date ON images (download_date)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS crawl_state (
+                   query_key TEXT PRIMARY KEY,
+                   last_listing_time TEXT,
+                   last_item_ids TEXT,
+                   updated TEXT
+               )"""
+        )
+        if "resume" not in [row[1] for row in self.conn.execute("PRAGMA table_info(crawl_state)")]:
+            # Added with capped incremental crawls: where an unfinished catch-up left off
+            self.conn.execute("ALTER TABLE crawl_state ADD COLUMN resume TEXT")
+        self.conn.commit()
+
+        if legacy_json:
+            self.migrate_json(Path(legacy_json))
+
+    def migrate_json(self, json_path):
+        """Import the old image_log.json once, then move it aside."""
+        if not json_path.exists():
+            return 0
+        try:
+            with open(json_path, 'r') as f:
+                records = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Could not migrate {json_path}: {e}. Leaving it in place.")
+            return 0
+
+        rows = []
+        for image_key, record in records.items():
+            item_id, _, image_number = image_key.rpartition('_')
+            rows.append((image_key, item_id, int(image_number) if image_number.isdigit() else None,
+                         record.get("image_url"), record.get("download_date")))
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO images (image_key, item_id, image_number, image_url, download_date) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        json_path.rename(json_path.with_name(json_path.name + '.migrated'))
+        print(f"Migrated {len(rows)} entries from {json_path} to {self.db_path}")
+        return len(rows)
+
+    def __contains__(self, image_key):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM images WHERE image_key = ?", (image_key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def get(self, image_key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT image_url, download_date FROM images WHERE image_key = ?", (image_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"image_url": row[0], "download_date": row[1]}
+
+    def add(self, image_key, item_id, image_number, image_url, download_date, file_name=None, full_size=True):
+        """image_url is always the original eBay URL, even when a smaller variant was fetched."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (image_key, item_id, image_number, image_url, download_date, file_name, int(full_size)),
+            )
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.conn.commit()
+                self.pending = 0
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def find_by_url(self, image_url):
+        """Return the image keys already downloaded from this URL."""
+        with self.lock:
+            rows = self.conn.execute("SELECT image_key FROM images WHERE image_url = ?", (image_url,)).fetchall()
+        return [row[0] for row in rows]
+
+    def find_by_file_name(self, file_name):
+        """Return {"image_key", "image_url", "full_size"} for the image saved under this file name, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT image_key, image_url, full_size FROM images WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"image_key": row[0], "image_url": row[1], "full_size": bool(row[2])}
+
+    def file_name_for(self, image_key):
+        """Return the file name an image was saved under, or None if it is not recorded yet."""
+        with self.lock:
+            row = self.conn.execute("SELECT file_name FROM images WHERE image_key = ?", (image_key,)).fetchone()
+        return row[0] if row else None
+
+    def mark_full_size(self, image_key):
+        with self.lock:
+            self.conn.execute("UPDATE images SET full_size = 1 WHERE image_key = ?", (image_key,))
+            self.conn.commit()
+
+    def downloaded_between(self, start, end):
+        """Return (image_key, download_date) for downloads with start <= date < end (ISO strings)."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT image_key, download_date FROM images WHERE download_date >= ? AND download_date < ? "
+                "ORDER BY download_date",
+                (start, end),
+            ).fetchall()
+
+    def get_crawl_state(self, query_key):
+        """Return the high-water mark recorded for a search query (and any resume point), or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_listing_time, last_item_ids, updated, resume FROM crawl_state WHERE query_key = ?",
+                (query_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"last_listing_time": row[0], "last_item_ids": json.loads(row[1] or "[]"), "updated": row[2],
+                "resume": json.loads(row[3]) if row[3] else None}
+
+    def set_crawl_state(self, query_key, last_listing_time, last_item_ids, updated, resume=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, ?)",
+                (query_key, last_listing_time, json.dumps(list(last_item_ids)), updated,
+                 json.dumps(resume) if resume else None),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.commit()
+        self.conn.close()
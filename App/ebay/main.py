@@ -1,29 +1,88 @@
 import os
-import json
+import re
+import sys
+import shutil
 import requests
-import base64
+import cv2
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
-import time
+from downloader import TokenBucket, DownloadStats, create_session
+from image_store import ImageStore
+from token_cache import TokenManager
+from dedup import DedupIndex
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))  # Shared modules in App/
+from catalog import Catalog
+from thumbnails import ThumbnailGenerator
+from metrics import TIMERS
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'yolo'))
+from detection_store import DetectionStore
 
 # Load environment variables
 load_dotenv()
 
+PAGE_SIZE = 200  # Largest page the Browse API search accepts
+MAX_RESULTS = 10000  # The Browse API will not page past this many results
+NEWLY_LISTED = "newlyListed"  # Browse API sort order for incremental crawls
+HIGH_WATER_IDS = 200  # Newest item IDs remembered per query
+BULK_LOOKUP_SIZE = 20  # Most item IDs getItems accepts in one call
+DOWNLOAD_CHUNK = 100  # Listings to collect before handing their images to the downloader
+IMAGE_SIZES = (64, 140, 225, 300, 400, 500, 640, 800, 960, 1200, 1600)  # eBay s-l<N> variants (long edge)
+IMAGE_SIZE_PATTERN = re.compile(r"s-l(\d+)(\.\w+)$")
+
+
+def sized_image_url(image_url, min_edge):
+    """
+    Rewrite an eBay image URL (.../s-l1600.jpg) to the smallest variant whose long edge
+    is at least min_edge. URLs without a size suffix, or min_edge None, are left as they are.
+    """
+    match = IMAGE_SIZE_PATTERN.search(image_url) if min_edge is not None else None
+    if not match:
+        return image_url
+    size = next((size for size in IMAGE_SIZES if size >= min_edge), IMAGE_SIZES[-1])
+    if size >= int(match.group(1)):
+        return image_url  # Already no bigger than needed
+    return IMAGE_SIZE_PATTERN.sub(rf"s-l{size}\2", image_url)
+
 class EbayBrowseAPI:
-    def __init__(self):
+    def __init__(self, root_dir=None):
         self.app_id = os.getenv('EBAY_APP_ID')
         self.cert_id = os.getenv('EBAY_CERT_ID')
-        self.token = None
+        # Point at a stand-in server (e.g. benchmark/fake_ebay.py) instead of the real API
+        self.api_base = os.getenv('EBAY_API_BASE', 'https://api.ebay.com').rstrip('/')
+
+        # Shared connection pool and global rate limit for every eBay request
+        self.requests_per_second = float(os.getenv('EBAY_REQUESTS_PER_SECOND', '5'))
+        self.download_workers = int(os.getenv('EBAY_DOWNLOAD_WORKERS', '8'))
+        self.rate_limiter = TokenBucket(self.requests_per_second)
+        self.session = create_session(pool_size=self.download_workers)
         
-        # Get root directory (going up from scripts folder)
-        self.root_dir = Path(__file__).parent.parent
+        # Get root directory (going up from scripts folder) unless given one
+        self.root_dir = Path(root_dir) if root_dir else Path(__file__).parent.parent
         
         # Set paths relative to root
-        self.image_log_file = self.root_dir / 'image_log.json'
+        self.image_log_file = self.root_dir / 'image_log.json'  # Legacy log, migrated on first run
+        self.image_db_file = self.root_dir / 'image_log.db'
         self.images_dir = self.root_dir / 'static' / 'images'
+        # Fetch the smallest variant the detector can use (640 long edge); "original" for full size
+        size_policy = os.getenv('EBAY_IMAGE_SIZE', '640')
+        self.image_min_edge = None if size_policy == 'original' else int(size_policy)
+        self.token_cache_file = self.root_dir / '.ebay_token.json'  # Shared by every process on this machine
+
+        self.tokens = TokenManager(self.app_id, self.cert_id, self.token_cache_file,
+                                   self.session, rate_limiter=self.rate_limiter,
+                                   token_url=f"{self.api_base}/identity/v1/oauth2/token")
         
         self.downloaded_images = self.load_image_log()
+        self.catalog = Catalog(self.root_dir / 'catalog.db')
+        self.thumbnails = ThumbnailGenerator(str(self.images_dir), str(self.root_dir / 'static' / 'thumbs'),
+                                             self.catalog, workers=self.download_workers)
+        # Shares the image log's connection, so dedup writes never wait on its open transaction
+        self.dedup = DedupIndex(self.downloaded_images, max_distance=int(os.getenv('EBAY_DEDUP_DISTANCE', '3')))
         
         # Default search parameters
         self.default_keyword = "beverage can"
@@ -33,49 +92,47 @@ class EbayBrowseAPI:
         self.images_dir.mkdir(parents=True, exist_ok=True)
         
     def load_image_log(self):
-        try:
-            with open(self.image_log_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+        return ImageStore(self.image_db_file, legacy_json=self.image_log_file)
 
     def save_image_log(self):
-        with open(self.image_log_file, 'w') as f:
-            json.dump(self.downloaded_images, f, indent=4)
+        self.downloaded_images.commit()
+
+    @property
+    def token(self):
+        return self.tokens.get_token()
 
     def get_oauth_token(self):
-        url = "https://api.ebay.com/identity/v1/oauth2/token"
-        
-        credentials = base64.b64encode(
-            f"{self.app_id}:{self.cert_id}".encode()).decode()
-        
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Authorization": f"Basic {credentials}"
-        }
-        
-        data = {
-            "grant_type": "client_credentials",
-            "scope": "https://api.ebay.com/oauth/api_scope"
-        }
-        
-        response = requests.post(url, headers=headers, data=data)
-        self.token = response.json().get("access_token")
-        return self.token
+        return self.tokens.get_token(force_refresh=True)
 
-    def search_items(self, keyword=None, category_id=None):
-        if not self.token:
-            self.get_oauth_token()
-            
-        url = "https://api.ebay.com/buy/browse/v1/item_summary/search"
-        
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "X-EBAY-C-MARKETPLACE-ID": "EBAY_US"
-        }
+    def api_get(self, url, params=None, stage="api", count=1):
+        """
+        GET a Browse API endpoint, refreshing the token and retrying once on 401.
+        The call is timed under `stage` (see App/metrics.py), covering `count` items.
+        """
+        with TIMERS.time(stage, count):
+            return self._api_get(url, params)
+
+    def _api_get(self, url, params=None):
+        for attempt in range(2):
+            token = self.token
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "X-EBAY-C-MARKETPLACE-ID": "EBAY_US"
+            }
+            self.rate_limiter.acquire()
+            response = self.session.get(url, headers=headers, params=params, timeout=30)
+            if response.status_code != 401:
+                break
+            print("Access token rejected; refreshing and retrying.")
+            self.tokens.invalidate(token)  # The retry mints a new one, once for every thread that got the 401
+        return response.json()
+
+    def search_items(self, keyword=None, category_id=None, limit=100, offset=0, sort=None):
+        url = f"{self.api_base}/buy/browse/v1/item_summary/search"
         
         params = {
-            "limit": 100,  # Maximum items per request
+            "limit": limit,  # Up to PAGE_SIZE items per request
+            "offset": offset,
             "fieldgroups": "EXTENDED"  # To get additional images
         }
         
@@ -83,50 +140,366 @@ class EbayBrowseAPI:
             params["q"] = keyword
         if category_id:
             params["category_ids"] = category_id
+        if sort:
+            params["sort"] = sort
             
-        response = requests.get(url, headers=headers, params=params)
-        return response.json()
+        return self.api_get(url, params=params, stage="search")
+
+    def iter_items(self, keyword=None, category_id=None, max_items=None, sort=None):
+        """
+        Lazily yield item summaries across every result page:
+        - Follows the `next` link until the Browse API result cap (MAX_RESULTS).
+        - Fetches the next page in the background while the caller works on the current one.
+        - Stops after max_items summaries if given.
+        """
+        limit = MAX_RESULTS if max_items is None else min(max_items, MAX_RESULTS)
+        yielded = 0
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(self.search_items, keyword, category_id,
+                                      min(PAGE_SIZE, limit), 0, sort)
+            while pending is not None:
+                page = pending.result()
+                summaries = page.get('itemSummaries', [])
+                if 'errors' in page and not summaries:
+                    print(f"Search failed: {page['errors']}")
+                    return
+
+                next_url = page.get('next')
+                next_offset = page.get('offset', 0) + page.get('limit', PAGE_SIZE)
+                more = next_url and summaries and next_offset < min(page.get('total', MAX_RESULTS), limit)
+                pending = executor.submit(self.api_get, next_url, None, "search") if more else None
+
+                for item in summaries:
+                    yield item
+                    yielded += 1
+                    if yielded >= limit:
+                        if pending is not None:
+                            pending.cancel()
+                        return
+
+    def iter_new_items(self, keyword=None, category_id=None, max_items=None):
+        """
+        Yield only listings created since the last crawl of this query:
+        - Searches newest first and stops paging at the first already-seen listing.
+        - The high-water mark only advances once a run reaches the listings seen before (or the
+          end of the results), so nothing between the old mark and the new one is ever skipped.
+        - A run cut short by max_items saves a resume point instead: later runs skip what it
+          consumed and work down through the rest of the gap, then the mark moves to its newest listing.
+        - Nothing is saved if the caller abandons the generator, so an interrupted run is
+          picked up again next time.
+        """
+        query_key = f"q={keyword or ''}|category={category_id or ''}"
+        state = self.downloaded_images.get_crawl_state(query_key)
+        last_time = state["last_listing_time"] if state else None
+        last_ids = set(state["last_item_ids"]) if state else set()
+        resume = state["resume"] if state else None
+        resume_ids = set(resume["ids"]) if resume else set()
+
+        newest_time = oldest_time = None
+        newest_ids = []
+        oldest_ids = deque(maxlen=HIGH_WATER_IDS)
+        reached_known = False
+        count = 0
+        # Catching up skips listings, so the cap is then counted here rather than by the search
+        for item in self.iter_items(keyword, category_id, max_items=None if resume else max_items,
+                                    sort=NEWLY_LISTED):
+            if max_items is not None and count >= max_items:
+                break
+            created = item.get('itemCreationDate')
+            if item['itemId'] in last_ids or (last_time and created and created < last_time):
+                reached_known = True
+                break
+            before = resume and resume["before"]
+            if resume and (item['itemId'] in resume_ids or (created and before and created > before)):
+                continue  # Consumed by the capped run, or newer than it: picked up once the gap is closed
+
+            if created:
+                newest_time = max(newest_time or created, created)
+                oldest_time = min(oldest_time or created, created)
+            if len(newest_ids) < HIGH_WATER_IDS:
+                newest_ids.append(item['itemId'])
+            oldest_ids.append(item['itemId'])
+            count += 1
+            yield item
+
+        print(f"{count} new listings since {last_time or 'the first crawl'}.")
+        updated = datetime.now().isoformat()
+        if state is not None and not reached_known and max_items is not None and count >= max_items:
+            # Stopped short of the known listings: keep the mark and remember how far down this run got
+            resume = {
+                "newest": resume["newest"] if resume else newest_time,
+                "newest_ids": resume["newest_ids"] if resume else newest_ids,
+                "before": (oldest_time or resume["before"]) if resume else oldest_time,
+                "ids": list(oldest_ids),
+            }
+            self.downloaded_images.set_crawl_state(query_key, last_time, last_ids, updated, resume)
+            return
+
+        if resume:
+            # The gap is closed: everything up to the capped run's newest listing has been consumed
+            newest_time, newest_ids = resume["newest"], resume["newest_ids"]
+        # Keep the previous IDs too, in case listings share the newest timestamp
+        ids = newest_ids + [item_id for item_id in last_ids if item_id not in newest_ids]
+        self.downloaded_images.set_crawl_state(query_key, newest_time or last_time, ids[:HIGH_WATER_IDS], updated)
 
     def get_item_details(self, item_id):
         """Get detailed item information including all images"""
-        if not self.token:
-            self.get_oauth_token()
-            
-        url = f"https://api.ebay.com/buy/browse/v1/item/{item_id}"
-        
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "X-EBAY-C-MARKETPLACE-ID": "EBAY_US"
+        url = f"{self.api_base}/buy/browse/v1/item/{item_id}"
+        return self.api_get(url, stage="item_details")
+
+    def get_items(self, item_ids):
+        """
+        Look up to BULK_LOOKUP_SIZE items in one call through the Browse API getItems endpoint.
+        If the endpoint is not available to this key, fall back to one get_item_details per ID.
+        Returns (items, calls made).
+        """
+        url = f"{self.api_base}/buy/browse/v1/item/"
+        result = self.api_get(url, params={"item_ids": ",".join(item_ids)}, stage="item_lookup",
+                              count=len(item_ids))
+        if 'items' in result:
+            return result['items'], 1
+
+        print(f"Bulk item lookup unavailable ({result.get('errors', 'no items returned')}); "
+              f"falling back to single lookups.")
+        return [self.get_item_details(item_id) for item_id in item_ids], 1 + len(item_ids)
+
+    def harvest_images(self, items, complete=False):
+        """
+        Build download tasks from search summaries, looking up only the items that need it:
+        - Summaries already carry `image` and usually `additionalImages`, so most items cost no extra call.
+        - Items with no image in the summary (or, with complete=True, no additionalImages)
+          are fetched in bulk, BULK_LOOKUP_SIZE IDs per call, on the worker pool.
+        Returns (tasks, stats) where stats counts the API calls made and saved.
+        """
+        tasks = []
+        lookups = []
+        for item in items:
+            if 'image' not in item or (complete and 'additionalImages' not in item):
+                lookups.append(item['itemId'])
+            else:
+                tasks.extend(item_image_tasks(item, item['itemId']))
+
+        batches = [lookups[i:i + BULK_LOOKUP_SIZE] for i in range(0, len(lookups), BULK_LOOKUP_SIZE)]
+        calls = 0
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            for details, batch_calls in executor.map(self.get_items, batches):
+                calls += batch_calls
+                for item_details in details:
+                    if 'itemId' in item_details:
+                        tasks.extend(item_image_tasks(item_details, item_details['itemId']))
+
+        stats = {
+            "items": len(items),
+            "summary_only": len(items) - len(lookups),
+            "looked_up": len(lookups),
+            "api_calls": calls,
+            "calls_saved": len(items) - calls,  # Versus one get_item_details per item
         }
-        
-        response = requests.get(url, headers=headers)
-        return response.json()
+        return tasks, stats
+
+    def image_filename(self, item_id, image_number):
+        safe_filename = item_id.replace('|', '_').replace('/', '_')
+        return f"{safe_filename}_{image_number}.jpg"
+
+    def fetch_image(self, image_url):
+        """Fetch an image over the shared session and return its bytes, or None on failure."""
+        self.rate_limiter.acquire()
+        try:
+            with TIMERS.time("download"):
+                response = self.session.get(image_url, timeout=30)
+        except requests.RequestException as e:
+            print(f"Failed to download {image_url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return response.content
+
+    def record_image(self, image_url, item_id, image_number, full_size=True):
+        self.downloaded_images.add(f"{item_id}_{image_number}", item_id, image_number, image_url,
+                                   datetime.now().isoformat(), self.image_filename(item_id, image_number), full_size)
+
+    def fetch_sized_image(self, image_url):
+        """Fetch the size variant chosen by EBAY_IMAGE_SIZE; returns (bytes or None, is_full_size)."""
+        sized_url = sized_image_url(image_url, self.image_min_edge)
+        content = self.fetch_image(sized_url)
+        if content is None and sized_url != image_url:
+            sized_url = image_url  # Variant missing: fall back to the original
+            content = self.fetch_image(image_url)
+        return content, sized_url == image_url
+
+    def fetch_tab_originals(self):
+        """
+        Replace the reduced-size copies of images classified with_tabs by their full-size originals.
+        Their stored detection boxes are rescaled to the original's pixels, so they still line up.
+        Returns how many were upgraded.
+        """
+        with_tabs_dir = self.images_dir / 'with_tabs'
+        store = DetectionStore(self.root_dir / 'detections.db')
+        upgraded = 0
+        cursor = None
+        while True:
+            rows, cursor = self.catalog.page(label='with_tabs', limit=500, cursor=cursor)
+            for file_name, *_ in rows:
+                record = self.downloaded_images.find_by_file_name(file_name)
+                path = with_tabs_dir / file_name
+                if record is None or record["full_size"] or not path.exists():
+                    continue
+                reduced = cv2.imread(str(path))
+                content = self.fetch_image(record["image_url"])
+                original = None if content is None else cv2.imdecode(np.frombuffer(content, np.uint8),
+                                                                     cv2.IMREAD_COLOR)
+                if reduced is None or original is None:
+                    continue
+                # Replace rather than rewrite: hardlinked duplicates keep their reduced copy (and their boxes)
+                tmp_path = path.with_name(f"{file_name}.{os.getpid()}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+                store.rescale(file_name, original.shape[1] / reduced.shape[1], original.shape[0] / reduced.shape[0])
+                self.downloaded_images.mark_full_size(record["image_key"])
+                self.thumbnails.from_image(original, file_name, content)
+                upgraded += 1
+                print(f"Fetched original for {file_name}")
+            if cursor is None:
+                return upgraded
+
+    def duplicate_of_url(self, image_url, image_key):
+        """If this exact URL was already fetched for another listing, link to its original and return that key."""
+        known = self.downloaded_images.find_by_url(image_url)
+        if not known:
+            return None
+        canonical_key = self.dedup.canonical(known[0])
+        self.dedup.link(image_key, canonical_key)
+        return canonical_key
+
+    def dedup_content(self, image_key, content, image=None):
+        """
+        Look the downloaded bytes up by SHA-256 and perceptual hash.
+        Returns the matching known image (now linked to this key), or None after indexing it as new.
+        """
+        sha, image_hash = self.dedup.fingerprint(content, image)
+        return self.dedup.match_or_add(image_key, sha, image_hash)
 
-    def download_image(self, image_url, item_id, image_number=0):
+    def label_for(self, image_key):
+        """
+        Return (label, score) for an image or the one it duplicates, or (None, None) while unsorted.
+        The catalog comes first: every sorter (yolo/main.py, sharded.py, reclassify.py, the streaming
+        pipeline) records its decisions there. Labels the streaming pipeline gave to images it did
+        not keep are only in the dedup index.
+        """
+        file_name = self.downloaded_images.file_name_for(self.dedup.canonical(image_key))
+        entry = self.catalog.get(file_name) if file_name else None
+        if entry and entry[0] != 'unsorted':
+            return entry[0], entry[1]
+        return self.dedup.label_for(image_key)
+
+    def place_duplicate(self, canonical_key, file_name):
+        """
+        Give a duplicate listing photo its own gallery entry without storing the bytes twice:
+        the original's file is hardlinked (copied if links are unsupported) under file_name, in the
+        same folder and with the same label, score and thumbnail.
+        Returns the label, or None if the original has no file (yet), in which case nothing is placed.
+        """
+        canonical_file = self.downloaded_images.file_name_for(canonical_key)
+        entry = self.catalog.get(canonical_file) if canonical_file else None
+        if entry is None:
+            return None
+        label, max_score, thumbnail = entry
+        folder = Path(self.thumbnails.folders[label])
+        source = folder / canonical_file
+        if not source.exists():
+            return None
+        try:
+            os.link(source, folder / file_name)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(source, folder / file_name)
+        self.catalog.add(file_name, label, max_score, thumbnail=thumbnail)
+        return label
+
+    def download_image(self, image_url, item_id, image_number=0, stats=None):
         """Download an image and save it with appropriate naming"""
         image_key = f"{item_id}_{image_number}"
         
         if image_key in self.downloaded_images:
             print(f"Image {image_number} for item {item_id} already downloaded.")
+            if stats:
+                stats.record("skipped")
             return False
             
-        safe_filename = item_id.replace('|', '_').replace('/', '_')
         # Use Path for reliable path joining
-        filename = self.images_dir / f"{safe_filename}_{image_number}.jpg"
-                
-        response = requests.get(image_url)
-        if response.status_code == 200:
+        filename = self.images_dir / self.image_filename(item_id, image_number)
+
+        # A copy of a photo we already have is linked to its file instead of being stored again.
+        # If that file is not there (yet), this listing keeps its own copy.
+        canonical_key = self.duplicate_of_url(image_url, image_key)
+        if canonical_key and self.place_duplicate(canonical_key, filename.name):
+            self.record_image(image_url, item_id, image_number)
+            if stats:
+                stats.record("url_duplicates")
+            return False
+
+        content, full_size = self.fetch_sized_image(image_url)
+        if content is not None:
+            match = self.dedup_content(image_key, content)
+            if match and self.place_duplicate(match["image_key"], filename.name):
+                self.record_image(image_url, item_id, image_number, full_size)
+                if stats:
+                    stats.record("content_duplicates", saved=len(content))
+                return False
+
             with open(filename, 'wb') as f:
-                f.write(response.content)
+                f.write(content)
             
-            self.downloaded_images[image_key] = {
-                "download_date": datetime.now().isoformat(),
-                "image_url": image_url
-            }
-            self.save_image_log()
+            self.record_image(image_url, item_id, image_number, full_size)
+            self.catalog.add(filename.name)
+            if stats:
+                stats.record("downloaded", len(content))
             return True
+        if stats:
+            stats.record("failed")
         return False
 
+    def download_images(self, tasks, stats=None):
+        """
+        Download many images concurrently over the shared session.
+        tasks is a list of (image_url, item_id, image_number); returns throughput stats.
+        Pass the same stats object to several calls to total them up.
+        """
+        stats = stats or DownloadStats()
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            futures = [
+                executor.submit(self.download_image, image_url, item_id, image_number, stats)
+                for image_url, item_id, image_number in tasks
+            ]
+            downloaded = []
+            for future, (_, item_id, image_number) in zip(futures, tasks):
+                try:
+                    if future.result():
+                        downloaded.append((self.image_filename(item_id, image_number), "unsorted"))
+                except Exception as e:
+                    print(f"Download worker failed: {e}")
+                    stats.record("failed")
+        self.save_image_log()
+        # Gallery thumbnails for the new images, made while they are still in the page cache
+        self.thumbnails.generate(downloaded)
+        return stats.summary()
+
+def item_image_tasks(item, item_id):
+    """Return (image_url, item_id, image_number) for the primary and additional images of an item."""
+    tasks = []
+    # Primary image
+    if 'image' in item and 'imageUrl' in item['image']:
+        tasks.append((item['image']['imageUrl'], item_id, 0))
+
+    # Additional images
+    for idx, add_image in enumerate(item.get('additionalImages', []), 1):
+        if 'imageUrl' in add_image:
+            tasks.append((add_image['imageUrl'], item_id, idx))
+    return tasks
+
 def main():
     api = EbayBrowseAPI()
     
@@ -155,41 +528,55 @@ def main():
     if category_id:
         print(f"Category ID: {category_id}")
         
-    results = api.search_items(keyword, category_id)
-    
-    if 'itemSummaries' not in results:
-        print("No items found or API error occurred.")
-        return
-        
-    items = results['itemSummaries']
-    print(f"\nFound {len(items)} items")
-    
-    downloaded_count = 0
+    max_items = input("Maximum number of listings (blank for all): ").strip()
+    max_items = int(max_items) if max_items else None
+    incremental = input("Only fetch listings new since the last crawl? (y/N): ").lower() == 'y'
+
+    stats = DownloadStats()
+    chunk = []
+    item_count = 0
+    calls_made = 0
+    calls_saved = 0
+
+    def flush(chunk):
+        nonlocal calls_made, calls_saved
+        tasks, harvest = api.harvest_images(chunk)
+        calls_made += harvest['api_calls']
+        calls_saved += harvest['calls_saved']
+        api.download_images(tasks, stats)
+
+    items = (api.iter_new_items(keyword, category_id, max_items=max_items) if incremental
+             else api.iter_items(keyword, category_id, max_items=max_items))
     for item in items:
+        item_count += 1
         print(f"\nProcessing item: {item['title'][:50]}...")
-        
-        # Get detailed item information
-        item_details = api.get_item_details(item['itemId'])
-        
-        # Download primary image
-        if 'image' in item_details and 'imageUrl' in item_details['image']:
-            if api.download_image(item_details['image']['imageUrl'], item['itemId'], 0):
-                downloaded_count += 1
-                print("Primary image downloaded successfully")
-        
-        # Download additional images
-        if 'additionalImages' in item_details:
-            for idx, add_image in enumerate(item_details['additionalImages'], 1):
-                if 'imageUrl' in add_image:
-                    if api.download_image(add_image['imageUrl'], item['itemId'], idx):
-                        downloaded_count += 1
-                        print(f"Additional image {idx} downloaded successfully")
-                        time.sleep(0.5)  # Small delay between image downloads
-                
-        time.sleep(1)  # Delay between items
+        chunk.append(item)
+
+        # Download as we go so memory stays flat on large categories
+        if len(chunk) == DOWNLOAD_CHUNK:
+            flush(chunk)
+            chunk = []
+
+    if item_count == 0:
+        print("No items found or API error occurred.")
+        return
+
+    flush(chunk)
+    stats = stats.summary()
                 
-    print(f"\nDownload complete! {downloaded_count} new images downloaded.")
+    print(f"\nProcessed {item_count} items.")
+    print(f"Item lookups: {calls_made} API calls made, {calls_saved} saved by using search summaries.")
+    print(f"Download complete! {stats['downloaded']} new images downloaded.")
+    print(f"Duplicates skipped: {stats['url_duplicates']} by URL, {stats['content_duplicates']} by content "
+          f"({stats['bytes_saved'] / 1e6:.1f} MB not stored or re-classified)")
+    print(f"Skipped: {stats['skipped']}, failed: {stats['failed']}, "
+          f"{stats['images_per_second']} images/sec, {stats['megabytes_per_second']} MB/sec "
+          f"in {stats['seconds']}s")
     print(f"Total images in collection: {len(api.downloaded_images)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--tab-originals" in sys.argv:
+        # Upgrade already sorted with_tabs images to full resolution
+        print(f"Fetched {EbayBrowseAPI().fetch_tab_originals()} full-size originals.")
+    else:
+        main()
\ No newline at end of file
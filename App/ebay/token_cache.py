@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+TOKEN_URL = "https://api.ebay.com/identity/v1/oauth2/token"
+TOKEN_SCOPE = "https://api.ebay.com/oauth/api_scope"
+
+
+class TokenManager:
+    """
+    Client-credentials OAuth token with expiry tracking:
+    - Tokens are refreshed `refresh_margin` seconds before eBay's expires_in runs out.
+    - The token is cached in a JSON file so separate processes reuse it;
+      a file lock makes sure only one of them mints a new one at a time.
+    - A token eBay rejects is passed to invalidate(); however many threads saw the 401,
+      only one new token is minted.
+    """
+
+    def __init__(self, app_id, cert_id, cache_file, session, rate_limiter=None, refresh_margin=300,
+                 token_url=TOKEN_URL):
+        self.app_id = app_id
+        self.token_url = token_url
+        self.cert_id = cert_id
+        self.cache_file = str(cache_file)
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.refresh_margin = refresh_margin
+        # Never hand one app's cached token to another
+        self.client_key = hashlib.sha256(f"{app_id}:{cert_id}".encode()).hexdigest()[:16]
+
+        self.lock = threading.Lock()
+        self.token = None
+        self.expires_at = 0.0
+        self.rejected = None  # Last token invalidated: never reloaded from the cache file
+
+    def _valid(self, expires_at):
+        return time.time() < expires_at - self.refresh_margin
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.cache_file + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if cached.get("client_key") != self.client_key or not self._valid(cached.get("expires_at", 0)):
+            return None
+        return cached
+
+    def _write_cache(self):
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"client_key": self.client_key, "access_token": self.token, "expires_at": self.expires_at}, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.cache_file)  # Atomic, so readers never see half a file
+
+    def _mint(self):
+        credentials = base64.b64encode(f"{self.app_id}:{self.cert_id}".encode()).decode()
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Authorization": f"Basic {credentials}"
+        }
+        data = {
+            "grant_type": "client_credentials",
+            "scope": TOKEN_SCOPE
+        }
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        response = self.session.post(self.token_url, headers=headers, data=data, timeout=30)
+        payload = response.json()
+        if "access_token" not in payload:
+            raise RuntimeError(f"eBay token request failed: {payload}")
+        self.token = payload["access_token"]
+        self.expires_at = time.time() + int(payload.get("expires_in", 7200))
+
+    def get_token(self, force_refresh=False):
+        """Return a valid access token, refreshing it only when needed (or always, with force_refresh)."""
+        with self.lock:
+            if force_refresh and self.token:
+                self._forget(self.token)
+            if self.token and self._valid(self.expires_at):
+                return self.token
+
+            with self._file_lock():
+                cached = self._read_cache()
+                # Another process may have refreshed it while we waited for the lock
+                if cached and cached["access_token"] != self.rejected:
+                    self.token = cached["access_token"]
+                    self.expires_at = cached["expires_at"]
+                    return self.token
+
+                self._mint()
+                self._write_cache()
+                return self.token
+
+    def _forget(self, token):
+        self.rejected = token
+        self.token = None
+        self.expires_at = 0.0
+
+    def invalidate(self, token):
+        """
+        Mark a token eBay rejected so the next get_token() mints a new one. A no-op if the
+        token was already replaced, e.g. by another thread that got the same 401.
+        """
+        with self.lock:
+            if token == self.token:
+                self._forget(token)
@@ -0,0 +1,77 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 10000  # Latest samples kept per stage for percentiles
+
+
+class StageTimers:
+    """
+    Process-wide latency recorder for the fetch -> sort -> serve stages:
+    - Each sample is one call (a search request, one session.run, one file move, ...)
+      covering `count` images, so batched stages still report images/sec.
+    - items_per_busy_sec divides by the summed call time: the rate of one call in flight.
+      items_per_sec divides by the wall-clock span from the first call's start to the last
+      call's end, so stages run on several threads (e.g. download) report real throughput.
+    - Totals cover the whole process lifetime; p50/p99 use the latest WINDOW samples.
+    - Thread-safe and cheap enough to leave on in production (served at /metrics).
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, seconds, count=1):
+        end = time.perf_counter()
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {"calls": 0, "items": 0, "seconds": 0.0, "first": end - seconds,
+                                              "last": end, "samples": deque(maxlen=self.window)}
+            entry["first"] = min(entry["first"], end - seconds)
+            entry["last"] = max(entry["last"], end)
+            entry["calls"] += 1
+            entry["items"] += count
+            entry["seconds"] += seconds
+            entry["samples"].append(seconds)
+
+    @contextmanager
+    def time(self, stage, count=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, count)
+
+    def summary(self):
+        """
+        Per stage: calls, items, summed call seconds, wall-clock seconds, items/sec (wall clock),
+        items per busy second and p50/p99/max latency in ms.
+        """
+        with self.lock:
+            snapshot = {stage: (entry["calls"], entry["items"], entry["seconds"], entry["last"] - entry["first"],
+                                sorted(entry["samples"]))
+                        for stage, entry in self.stages.items()}
+        summary = {}
+        for stage, (calls, items, seconds, wall_seconds, samples) in sorted(snapshot.items()):
+            summary[stage] = {
+                "calls": calls,
+                "items": items,
+                "seconds": round(seconds, 4),
+                "wall_seconds": round(wall_seconds, 4),
+                "items_per_sec": round(items / wall_seconds, 1) if wall_seconds else None,
+                "items_per_busy_sec": round(items / seconds, 1) if seconds else None,
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+            }
+        return summary
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+
+TIMERS = StageTimers()  # Shared by every module in this process
@@ -0,0 +1,184 @@
+import os
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from scripts import APP_DIR, load_script
+
+ebay = load_script('ebay_main', 'ebay/main.py')
+yolo = load_script('yolo_main', 'yolo/main.py')
+
+
+class StreamingSorter:
+    """
+    Fetch -> classify -> save in one pass, without touching disk in between:
+    - Each downloaded image is decoded straight from the response buffer with cv2.imdecode.
+    - The warm session classifies it in memory.
+    - Only tab images are written (to with_tabs), unless without_tabs_folder is given too.
+    - Images are fetched at the size variant set by EBAY_IMAGE_SIZE; with originals_for_tabs
+      the full-size original is fetched for tab images only.
+    - Photos already seen on other listings (same URL, bytes or perceptual hash)
+      reuse the earlier classification instead of running the model again, and are
+      linked to the earlier file under their own name so the listing still shows up.
+    """
+
+    def __init__(self, api, session, with_tabs_folder, without_tabs_folder=None, workers=8,
+                 originals_for_tabs=False):
+        self.api = api
+        self.session = session
+        self.with_tabs_folder = with_tabs_folder
+        self.without_tabs_folder = without_tabs_folder
+        self.workers = workers
+        self.originals_for_tabs = originals_for_tabs
+        self.lock = threading.Lock()
+        self.stats = {
+            "images": 0, "with_tabs": 0, "without_tabs": 0, "skipped": 0, "failed": 0,
+            "url_duplicates": 0, "content_duplicates": 0, "inferences_saved": 0,
+            "bytes_fetched": 0, "bytes_written": 0,
+        }
+        self.latencies = []
+
+        os.makedirs(with_tabs_folder, exist_ok=True)
+        if without_tabs_folder:
+            os.makedirs(without_tabs_folder, exist_ok=True)
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def process_image(self, image_url, item_id, image_number):
+        image_key = f"{item_id}_{image_number}"
+        if image_key in self.api.downloaded_images:
+            self._count("skipped")
+            return
+        start = time.perf_counter()
+
+        # Same URL seen on another listing: reuse its result without fetching
+        file_name = self.api.image_filename(item_id, image_number)
+        known_key = self.api.duplicate_of_url(image_url, image_key)
+        if known_key and self.api.label_for(known_key)[0]:
+            self.api.place_duplicate(known_key, file_name)
+            self.api.record_image(image_url, item_id, image_number)
+            self._count("url_duplicates")
+            self._count("inferences_saved")
+            return
+
+        content, full_size = self.api.fetch_sized_image(image_url)
+        image = None if content is None else cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._count("failed")
+            return
+        self._count("bytes_fetched", len(content))
+
+        match = self.api.dedup_content(image_key, content, image)
+        if match and self.api.label_for(match["image_key"])[0]:
+            self.api.place_duplicate(match["image_key"], file_name)
+            self.api.record_image(image_url, item_id, image_number)
+            self._count("content_duplicates")
+            self._count("inferences_saved")
+            return
+
+        detections = yolo.classify_image(self.session, image)
+        has_tab = len(detections["scores"]) > 0
+        label = "with_tabs" if has_tab else "without_tabs"
+        score = float(detections["scores"].max()) if has_tab else None
+        # Label the copy we matched (if its first sighting was never classified), else this new image
+        self.api.dedup.set_label(match["image_key"] if match else image_key, label, score)
+
+        if has_tab and self.originals_for_tabs and not full_size:
+            original = self.api.fetch_image(image_url)
+            decoded = None if original is None else cv2.imdecode(np.frombuffer(original, np.uint8),
+                                                                 cv2.IMREAD_COLOR)
+            if decoded is None:
+                # Keep the reduced copy we already have rather than save bytes that don't decode
+                print(f"Could not read the original of {file_name}; keeping the reduced image.")
+            else:
+                content, image, full_size = original, decoded, True
+
+        folder = self.with_tabs_folder if has_tab else self.without_tabs_folder
+        if folder:
+            # Write the original bytes; no re-encode needed
+            with open(os.path.join(folder, file_name), 'wb') as f:
+                f.write(content)
+            self.api.catalog.add(file_name, label, score if has_tab else 0.0)
+            self.api.thumbnails.from_image(image, file_name, content)
+            self._count("bytes_written", len(content))
+
+        self.api.record_image(image_url, item_id, image_number, full_size)
+        self._count("images")
+        self._count(label)
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start)
+
+    def process_chunk(self, executor, items):
+        tasks, _ = self.api.harvest_images(items)
+        futures = [executor.submit(self.process_image, *task) for task in tasks]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Pipeline worker failed: {e}")
+                self._count("failed")
+        self.api.save_image_log()
+
+    def run(self, items, chunk_size=ebay.DOWNLOAD_CHUNK):
+        """Classify every image of the given listings; returns run stats."""
+        started = time.perf_counter()
+        chunk = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for item in items:
+                chunk.append(item)
+                if len(chunk) == chunk_size:
+                    self.process_chunk(executor, chunk)
+                    print(f"{self.stats['images']} images classified, {self.stats['with_tabs']} with tabs")
+                    chunk = []
+            if chunk:
+                self.process_chunk(executor, chunk)
+
+        elapsed = time.perf_counter() - started
+        latencies = sorted(self.latencies)
+        summary = dict(self.stats)
+        summary["seconds"] = round(elapsed, 3)
+        summary["images_per_second"] = round(self.stats["images"] / elapsed, 2) if elapsed else 0.0
+        if latencies:
+            summary["p50_latency_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+            summary["max_latency_ms"] = round(latencies[-1] * 1000, 1)
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch eBay listing images and sort them in memory.")
+    parser.add_argument("--keyword", help="Search keyword")
+    parser.add_argument("--category", help="eBay category ID")
+    parser.add_argument("--max-items", type=int, help="Stop after this many listings")
+    parser.add_argument("--new-only", action="store_true", help="Only listings new since the last crawl")
+    parser.add_argument("--keep-negatives", action="store_true", help="Also save images without tabs")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch/classify workers")
+    parser.add_argument("--originals-for-tabs", action="store_true",
+                        help="Fetch full-size originals for tab images (others stay at EBAY_IMAGE_SIZE)")
+    args = parser.parse_args()
+
+    api = ebay.EbayBrowseAPI()
+    keyword = args.keyword
+    category_id = args.category
+    if not keyword and not category_id:
+        keyword, category_id = api.default_keyword, api.default_category
+
+    images_dir = os.path.join(APP_DIR, "static/images")
+    sorter = StreamingSorter(
+        api,
+        yolo.create_session(os.path.join(APP_DIR, "models/best.onnx")),
+        os.path.join(images_dir, "with_tabs"),
+        os.path.join(images_dir, "without_tabs") if args.keep_negatives else None,
+        workers=args.workers,
+        originals_for_tabs=args.originals_for_tabs,
+    )
+    items = (api.iter_new_items(keyword, category_id, max_items=args.max_items) if args.new_only
+             else api.iter_items(keyword, category_id, max_items=args.max_items))
+    summary = sorter.run(items)
+
+    print("\nPipeline complete!")
+    for key, value in summary.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,24 @@
+import os
+import sys
+import importlib.util
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(name, relative_path):
+    """
+    Import one of the App/* scripts (e.g. "yolo/main.py") as a module named `name`
+    without running its __main__ block. Its folder is added to sys.path so it can
+    import its sibling modules.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(APP_DIR, relative_path)
+    script_dir = os.path.dirname(path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
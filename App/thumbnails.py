@@ -0,0 +1,94 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+THUMB_SIZE = 320  # Long edge in pixels
+THUMB_QUALITY = 80
+
+
+class ThumbnailGenerator:
+    """
+    Small WebP derivatives of the served images, named by content hash:
+    - <stem>.<hash>.webp changes whenever the source bytes, size or quality change, so the
+      files can be served with an immutable cache policy.
+    - Batches are generated on a thread pool (OpenCV releases the GIL while resizing/encoding).
+    - Each thumbnail name is recorded in the catalog for /get_images.
+    """
+
+    def __init__(self, images_dir, thumbs_dir, catalog=None, size=THUMB_SIZE, workers=4, quality=THUMB_QUALITY):
+        self.folders = {
+            "unsorted": images_dir,
+            "with_tabs": os.path.join(images_dir, "with_tabs"),
+            "without_tabs": os.path.join(images_dir, "without_tabs"),
+        }
+        self.thumbs_dir = thumbs_dir
+        self.catalog = catalog
+        self.size = size
+        self.quality = quality
+        self.workers = workers
+        os.makedirs(thumbs_dir, exist_ok=True)
+
+    def thumbnail_name(self, file_name, content):
+        digest = hashlib.sha256(content)
+        digest.update(f"|{self.size}|{self.quality}".encode())  # New settings, new URL
+        digest = digest.hexdigest()[:12]
+        return f"{os.path.splitext(file_name)[0]}.{digest}.webp"
+
+    def from_image(self, image, file_name, content):
+        """Write the thumbnail for an already decoded image; returns its file name, or None if it cannot be encoded."""
+        thumb_name = self.thumbnail_name(file_name, content)
+        thumb_path = os.path.join(self.thumbs_dir, thumb_name)
+        if not os.path.exists(thumb_path):
+            h, w = image.shape[:2]
+            scale = min(1.0, self.size / max(h, w))
+            if scale < 1.0:
+                image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+            if not ok:
+                return None
+            # Served as immutable, so it must never be seen half-written: write aside, then rename
+            tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, thumb_path)
+        if self.catalog is not None:
+            self.catalog.set_thumbnail(file_name, thumb_name)
+        return thumb_name
+
+    def from_file(self, file_name, label="unsorted"):
+        path = os.path.join(self.folders[label], file_name)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        image = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return self.from_image(image, file_name, content)
+
+    def generate(self, files):
+        """Generate thumbnails for (file_name, label) pairs in parallel; returns how many were made."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda pair: self.from_file(*pair), files))
+        return sum(1 for result in results if result)
+
+    def backfill(self):
+        """
+        Generate thumbnails for every catalog entry that lacks one; returns how many were made.
+        After a change of size or quality every thumbnail is remade under its new name.
+        """
+        settings = f"{self.size}/{self.quality}"
+        if self.catalog.thumbnail_settings() != settings:
+            self.catalog.reset_thumbnails(settings)
+        made = 0
+        after = ""
+        while True:
+            batch = self.catalog.missing_thumbnails(after)
+            if not batch:
+                return made
+            made += self.generate(batch)
+            after = batch[-1][0]
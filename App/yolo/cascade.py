@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from postprocess import CONFIDENCE_THRESHOLD, DETECTION_FLOOR, decode_detections, filter_detections
+from letterbox import letterbox_into
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+FIRST_PASS_SIZE = 320
+HIGH_BAND = 0.8  # First-pass max score at or above this: with tabs, no second pass
+LOW_BAND = 0.2  # First-pass max score below this: without tabs, no second pass
+FIRST_PASS_SUFFIX = ":first-pass"  # Appended to the model hash of decisions the first pass made
+
+
+class Cascade:
+    """
+    Cheap first pass in front of the full 640x640 model:
+    - The first pass runs either the same model at a lower input size (needs an export
+      with dynamic=True) or a smaller model exported at that size.
+    - Images whose first-pass max score is at or above `high`, or below `low`, are decided there.
+    - Only images in between go through the full model.
+    """
+
+    def __init__(self, session, size=FIRST_PASS_SIZE, high=HIGH_BAND, low=LOW_BAND):
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError("Bands must satisfy 0 <= low <= high <= 1.")
+        input_shape = session.get_inputs()[0].shape
+        if isinstance(input_shape[2], int) and input_shape[2] != size:
+            raise ValueError(f"First-pass model takes {input_shape[2]}x{input_shape[3]} inputs, not {size}. "
+                             f"Export it with imgsz={size} or dynamic=True.")
+        self.session = session
+        self.target_size = (size, size)
+        self.high = high
+        self.low = low
+        self.batch_dim = input_shape[0]
+
+    def check_threshold(self, threshold):
+        """The bands must straddle the routing threshold, or a first-pass decision could contradict it."""
+        if not self.low <= threshold <= self.high:
+            raise ValueError(f"Threshold {threshold} must lie between the cascade bands ({self.low}, {self.high}).")
+
+    def confident(self, detections):
+        scores = detections["scores"]
+        max_score = float(scores.max()) if len(scores) else 0.0
+        return max_score >= self.high or max_score < self.low
+
+
+def compare_cascade(full_session, cascade, images_dir, threshold=CONFIDENCE_THRESHOLD, limit=None):
+    """
+    Run both the first pass and the full model on every image of a folder (nothing is moved)
+    and report how the cascade would have split the work, its images/sec against the
+    640-only path, and every image where the cascade's decision differs from 640-only.
+    """
+    cascade.check_threshold(threshold)
+    full_inputs = (full_session.get_inputs()[0].name, full_session.get_outputs()[0].name)
+    first_inputs = (cascade.session.get_inputs()[0].name, cascade.session.get_outputs()[0].name)
+    full_batch = np.empty((1, 3, 640, 640), dtype=np.float32)
+    first_batch = np.empty((1, 3, cascade.target_size[1], cascade.target_size[0]), dtype=np.float32)
+
+    def detect(session, names, batch, image):
+        letterbox = letterbox_into(image, batch[0])
+        start = time.perf_counter()
+        output = session.run([names[1]], {names[0]: batch})[0]
+        detections = decode_detections(output[0], letterbox, conf_threshold=min(threshold, DETECTION_FLOOR))
+        return detections, time.perf_counter() - start
+
+    def max_score(detections):
+        return float(detections["scores"].max()) if len(detections["scores"]) else 0.0
+
+    names = sorted(name for name in os.listdir(images_dir) if name.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    report = {"images": 0, "first_pass": 0, "second_pass": 0, "differences": []}
+    full_seconds = cascade_seconds = 0.0
+    for file_name in names:
+        image = cv2.imread(os.path.join(images_dir, file_name))
+        if image is None:
+            continue
+        first, first_time = detect(cascade.session, first_inputs, first_batch, image)
+        full, full_time = detect(full_session, full_inputs, full_batch, image)
+        full_label = "with_tabs" if len(filter_detections(full, threshold)["scores"]) else "without_tabs"
+
+        report["images"] += 1
+        full_seconds += full_time
+        cascade_seconds += first_time
+        if cascade.confident(first):
+            report["first_pass"] += 1
+            label = "with_tabs" if len(filter_detections(first, threshold)["scores"]) else "without_tabs"
+        else:
+            report["second_pass"] += 1
+            cascade_seconds += full_time
+            label = full_label
+        if label != full_label:
+            report["differences"].append({"file": file_name, "cascade": label, "full": full_label,
+                                          "first_pass_score": round(max_score(first), 4),
+                                          "full_score": round(max_score(full), 4)})
+
+    report["full_images_per_sec"] = round(report["images"] / full_seconds, 1) if full_seconds else 0.0
+    report["cascade_images_per_sec"] = round(report["images"] / cascade_seconds, 1) if cascade_seconds else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    from main import create_session
+
+    parser = argparse.ArgumentParser(description="Check a two-stage cascade against the 640-only path.")
+    parser.add_argument("images", help="Folder of images to compare on (nothing is moved)")
+    parser.add_argument("--first-pass-model", help="Smaller model for the first pass (default: models/best.onnx)")
+    parser.add_argument("--first-pass-size", type=int, default=FIRST_PASS_SIZE, help="First-pass input size")
+    parser.add_argument("--high", type=float, default=HIGH_BAND, help="Decide 'with tabs' at or above this score")
+    parser.add_argument("--low", type=float, default=LOW_BAND, help="Decide 'without tabs' below this score")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="Tab confidence threshold")
+    parser.add_argument("--limit", type=int, help="Maximum images to compare on")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    onnx_model_path = os.path.join(script_dir, "../models/best.onnx")
+    full_session = create_session(onnx_model_path)
+    first_session = create_session(args.first_pass_model) if args.first_pass_model else full_session
+
+    report = compare_cascade(full_session, Cascade(first_session, args.first_pass_size, args.high, args.low),
+                             args.images, args.threshold, args.limit)
+    print(f"{report['images']} images: {report['first_pass']} decided by the first pass, "
+          f"{report['second_pass']} needed the full model.")
+    print(f"640-only {report['full_images_per_sec']} images/s, cascade {report['cascade_images_per_sec']} images/s.")
+    print(f"{len(report['differences'])} decisions differ from the 640-only path:")
+    for difference in report["differences"]:
+        print(f"  {difference['file']}: cascade {difference['cascade']} (first pass "
+              f"{difference['first_pass_score']:.2f}), 640-only {difference['full']} ({difference['full_score']:.2f})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
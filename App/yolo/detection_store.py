@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class DetectionStore:
+    """
+    Per-image record of what the sorter saw, so thresholds can change without re-running the model:
+    - The folder the image was routed to, its max score and every box above DETECTION_FLOOR.
+    - The hash of the model that produced it and the threshold in force at the time.
+    """
+
+    def __init__(self, db_path, commit_every=100):
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS detections (
+                   file_name TEXT PRIMARY KEY,
+                   label TEXT,
+                   max_score REAL,
+                   boxes TEXT,
+                   image_hash TEXT,
+                   model_hash TEXT,
+                   threshold REAL,
+                   updated TEXT
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_score ON detections (max_score)")
+        self.conn.commit()
+
+    def record(self, file_name, label, detections, image_hash, model_hash, threshold):
+        scores = detections["scores"]
+        boxes = [
+            [round(float(v), 1) for v in box] + [round(float(score), 4)]
+            for box, score in zip(detections["boxes"], scores)
+        ]
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_name, label, float(scores.max()) if len(scores) else 0.0, json.dumps(boxes),
+                 image_hash, model_hash, threshold, datetime.now().isoformat()),
+            )
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.conn.commit()
+                self.pending = 0
+
+    def relabel(self, file_name, label, threshold):
+        with self.lock:
+            self.conn.execute("UPDATE detections SET label = ?, threshold = ? WHERE file_name = ?",
+                              (label, threshold, file_name))
+            self.pending += 1
+
+    def rescale(self, file_name, scale_x, scale_y):
+        """
+        Map an image's stored boxes onto a resized copy of it, e.g. when a reduced download is
+        replaced by its full-size original. image_hash keeps naming the bytes that were scored.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT boxes FROM detections WHERE file_name = ?", (file_name,)).fetchone()
+            if row is None:
+                return False
+            boxes = [[round(x1 * scale_x, 1), round(y1 * scale_y, 1), round(x2 * scale_x, 1), round(y2 * scale_y, 1),
+                      score] for x1, y1, x2, y2, score in json.loads(row[0])]
+            self.conn.execute("UPDATE detections SET boxes = ? WHERE file_name = ?", (json.dumps(boxes), file_name))
+            self.conn.commit()
+        return True
+
+    def forget(self, file_name):
+        """Drop an image's record, e.g. when a sorting run is reverted and it is unsorted again."""
+        with self.lock:
+            self.conn.execute("DELETE FROM detections WHERE file_name = ?", (file_name,))
+            self.pending += 1
+
+    def get(self, file_name):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT label, max_score, boxes, image_hash, model_hash, threshold FROM detections "
+                "WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"label": row[0], "max_score": row[1], "boxes": json.loads(row[2]),
+                "image_hash": row[3], "model_hash": row[4], "threshold": row[5]}
+
+    def all(self):
+        """Return (file_name, label, max_score, threshold, model_hash) for every stored image."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT file_name, label, max_score, threshold, model_hash FROM detections"
+            ).fetchall()
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
@@ -0,0 +1,105 @@
+import os
+import json
+import uuid
+from datetime import datetime
+
+
+def read_journal(path):
+    """Return every record in a journal file, skipping a line torn by a crash."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+class SortJournal:
+    """
+    Append-only JSON-lines log of every sorting decision:
+    - A run opens with a "start" record and closes with an "end" record, or a "superseded"
+      record when a fresh run replaces it unfinished.
+    - Each decision (file, label, score, source, destination) is written and fsynced
+      before the file is moved, so every moved file is in the journal even after a crash.
+    - An unfinished run can be resumed: decided files are never re-run, and moves that
+      were journaled but not carried out are finished.
+    - data_cleaning/revert.py replays a run's moves backwards to undo it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run = None
+        # A crash can leave a torn last line; start on a fresh one
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        else:
+            torn = False
+        self.file = open(path, "a", encoding="utf-8")
+        if torn:
+            self.file.write("\n")
+
+    def _write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def open_runs(self, input_folder):
+        """Return {run: (start_record, decisions)} for every run on input_folder that never finished."""
+        input_folder = os.path.abspath(input_folder)
+        runs = {}
+        for record in read_journal(self.path):
+            event = record.get("event")
+            if event == "start" and record.get("input") == input_folder:
+                runs[record["run"]] = (record, {})
+            elif event in ("end", "revert", "superseded"):
+                runs.pop(record.get("run"), None)
+            elif event == "decision" and record.get("run") in runs:
+                runs[record["run"]][1][record["file"]] = record
+        return runs
+
+    def unfinished(self, input_folder):
+        """
+        Return (start_record, decisions) for the last run on input_folder that never
+        finished, or (None, {}). decisions maps file name -> decision record.
+        """
+        runs = self.open_runs(input_folder)
+        if not runs:
+            return None, {}
+        return list(runs.values())[-1]
+
+    def supersede(self, input_folder):
+        """Close every unfinished run on input_folder so none is resumed later; returns their ids."""
+        runs = list(self.open_runs(input_folder))
+        if runs:
+            now = datetime.now().isoformat()
+            self._write([{"event": "superseded", "run": run, "time": now} for run in runs])
+        return runs
+
+    def start(self, input_folder, threshold, model_hash=None):
+        self.run = uuid.uuid4().hex[:12]
+        self._write([{"event": "start", "run": self.run, "input": os.path.abspath(input_folder),
+                      "threshold": threshold, "model_hash": model_hash, "time": datetime.now().isoformat()}])
+        return self.run
+
+    def resume(self, run):
+        self.run = run
+        self._write([{"event": "resume", "run": run, "time": datetime.now().isoformat()}])
+
+    def record(self, decisions):
+        """Durably log (file_name, label, score, source, destination) tuples before they are moved."""
+        self._write([{"event": "decision", "run": self.run, "file": file_name, "label": label,
+                      "score": round(float(score), 4), "source": source, "destination": destination}
+                     for file_name, label, score, source, destination in decisions])
+
+    def end(self, summary):
+        self._write([{"event": "end", "run": self.run, "time": datetime.now().isoformat(), "summary": summary}])
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,87 @@
+import threading
+import cv2
+import numpy as np
+
+_scratch = threading.local()  # Per-thread uint8 resize buffer
+
+
+def letterbox_params(image_shape, target_size=(640, 640)):
+    """
+    Return the (scale, pad_left, pad_top, original_w, original_h) that
+    preprocess_image applies to an image of this shape.
+    """
+    original_h, original_w = image_shape[:2]
+    target_w, target_h = target_size
+    scale = min(target_w / original_w, target_h / original_h)
+    pad_left = (target_w - int(original_w * scale)) // 2
+    pad_top = (target_h - int(original_h * scale)) // 2
+    return scale, pad_left, pad_top, original_w, original_h
+
+
+def letterbox_image(image, target_size=(640, 640)):
+    """
+    Letterboxed uint8 copy of an image, with exactly the resize and padding the
+    sorter applies (used to write training data to disk). Returns (image, params).
+    """
+    target_w, target_h = target_size
+    params = letterbox_params(image.shape, target_size)
+    scale, pad_left, pad_top, original_w, original_h = params
+    resized_w = int(original_w * scale)
+    resized_h = int(original_h * scale)
+    padded = np.zeros((target_h, target_w) + image.shape[2:], dtype=np.uint8)
+    padded[pad_top:pad_top + resized_h, pad_left:pad_left + resized_w] = cv2.resize(image, (resized_w, resized_h))
+    return padded, params
+
+
+def letterbox_into(image, out, swap_rb=False):
+    """
+    Letterbox a BGR uint8 image straight into `out`, a (3, H, W) float32 array
+    such as one slot of a batch buffer:
+    - cv2.resize writes into a reused per-thread scratch buffer.
+    - Each channel is scaled to [0, 1] directly into its plane of `out`; only the padding is zeroed.
+    - With swap_rb=False the result is bit-identical to preprocess_image followed by
+      an HWC -> CHW transpose. swap_rb=True writes RGB planes instead.
+    Returns the letterbox params.
+    """
+    _, target_h, target_w = out.shape
+    params = letterbox_params(image.shape, (target_w, target_h))
+    scale, pad_left, pad_top, original_w, original_h = params
+    resized_w = int(original_w * scale)
+    resized_h = int(original_h * scale)
+
+    needed = resized_h * resized_w * 3
+    scratch = getattr(_scratch, "buffer", None)
+    if scratch is None or scratch.size < needed:
+        scratch = _scratch.buffer = np.empty(max(needed, target_h * target_w * 3), dtype=np.uint8)
+    resized = scratch[:needed].reshape(resized_h, resized_w, 3)
+    cv2.resize(image, (resized_w, resized_h), dst=resized)
+
+    bottom = pad_top + resized_h
+    right = pad_left + resized_w
+    out[:, :pad_top] = 0
+    out[:, bottom:] = 0
+    out[:, pad_top:bottom, :pad_left] = 0
+    out[:, pad_top:bottom, right:] = 0
+
+    channels = (2, 1, 0) if swap_rb else (0, 1, 2)
+    for plane, channel in enumerate(channels):
+        # Divide (not multiply by 1/255) so rounding matches astype(float32) / 255.0
+        np.divide(resized[:, :, channel], 255.0, out=out[plane, pad_top:bottom, pad_left:right], dtype=np.float32)
+    return params
+
+
+class BatchBuffers:
+    """
+    Ring of preallocated, contiguous (batch, 3, H, W) float32 input buffers.
+    Two are enough for the prefetcher: one being inferred, one being filled.
+    """
+
+    def __init__(self, batch_size, target_size=(640, 640), count=2):
+        target_w, target_h = target_size
+        self.buffers = [np.zeros((batch_size, 3, target_h, target_w), dtype=np.float32) for _ in range(count)]
+        self.index = 0
+
+    def next(self):
+        buffer = self.buffers[self.index]
+        self.index = (self.index + 1) % len(self.buffers)
+        return buffer
@@ -1,8 +1,23 @@
 import os
+import sys
 import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 import onnxruntime as ort
+from postprocess import CONFIDENCE_THRESHOLD, DETECTION_FLOOR, decode_detections, filter_detections
+from result_cache import ResultCache, file_hash
+from detection_store import DetectionStore
+from letterbox import BatchBuffers, letterbox_into
+from cascade import Cascade, FIRST_PASS_SIZE, FIRST_PASS_SUFFIX, HIGH_BAND, LOW_BAND
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules in App/
+from catalog import Catalog
+from thumbnails import ThumbnailGenerator
+from metrics import TIMERS
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
 
 def draw_bounding_box(img, class_id, confidence, x, y, x_plus_w, y_plus_h):
@@ -12,12 +27,23 @@ def draw_bounding_box(img, class_id, confidence, x, y, x_plus_w, y_plus_h):
     cv2.putText(img, label, (x - 10, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
 
+def annotate_image(img, detections):
+    """Draw every box returned by decode_detections onto the image in place."""
+    for (x1, y1, x2, y2), score, class_id in zip(
+            detections["boxes"], detections["scores"], detections["class_ids"]):
+        draw_bounding_box(img, class_id, score, int(x1), int(y1), int(x2), int(y2))
+    return img
+
+
 def preprocess_image(image, target_size=(640, 640)):
     """
     Preprocess the image for YOLOv11:
     - Resize while maintaining aspect ratio.
     - Pad to the target size (640x640).
     - Normalize pixel values to [0, 1].
+
+    This is the reference implementation; the sorter uses letterbox_into, which
+    produces the same values without the intermediate copies.
     """
     original_h, original_w = image.shape[:2]
     target_w, target_h = target_size
@@ -43,66 +69,314 @@ def preprocess_image(image, target_size=(640, 640)):
     return normalized_image
 
 
-def process_images(onnx_model, input_folder, with_tabs_folder, without_tabs_folder):
+def load_input(file_path, target_size=(640, 640), cache=None, out=None, first_out=None):
+    """
+    Read an image from disk and turn it into a CHW float32 input for the model.
+    Returns a dict with the input, letterbox params and image hash, or None if the
+    file cannot be decoded. With a result cache, a hit returns its detections instead
+    and skips decoding altogether. Pass `out` (a (3, H, W) slot of a batch buffer)
+    to letterbox straight into it, and `first_out` to also letterbox into a slot of
+    the cascade's smaller first-pass buffer.
+    """
+    loaded = {"input": None, "letterbox": None, "image_hash": None, "detections": None, "first_letterbox": None}
+    if cache is not None:
+        with TIMERS.time("cache_lookup"):
+            loaded["image_hash"] = file_hash(file_path)
+            loaded["detections"] = cache.get(loaded["image_hash"])
+        if loaded["detections"] is not None:
+            return loaded
+
+    with TIMERS.time("decode"):
+        original_image = cv2.imread(file_path)
+    if original_image is None:
+        return None
+
+    # Preprocess the image for YOLOv11 (640x640)
+    if out is None:
+        out = np.empty((3, target_size[1], target_size[0]), dtype=np.float32)
+    with TIMERS.time("preprocess"):
+        loaded["letterbox"] = letterbox_into(original_image, out)
+        if first_out is not None:
+            loaded["first_letterbox"] = letterbox_into(original_image, first_out)
+    loaded["input"] = out
+    return loaded
+
+
+def classify_image(session, image, target_size=(640, 640), conf_threshold=CONFIDENCE_THRESHOLD):
+    """
+    Run the detector on one already decoded BGR image (e.g. from cv2.imdecode)
+    and return the decoded detections.
+    """
+    input_tensor = np.empty((1, 3, target_size[1], target_size[0]), dtype=np.float32)
+    letterbox = letterbox_into(image, input_tensor[0])
+    output = session.run([session.get_outputs()[0].name], {session.get_inputs()[0].name: input_tensor})[0]
+    return decode_detections(output[0], letterbox, conf_threshold=conf_threshold)
+
+
+def verify_letterbox(file_paths, target_size=(640, 640)):
+    """Check letterbox_into against preprocess_image on real images; returns the paths that differ."""
+    mismatches = []
+    out = np.empty((3, target_size[1], target_size[0]), dtype=np.float32)
+    for file_path in file_paths:
+        image = cv2.imread(file_path)
+        if image is None:
+            continue
+        letterbox_into(image, out)
+        reference = np.transpose(preprocess_image(image, target_size), (2, 0, 1))
+        if not np.array_equal(out, reference):
+            mismatches.append(file_path)
+    return mismatches
+
+
+def resolve_batch_size(session, requested):
+    """
+    Pick the batch size to run with:
+    - Models exported with a dynamic batch axis accept any batch size.
+    - Models exported with a fixed batch axis can only run that size.
+    """
+    batch_dim = session.get_inputs()[0].shape[0]
+    if isinstance(batch_dim, int) and batch_dim > 0 and batch_dim != requested:
+        print(f"Model has a fixed batch size of {batch_dim}; ignoring requested batch size {requested}. "
+              f"Export with dynamic=True to enable batching.")
+        return batch_dim
+    return max(1, requested)
+
+
+def prefetch_batches(file_paths, batch_size, workers=4, target_size=(640, 640), cache=None, first_pass_size=None):
+    """
+    Yield (file_paths, inputs, buffer, first_buffer) batches while the next batch is
+    decoded and letterboxed in a thread pool, so the inference engine never waits on disk.
+    Each image is letterboxed into its slot of one of two reused batch buffers,
+    so no per-image input arrays are allocated. With a first_pass_size (cascade mode)
+    every image is also letterboxed into a smaller first_buffer; otherwise it is None.
+    """
+    batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+    if not batches:
+        return
+    buffers = BatchBuffers(batch_size, target_size)
+    first_buffers = BatchBuffers(batch_size, first_pass_size) if first_pass_size else None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(batch):
+            buffer = buffers.next()
+            first_buffer = first_buffers.next() if first_buffers else None
+            futures = [executor.submit(load_input, path, target_size, cache, buffer[slot],
+                                       first_buffer[slot] if first_buffer is not None else None)
+                       for slot, path in enumerate(batch)]
+            return futures, buffer, first_buffer
+
+        pending = submit(batches[0])
+        for index, batch in enumerate(batches):
+            current, buffer, first_buffer = pending
+            if index + 1 < len(batches):
+                pending = submit(batches[index + 1])
+            yield batch, [future.result() for future in current], buffer, first_buffer
+
+
+def create_session(onnx_model, threads=None, profile=None):
+    """
+    Load the ONNX model with ONNX Runtime. The session is safe to share between threads.
+    Pass threads to cap its intra-op thread pool, e.g. when several processes share the CPU,
+    and a profile from PROFILES to get a tuned CPU-only session instead (see profiles.py).
+    """
+    if profile:
+        from profiles import create_profile_session  # Only loaded when a profile is asked for
+        return create_profile_session(onnx_model, profile, threads=threads)
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]  # Use GPU if available, otherwise CPU
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return ort.InferenceSession(onnx_model, sess_options=options, providers=providers)
+
+
+def run_batch(session, buffer, slots, fixed_batch, stage="inference"):
+    """
+    Run the model on the given slots of a batch buffer; returns one raw output per slot.
+    Fixed-batch models always take the whole buffer, and unused slots are ignored.
+    The session.run call is timed under `stage`.
+    """
+    if fixed_batch:
+        input_tensor, rows = buffer, slots
+    elif slots == list(range(len(slots))):
+        input_tensor, rows = buffer[:len(slots)], slots
+    else:
+        # Some images came from the cache: gather the rest
+        input_tensor, rows = buffer[slots], list(range(len(slots)))
+    with TIMERS.time(stage, len(slots)):
+        outputs = session.run([session.get_outputs()[0].name], {session.get_inputs()[0].name: input_tensor})[0]
+    return [outputs[row] for row in rows]
+
+
+def process_images(onnx_model, input_folder, with_tabs_folder, without_tabs_folder, batch_size=1, workers=4,
+                   session=None, progress=None, annotated_folder=None, cache=None,
+                   threshold=CONFIDENCE_THRESHOLD, store=None, catalog=None, thumbnails=None, cascade=None):
     """
     Process images using the YOLOv11 ONNX model with ONNX Runtime:
-    - Detect tabs in each image.
+    - Decode and preprocess the next batch while the current one runs.
+    - Detect tabs in each image of the batch.
     - Move images to appropriate folders based on detection results.
+
+    Pass an already loaded session to skip model loading, and a
+    progress(done, total) callback to follow a long run.
+    Set annotated_folder to also save a copy of each tab image with its boxes drawn.
+    With a ResultCache, images already seen by this model skip inference. Cached scores stop
+    at DETECTION_FLOOR, so the cache is bypassed for a threshold below it.
+    With a DetectionStore, each image's scores and boxes are saved for later re-thresholding.
+    With a Catalog, each sorted image is indexed for /get_images, and with a
+    ThumbnailGenerator any image still missing a thumbnail gets one at the end.
+    With a Cascade, a cheap first pass decides the clear-cut images and only the
+    uncertain ones go through this model; only the latter are cached.
+    Returns counts of the images sorted.
     """
-    # Load the ONNX model with ONNX Runtime
-    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]  # Use GPU if available, otherwise CPU
-    session = ort.InferenceSession(onnx_model, providers=providers)
+    if cascade is not None:
+        cascade.check_threshold(threshold)
+    if cache is not None and threshold < DETECTION_FLOOR:
+        print(f"Threshold {threshold} is below the cached score floor {DETECTION_FLOOR}; not using the cache.")
+        cache = None
+    if session is None:
+        session = create_session(onnx_model)
 
-    # Get input and output names
-    input_name = session.get_inputs()[0].name
-    output_name = session.get_outputs()[0].name
+    if cascade is not None:
+        # Both passes fill the same batch slots, so the first pass has its say on the batch size too
+        batch_size = resolve_batch_size(cascade.session, batch_size)
+    batch_size = resolve_batch_size(session, batch_size)
+    first_batch = cascade.batch_dim if cascade is not None else None
+    if isinstance(first_batch, int) and first_batch > 0 and first_batch != batch_size:
+        raise ValueError(f"The first-pass model has a fixed batch size of {first_batch} and the full model "
+                         f"{batch_size}; export one of them with dynamic=True.")
+    model_hash = None
+    if store is not None:
+        model_hash = cache.model_hash if cache is not None else file_hash(onnx_model)
 
     # Create output folders if they don't exist
     os.makedirs(with_tabs_folder, exist_ok=True)
     os.makedirs(without_tabs_folder, exist_ok=True)
+    if annotated_folder:
+        os.makedirs(annotated_folder, exist_ok=True)
 
-    for file_name in os.listdir(input_folder):
-        file_path = os.path.join(input_folder, file_name)
-        if not file_name.lower().endswith((".jpg", ".jpeg", ".png")):
-            continue  # Skip non-image files
+    file_paths = [
+        os.path.join(input_folder, file_name)
+        for file_name in os.listdir(input_folder)
+        if file_name.lower().endswith(IMAGE_EXTENSIONS)  # Skip non-image files
+    ]
+    summary = {"total": len(file_paths), "with_tabs": 0, "without_tabs": 0, "errors": 0, "cached": 0}
+    if cascade is not None:
+        summary.update(first_pass=0, second_pass=0)
+    done = 0
 
-        print(f"Processing: {file_path}")
+    fixed_batch = session.get_inputs()[0].shape[0] == batch_size
+    first_pass_size = cascade.target_size if cascade is not None else None
+    first_pass_hash = f"{model_hash}{FIRST_PASS_SUFFIX}" if model_hash else None  # Marks scores from the cheap pass
 
-        original_image = cv2.imread(file_path)
-        if original_image is None:
-            print(f"Error reading file: {file_path}")
-            continue
+    for batch_paths, batch_inputs, buffer, first_buffer in prefetch_batches(file_paths, batch_size, workers,
+                                                                             cache=cache,
+                                                                             first_pass_size=first_pass_size):
+        results = []
+        pending = []
+        for slot, (file_path, loaded) in enumerate(zip(batch_paths, batch_inputs)):
+            print(f"Processing: {file_path}")
+            if loaded is None:
+                print(f"Error reading file: {file_path}")
+                summary["errors"] += 1
+            elif loaded["detections"] is not None:
+                summary["cached"] += 1
+                results.append((file_path, loaded["image_hash"], loaded["detections"], model_hash))
+            else:
+                pending.append((slot, file_path, loaded))
 
-        # Preprocess the image for YOLOv11 (640x640)
-        preprocessed_image = preprocess_image(original_image, target_size=(640, 640))
+        if pending and cascade is not None:
+            # First pass: keep the clear-cut images, send the rest on to the full model
+            outputs = run_batch(cascade.session, first_buffer, [slot for slot, _, _ in pending],
+                                cascade.batch_dim == batch_size, stage="first_pass_inference")
+            uncertain = []
+            for (slot, file_path, loaded), output in zip(pending, outputs):
+                with TIMERS.time("postprocess"):
+                    detections = decode_detections(output, loaded["first_letterbox"],
+                                                   conf_threshold=min(threshold, DETECTION_FLOOR))
+                if cascade.confident(detections):
+                    summary["first_pass"] += 1
+                    results.append((file_path, loaded["image_hash"], detections, first_pass_hash))
+                else:
+                    uncertain.append((slot, file_path, loaded))
+            summary["second_pass"] += len(uncertain)
+            pending = uncertain
 
-        # Prepare input tensor
-        input_tensor = np.transpose(preprocessed_image, (2, 0, 1))  # HWC to CHW
-        input_tensor = np.expand_dims(input_tensor, axis=0)  # Add batch dimension
+        if pending:
+            # Run inference
+            outputs = run_batch(session, buffer, [slot for slot, _, _ in pending], fixed_batch)
 
-        # Run inference
-        outputs = session.run([output_name], {input_name: input_tensor})[0]
+            for (_, file_path, loaded), output in zip(pending, outputs):
+                # Keep low-score boxes too, so cached results work for any threshold
+                with TIMERS.time("postprocess"):
+                    detections = decode_detections(output, loaded["letterbox"],
+                                                   conf_threshold=min(threshold, DETECTION_FLOOR))
+                if cache is not None:
+                    cache.put(loaded["image_hash"], detections)
+                results.append((file_path, loaded["image_hash"], detections, model_hash))
 
-        # Process detections
-        tab_detected = False
-        for detection in outputs[0]:
-            confidence = detection[4]
-            if confidence >= 0.51:  # Confidence threshold
-                tab_detected = True
-                break
+        # Routing decisions stay per image
+        for file_path, image_hash, all_detections, decided_by in results:
+            file_name = os.path.basename(file_path)
+            detections = filter_detections(all_detections, threshold)
+            label = "with_tabs" if len(detections["scores"]) else "without_tabs"
+            if store is not None:
+                store.record(file_name, label, all_detections, image_hash, decided_by, threshold)
+            if len(detections["scores"]):
+                output_path = os.path.join(with_tabs_folder, file_name)
+                summary["with_tabs"] += 1
+                print(f"Tab detected ({detections['scores'].max():.2f}). Moving {file_name} to {with_tabs_folder}")
+                if annotated_folder:
+                    annotated = cv2.imread(file_path)
+                    cv2.imwrite(os.path.join(annotated_folder, file_name), annotate_image(annotated, detections))
+            else:
+                output_path = os.path.join(without_tabs_folder, file_name)
+                summary["without_tabs"] += 1
+                print(f"No tab detected. Moving {file_name} to {without_tabs_folder}")
 
-        if tab_detected:
-            output_path = os.path.join(with_tabs_folder, file_name)
-            print(f"Tab detected. Moving {file_name} to {with_tabs_folder}")
-        else:
-            output_path = os.path.join(without_tabs_folder, file_name)
-            print(f"No tab detected. Moving {file_name} to {without_tabs_folder}")
+            # Move the image to the appropriate folder
+            with TIMERS.time("move"):
+                shutil.move(file_path, output_path)
+            if catalog is not None:
+                scores = all_detections["scores"]
+                catalog.set_label(file_name, label, float(scores.max()) if len(scores) else 0.0)
 
-        # Move the image to the appropriate folder
-        shutil.move(file_path, output_path)
+        done += len(batch_paths)
+        if progress:
+            progress(done, summary["total"])
+
+    if cache is not None:
+        cache.evict()
+    if store is not None:
+        store.commit()
+    if thumbnails is not None:
+        thumbnails.backfill()
+    return summary
 
 
 if __name__ == "__main__":
+    from profiles import PROFILES
+
+    parser = argparse.ArgumentParser(description="Sort images into with_tabs/without_tabs folders.")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Images per session.run call (needs a model exported with dynamic=True)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads used to decode and preprocess images")
+    parser.add_argument("--annotate", action="store_true", help="Also save tab images with their boxes drawn")
+    parser.add_argument("--no-cache", action="store_true", help="Always run the model, ignoring cached results")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="Tab confidence threshold")
+    parser.add_argument("--profile", choices=PROFILES,
+                        help="CPU inference profile (default: the exported model on GPU if available)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Decide clear-cut images with a cheap first pass; only uncertain ones get the full model")
+    parser.add_argument("--first-pass-model", help="Smaller model for the cascade's first pass "
+                                                   "(default: models/best.onnx at --first-pass-size)")
+    parser.add_argument("--first-pass-size", type=int, default=FIRST_PASS_SIZE, help="First-pass input size")
+    parser.add_argument("--high", type=float, default=HIGH_BAND, help="First pass decides 'with tabs' at or above this")
+    parser.add_argument("--low", type=float, default=LOW_BAND, help="First pass decides 'without tabs' below this")
+    parser.add_argument("--verify-preprocess", action="store_true",
+                        help="Only check the buffered letterbox against preprocess_image on the input images")
+    args = parser.parse_args()
+
     # Define paths relative to the project root
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.join(script_dir, "../")
@@ -111,6 +385,38 @@ if __name__ == "__main__":
     input_dir = os.path.join(project_root, "static/images")
     with_tabs_dir = os.path.join(input_dir, "with_tabs")
     without_tabs_dir = os.path.join(input_dir, "without_tabs")
+    annotated_dir = os.path.join(input_dir, "annotated") if args.annotate else None
+    cache = None if args.no_cache else ResultCache(os.path.join(project_root, "inference_cache.db"), onnx_model_path,
+                                                   profile=args.profile)
+    store = DetectionStore(os.path.join(project_root, "detections.db"))
+    catalog = Catalog(os.path.join(project_root, "catalog.db"))
+    thumbnails = ThumbnailGenerator(input_dir, os.path.join(project_root, "static/thumbs"), catalog,
+                                    workers=args.workers)
+
+    if args.verify_preprocess:
+        paths = [os.path.join(input_dir, name) for name in os.listdir(input_dir)
+                 if name.lower().endswith(IMAGE_EXTENSIONS)]
+        mismatches = verify_letterbox(paths)
+        print(f"Checked {len(paths)} images: {len(mismatches)} differ from preprocess_image.")
+        for path in mismatches:
+            print(f"  {path}")
+        sys.exit(1 if mismatches else 0)
+
+    session = create_session(onnx_model_path, profile=args.profile)
+    cascade = None
+    if args.cascade:
+        first_session = (create_session(args.first_pass_model, profile=args.profile) if args.first_pass_model
+                         else session)
+        cascade = Cascade(first_session, args.first_pass_size, args.high, args.low)
 
     # Process images
-    process_images(onnx_model_path, input_dir, with_tabs_dir, without_tabs_dir)
\ No newline at end of file
+    summary = process_images(onnx_model_path, input_dir, with_tabs_dir, without_tabs_dir, session=session,
+                             batch_size=args.batch_size, workers=args.workers, annotated_folder=annotated_dir,
+                             cache=cache, threshold=args.threshold, store=store, catalog=catalog,
+                             thumbnails=thumbnails, cascade=cascade)
+    print(f"Sorted {summary['total']} images: {summary['with_tabs']} with tabs, "
+          f"{summary['without_tabs']} without, {summary['cached']} from cache, {summary['errors']} errors.")
+    if cascade is not None:
+        print(f"Cascade: {summary['first_pass']} decided by the first pass, "
+              f"{summary['second_pass']} by the full model. Run cascade.py on a sample folder "
+              f"to see where it disagrees with the 640-only path.")
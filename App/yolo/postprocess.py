@@ -0,0 +1,107 @@
+import time
+import numpy as np
+
+CONFIDENCE_THRESHOLD = 0.51
+IOU_THRESHOLD = 0.45
+DETECTION_FLOOR = 0.1  # Lowest score kept when results are stored for later re-thresholding
+
+
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD):
+    """
+    Greedy non-maximum suppression on (N, 4) xyxy boxes.
+    Each step compares the best remaining box against all others at once.
+    Returns the indices of the boxes to keep, best score first.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def decode_detections(output, letterbox, conf_threshold=CONFIDENCE_THRESHOLD, iou_threshold=IOU_THRESHOLD):
+    """
+    Decode one image's raw YOLOv11 output into boxes in original image pixels:
+    - Accepts the standard (4+nc, anchors) layout, with or without the batch axis.
+    - Filters by confidence with a single mask, then runs class-aware NMS.
+    - Undoes the letterbox scale and padding applied by preprocess_image.
+
+    letterbox is (scale, pad_left, pad_top, original_w, original_h).
+    Returns a dict with xyxy boxes, scores, class_ids and timings in microseconds.
+    """
+    start = time.perf_counter()
+
+    predictions = np.asarray(output)
+    if predictions.ndim == 3:
+        predictions = predictions[0]
+    if predictions.shape[0] < predictions.shape[1]:
+        predictions = predictions.T  # (4+nc, anchors) -> (anchors, 4+nc)
+
+    class_scores = predictions[:, 4:]
+    if class_scores.shape[1] == 1:
+        scores = class_scores[:, 0]
+        class_ids = np.zeros(scores.shape, dtype=np.intp)
+    else:
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+    mask = scores >= conf_threshold
+    scores = scores[mask]
+    class_ids = class_ids[mask]
+    cxcywh = predictions[mask, :4]
+
+    boxes = np.empty_like(cxcywh)
+    boxes[:, 0] = cxcywh[:, 0] - cxcywh[:, 2] / 2
+    boxes[:, 1] = cxcywh[:, 1] - cxcywh[:, 3] / 2
+    boxes[:, 2] = cxcywh[:, 0] + cxcywh[:, 2] / 2
+    boxes[:, 3] = cxcywh[:, 1] + cxcywh[:, 3] / 2
+    decoded = time.perf_counter()
+
+    if len(boxes):
+        # Shift each class onto its own range so boxes of different classes never suppress each other
+        offsets = class_ids[:, None] * (boxes.max() + 1)
+        keep = nms(boxes + offsets, scores, iou_threshold)
+        boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+    suppressed = time.perf_counter()
+
+    scale, pad_left, pad_top, original_w, original_h = letterbox
+    boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad_left) / scale, 0, original_w)
+    boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad_top) / scale, 0, original_h)
+    finished = time.perf_counter()
+
+    return {
+        "boxes": boxes,
+        "scores": scores,
+        "class_ids": class_ids,
+        "timings": {
+            "decode_us": (decoded - start) * 1e6,
+            "nms_us": (suppressed - decoded) * 1e6,
+            "unletterbox_us": (finished - suppressed) * 1e6,
+            "total_us": (finished - start) * 1e6,
+        },
+    }
+
+
+def filter_detections(detections, conf_threshold=CONFIDENCE_THRESHOLD):
+    """
+    Keep only detections scoring at least conf_threshold.
+    NMS visits boxes best-first, so this matches decoding at conf_threshold directly.
+    """
+    keep = detections["scores"] >= conf_threshold
+    filtered = dict(detections)
+    filtered["boxes"] = detections["boxes"][keep]
+    filtered["scores"] = detections["scores"][keep]
+    filtered["class_ids"] = detections["class_ids"][keep]
+    return filtered
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import cv2
+import numpy as np
+import onnxruntime as ort
+from postprocess import CONFIDENCE_THRESHOLD, DETECTION_FLOOR, decode_detections, filter_detections
+from result_cache import file_hash
+from letterbox import letterbox_into
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+PROFILES = ("fp32", "int8-dynamic", "int8-static")
+CALIBRATION_IMAGES = 200  # Images read from the calibration folder for static INT8
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(SCRIPT_DIR, "../../")
+CALIBRATION_DIR = os.path.join(REPO_ROOT, "training/data/images/val")  # Written by batch_2_data.py
+
+
+def list_images(folder, limit=None):
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return [os.path.join(folder, name) for name in names[:limit]]
+
+
+class LetterboxReader:
+    """
+    Feeds calibration images to quantize_static, letterboxed exactly like the sorter does.
+    Implements CalibrationDataReader's get_next without subclassing it, so importing this
+    module does not load the quantization toolkit.
+    """
+
+    def __init__(self, input_name, file_paths, target_size=(640, 640)):
+        self.input_name = input_name
+        self.file_paths = iter(file_paths)
+        self.target_size = target_size
+
+    def get_next(self):
+        for file_path in self.file_paths:
+            image = cv2.imread(file_path)
+            if image is None:
+                continue
+            batch = np.empty((1, 3, self.target_size[1], self.target_size[0]), dtype=np.float32)
+            letterbox_into(image, batch[0])
+            return {self.input_name: batch}
+        return None
+
+
+def head_nodes(model):
+    """
+    Names of the nodes in the detection head (the last /model.N/ block of an
+    Ultralytics export). They decode boxes and scores, so they stay in float.
+    """
+    blocks = {}
+    for node in model.graph.node:
+        match = re.match(r"^/model\.(\d+)/", node.name)
+        if match:
+            blocks.setdefault(int(match.group(1)), []).append(node.name)
+    return blocks[max(blocks)] if blocks else []
+
+
+def quantized_model(onnx_model, profile, cache_dir, calibration_dir=CALIBRATION_DIR):
+    """
+    Return the path of the model to load for this profile, quantizing it on first use.
+    Quantized models are cached by source model hash (and, for static INT8, the
+    calibration images), so they are rebuilt only when either changes. Intermediate
+    files are per process, so concurrent builds of the same model never collide.
+    """
+    if profile == "fp32":
+        return onnx_model
+    if profile not in PROFILES:
+        raise ValueError(f"profile must be one of {PROFILES}")
+
+    key = hashlib.sha256(file_hash(onnx_model).encode())
+    calibration = []
+    if profile == "int8-static":
+        if not os.path.isdir(calibration_dir):
+            raise FileNotFoundError(f"No calibration images at {calibration_dir}; run batch_2_data.py first.")
+        calibration = list_images(calibration_dir, CALIBRATION_IMAGES)
+        for file_path in calibration:
+            key.update(f"{os.path.basename(file_path)}:{os.path.getsize(file_path)}".encode())
+    stem = os.path.splitext(os.path.basename(onnx_model))[0]
+    output = os.path.join(cache_dir, f"{stem}.{profile}.{key.hexdigest()[:12]}.onnx")
+    if os.path.exists(output):
+        return output
+
+    # Only building a quantized model needs onnx and the quantization toolkit, both slow to import
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"Building {profile} model {output} ...")
+    prepared = f"{output}.{os.getpid()}.prep"
+    quant_pre_process(onnx_model, prepared)
+    exclude = head_nodes(onnx.load(prepared))
+    partial = f"{output}.{os.getpid()}.tmp"
+    if profile == "int8-dynamic":
+        quantize_dynamic(prepared, partial, weight_type=QuantType.QUInt8, nodes_to_exclude=exclude)
+    else:
+        input_name = onnx.load(prepared).graph.input[0].name
+        quantize_static(prepared, partial, LetterboxReader(input_name, calibration), quant_format=QuantFormat.QDQ,
+                        per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        nodes_to_exclude=exclude)
+    os.replace(partial, output)
+    os.remove(prepared)
+    return output
+
+
+def create_profile_session(onnx_model, profile="fp32", threads=None, cache_dir=None, calibration_dir=CALIBRATION_DIR):
+    """
+    CPU inference session for one of PROFILES:
+    - fp32: the exported model; int8-dynamic / int8-static: a quantized copy.
+    - All graph optimizations on, with the optimized graph saved next to the model
+      cache so later starts load it directly and skip re-optimization.
+    - threads sets the intra-op pool (default: every core); inter-op work runs sequentially.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(onnx_model)), "profiles")
+    model_path = quantized_model(onnx_model, profile, cache_dir, calibration_dir)
+
+    options = ort.SessionOptions()
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    options.intra_op_num_threads = threads or os.cpu_count() or 1
+
+    # Optimized graphs are specific to the ORT version and the CPU they were built on
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    optimized = os.path.join(cache_dir, f"{stem}.{file_hash(model_path)[:12]}.ort{ort.__version__}.opt.onnx")
+    if os.path.exists(optimized):
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return ort.InferenceSession(optimized, sess_options=options, providers=["CPUExecutionProvider"])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    partial = f"{optimized}.{os.getpid()}.tmp"  # Published whole, so no process loads a half-written graph
+    options.optimized_model_filepath = partial
+    session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    if os.path.exists(partial):
+        os.replace(partial, optimized)
+    return session
+
+
+def compare_profiles(onnx_model, images_dir, profiles=PROFILES, threads=None, limit=500,
+                     threshold=CONFIDENCE_THRESHOLD, calibration_dir=CALIBRATION_DIR):
+    """
+    Run each profile over the same images and report:
+    - images_per_sec: model run plus box decoding, one image at a time (decoding the JPEGs is not timed).
+    - agreement: share of images whose with/without-tabs decision matches fp32.
+    - mean_score_diff: mean absolute difference in max tab score against fp32.
+    """
+    file_paths = list_images(images_dir, limit)
+    runs = {}
+    for profile in profiles:
+        session = create_profile_session(onnx_model, profile, threads=threads, calibration_dir=calibration_dir)
+        input_name = session.get_inputs()[0].name
+        output_name = session.get_outputs()[0].name
+        batch = np.empty((1, 3, 640, 640), dtype=np.float32)
+        session.run([output_name], {input_name: batch})  # Warm-up
+
+        decisions, max_scores = [], []
+        elapsed = 0.0
+        for file_path in file_paths:
+            image = cv2.imread(file_path)
+            if image is None:
+                continue
+            letterbox = letterbox_into(image, batch[0])
+            start = time.perf_counter()
+            output = session.run([output_name], {input_name: batch})[0]
+            detections = decode_detections(output[0], letterbox, conf_threshold=DETECTION_FLOOR)
+            elapsed += time.perf_counter() - start
+            scores = detections["scores"]
+            decisions.append(bool(len(filter_detections(detections, threshold)["scores"])))
+            max_scores.append(float(scores.max()) if len(scores) else 0.0)
+        runs[profile] = {"decisions": decisions, "max_scores": np.array(max_scores),
+                         "images_per_sec": round(len(decisions) / elapsed, 1) if elapsed else 0.0}
+
+    baseline = runs.get("fp32")
+    report = {}
+    for profile, run in runs.items():
+        report[profile] = {"images": len(run["decisions"]), "images_per_sec": run["images_per_sec"],
+                           "with_tabs": sum(run["decisions"])}
+        if baseline is not None:
+            agree = sum(a == b for a, b in zip(run["decisions"], baseline["decisions"]))
+            report[profile]["agreement"] = round(agree / len(run["decisions"]), 4) if run["decisions"] else None
+            report[profile]["mean_score_diff"] = (
+                round(float(np.abs(run["max_scores"] - baseline["max_scores"]).mean()), 4)
+                if len(run["max_scores"]) else None)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and compare CPU inference profiles.")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--images", help="Images to compare on (default: training/data/images/test)")
+    parser.add_argument("--calibration", default=CALIBRATION_DIR, help="Images used to calibrate int8-static")
+    parser.add_argument("--threads", type=int, help="Intra-op threads per session (default: every core)")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum images to compare on")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    onnx_model_path = os.path.join(SCRIPT_DIR, "../models/best.onnx")
+    images_dir = args.images or os.path.join(REPO_ROOT, "training/data/images/test")
+
+    report = compare_profiles(onnx_model_path, images_dir, args.profiles, threads=args.threads, limit=args.limit,
+                              calibration_dir=args.calibration)
+    print(f"{'profile':<14}{'images/s':>10}{'tabs':>7}{'agree':>8}{'score diff':>12}")
+    for profile, row in report.items():
+        print(f"{profile:<14}{row['images_per_sec']:>10}{row['with_tabs']:>7}"
+              f"{str(row.get('agreement', '-')):>8}{str(row.get('mean_score_diff', '-')):>12}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,160 @@
+import os
+import shutil
+import argparse
+from collections import Counter
+import cv2
+from postprocess import CONFIDENCE_THRESHOLD, DETECTION_FLOOR
+from result_cache import file_hash
+from cascade import FIRST_PASS_SUFFIX, HIGH_BAND, LOW_BAND
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def current_threshold(store):
+    """The threshold most of the stored decisions were made with."""
+    thresholds = Counter(row[3] for row in store.all() if row[3] is not None)
+    return thresholds.most_common(1)[0][0] if thresholds else CONFIDENCE_THRESHOLD
+
+
+def reclassify(store, threshold, with_tabs_folder, without_tabs_folder, catalog=None, low=LOW_BAND, high=HIGH_BAND):
+    """
+    Re-partition the sorted collection against a new threshold using only stored scores:
+    - An image belongs in with_tabs if its stored max score reaches the threshold.
+    - Only files whose side changes are moved.
+    - Images the cascade's first pass decided only have a low-resolution score, trusted for
+      thresholds inside its bands (low, high). Outside them they are left where they are and
+      listed under first_pass_skipped; re-sort those with the full model.
+    """
+    if threshold < DETECTION_FLOOR:
+        raise ValueError(f"Scores below {DETECTION_FLOOR} are not stored; pick a higher threshold.")
+
+    summary = {"checked": 0, "to_with_tabs": 0, "to_without_tabs": 0, "missing": 0, "first_pass_skipped": []}
+    folders = {"with_tabs": with_tabs_folder, "without_tabs": without_tabs_folder}
+    first_pass_trusted = low <= threshold <= high
+    for file_name, label, max_score, _, model_hash in store.all():
+        summary["checked"] += 1
+        if not first_pass_trusted and model_hash and model_hash.endswith(FIRST_PASS_SUFFIX):
+            summary["first_pass_skipped"].append(file_name)
+            continue
+        new_label = "with_tabs" if max_score >= threshold else "without_tabs"
+        if new_label == label:
+            continue
+
+        source = os.path.join(folders[label], file_name)
+        if not os.path.exists(source):
+            summary["missing"] += 1
+            continue
+        shutil.move(source, os.path.join(folders[new_label], file_name))
+        store.relabel(file_name, new_label, threshold)
+        if catalog is not None:
+            catalog.set_label(file_name, new_label, max_score)
+        summary[f"to_{new_label}"] += 1
+        print(f"Moved {file_name} to {new_label} (score {max_score:.2f})")
+
+    store.commit()
+    return summary
+
+
+def split_scores(images_dir, labels_dir, cache=None, classify=None):
+    """
+    Return (max_score, has_tab) for every image of a labeled YOLO split.
+    An image is a positive if its label file has at least one box.
+    Scores come from the result cache; only images it has never seen go through classify(image).
+    """
+    results = []
+    for file_name in sorted(os.listdir(images_dir)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(images_dir, file_name)
+        label_path = os.path.join(labels_dir, os.path.splitext(file_name)[0] + ".txt")
+        has_tab = os.path.exists(label_path) and os.path.getsize(label_path) > 0
+
+        image_hash = file_hash(image_path) if cache is not None else None
+        detections = cache.get(image_hash) if cache is not None else None
+        if detections is None:
+            if classify is None:
+                continue  # No stored score and no model to produce one
+            image = cv2.imread(image_path)
+            if image is None:
+                continue
+            detections = classify(image)
+            if cache is not None:
+                cache.put(image_hash, detections)
+
+        scores = detections["scores"]
+        results.append((float(scores.max()) if len(scores) else 0.0, has_tab))
+    return results
+
+
+def precision_recall(scored, threshold):
+    true_pos = sum(1 for score, has_tab in scored if score >= threshold and has_tab)
+    false_pos = sum(1 for score, has_tab in scored if score >= threshold and not has_tab)
+    false_neg = sum(1 for score, has_tab in scored if score < threshold and has_tab)
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 0.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4)}
+
+
+def threshold_shift(scored, old_threshold, new_threshold):
+    """Precision/recall on a labeled split at the old and the new threshold."""
+    old = precision_recall(scored, old_threshold)
+    new = precision_recall(scored, new_threshold)
+    return {
+        "images": len(scored),
+        "old": dict(old, threshold=old_threshold),
+        "new": dict(new, threshold=new_threshold),
+        "precision_change": round(new["precision"] - old["precision"], 4),
+        "recall_change": round(new["recall"] - old["recall"], 4),
+    }
+
+
+if __name__ == "__main__":
+    from main import Catalog, ResultCache, DetectionStore, classify_image, create_session
+
+    parser = argparse.ArgumentParser(description="Re-sort already classified images against a new threshold.")
+    parser.add_argument("threshold", type=float, help="New tab confidence threshold")
+    parser.add_argument("--low", type=float, default=LOW_BAND, help="Cascade low band the images were sorted with")
+    parser.add_argument("--high", type=float, default=HIGH_BAND, help="Cascade high band the images were sorted with")
+    parser.add_argument("--test-data", help="YOLO data folder holding images/test and labels/test "
+                                            "(default: training/data)")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(script_dir, "../")
+    repo_root = os.path.join(project_root, "../")
+    onnx_model_path = os.path.join(project_root, "models/best.onnx")
+    images_dir = os.path.join(project_root, "static/images")
+    test_data = args.test_data or os.path.join(repo_root, "training/data")
+
+    store = DetectionStore(os.path.join(project_root, "detections.db"))
+    old_threshold = current_threshold(store)
+    summary = reclassify(store, args.threshold, os.path.join(images_dir, "with_tabs"),
+                         os.path.join(images_dir, "without_tabs"), Catalog(os.path.join(project_root, "catalog.db")),
+                         low=args.low, high=args.high)
+    print(f"\nRe-sorted {summary['checked']} images at threshold {args.threshold} (was {old_threshold}): "
+          f"{summary['to_with_tabs']} moved to with_tabs, {summary['to_without_tabs']} to without_tabs, "
+          f"{summary['missing']} missing on disk.")
+    if summary["first_pass_skipped"]:
+        print(f"{len(summary['first_pass_skipped'])} images decided by the cascade's first pass were left in place: "
+              f"{args.threshold} is outside its bands ({args.low}, {args.high}). Move them back and re-run "
+              f"main.py without --cascade to re-sort them:")
+        for file_name in summary["first_pass_skipped"]:
+            print(f"  {file_name}")
+
+    test_images = os.path.join(test_data, "images/test")
+    if os.path.isdir(test_images):
+        cache = ResultCache(os.path.join(project_root, "inference_cache.db"), onnx_model_path)
+        session = None
+
+        def classify(image):
+            global session
+            session = session or create_session(onnx_model_path)
+            return classify_image(session, image, conf_threshold=DETECTION_FLOOR)
+
+        scored = split_scores(test_images, os.path.join(test_data, "labels/test"), cache, classify)
+        shift = threshold_shift(scored, old_threshold, args.threshold)
+        print(f"Test split ({shift['images']} images): "
+              f"precision {shift['old']['precision']} -> {shift['new']['precision']}, "
+              f"recall {shift['old']['recall']} -> {shift['new']['recall']}")
+    else:
+        print(f"No labeled test split at {test_images}; skipping precision/recall.")
@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from urllib.request import pathname2url
+import numpy as np
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of decoded detections, keyed by image content hash and model file hash:
+    - An unchanged image run through an unchanged models/best.onnx skips inference entirely.
+    - Swapping the model (or its inference profile) changes the key, so stale results are never returned.
+    - Bounded to max_entries with least-recently-used eviction.
+    - read_only opens it for lookups only, e.g. in worker processes: hits are not timestamped
+      there, so a worker never holds a write lock on the shared file. Whoever owns the cache
+      records those hits with touch().
+    """
+
+    def __init__(self, db_path, model_path, max_entries=200000, commit_every=100, profile=None, read_only=False):
+        self.db_path = str(db_path)
+        self.model_hash = file_hash(model_path)
+        if profile and profile != "fp32":
+            self.model_hash += f":{profile}"  # Quantized profiles give slightly different scores
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.read_only = read_only
+
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro", uri=True,
+                                        check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   image_hash TEXT,
+                   model_hash TEXT,
+                   boxes BLOB,
+                   scores BLOB,
+                   class_ids BLOB,
+                   last_used REAL,
+                   PRIMARY KEY (image_hash, model_hash)
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+        self.conn.commit()
+
+    def _maybe_commit(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.conn.commit()
+            self.pending = 0
+
+    def get(self, image_hash):
+        """Return cached detections (boxes, scores, class_ids) for this image and model, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT boxes, scores, class_ids FROM results WHERE image_hash = ? AND model_hash = ?",
+                (image_hash, self.model_hash),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.read_only:
+                self._touch(image_hash)
+        return {
+            "boxes": np.frombuffer(row[0], dtype=np.float32).reshape(-1, 4),
+            "scores": np.frombuffer(row[1], dtype=np.float32),
+            "class_ids": np.frombuffer(row[2], dtype=np.int64),
+        }
+
+    def _touch(self, image_hash):
+        self.conn.execute(
+            "UPDATE results SET last_used = ? WHERE image_hash = ? AND model_hash = ?",
+            (time.time(), image_hash, self.model_hash),
+        )
+        self._maybe_commit()
+
+    def touch(self, image_hash):
+        """Mark an entry as just used, for hits a read-only copy of this cache served."""
+        with self.lock:
+            self._touch(image_hash)
+
+    def put(self, image_hash, detections):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    image_hash,
+                    self.model_hash,
+                    np.asarray(detections["boxes"], dtype=np.float32).tobytes(),
+                    np.asarray(detections["scores"], dtype=np.float32).tobytes(),
+                    np.asarray(detections["class_ids"], dtype=np.int64).tobytes(),
+                    time.time(),
+                ),
+            )
+            self._maybe_commit()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self.conn.commit()
+            self.pending = 0
+        return max(excess, 0)
+
+    def close(self):
+        if not self.read_only:
+            self.evict()
+        self.conn.close()
@@ -0,0 +1,243 @@
+import os
+import queue
+import shutil
+import argparse
+import multiprocessing as mp
+from profiles import PROFILES, create_profile_session
+from postprocess import CONFIDENCE_THRESHOLD, DETECTION_FLOOR, decode_detections, filter_detections
+from result_cache import ResultCache, file_hash
+from journal import SortJournal
+from letterbox import BatchBuffers
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def shard_worker(onnx_model, cache_path, batch_size, threads, conf_threshold, tasks, results, profile=None):
+    """
+    Worker process: holds its own InferenceSession and a read-only view of the result cache,
+    pulls lists of image paths from the task queue and returns (path, image_hash, detections,
+    cached) for each. detections is None if the image could not be read. Only the parent
+    writes to the cache, so workers never wait on each other's locks.
+    """
+    from main import create_session, load_input, resolve_batch_size, run_batch
+
+    session = create_session(onnx_model, threads=threads, profile=profile)
+    cache = ResultCache(cache_path, onnx_model, profile=profile, read_only=True) if cache_path else None
+    size = resolve_batch_size(session, batch_size)
+    fixed_batch = session.get_inputs()[0].shape[0] == size
+    buffer = BatchBuffers(size, count=1).next()
+
+    while True:
+        paths = tasks.get()
+        if paths is None:
+            break
+        decided = []
+        for start in range(0, len(paths), size):
+            pending = []
+            for slot, path in enumerate(paths[start:start + size]):
+                loaded = load_input(path, cache=cache, out=buffer[slot])
+                if loaded is None:
+                    decided.append((path, None, None, False))
+                elif loaded["detections"] is not None:
+                    decided.append((path, loaded["image_hash"], loaded["detections"], True))
+                else:
+                    pending.append((slot, path, loaded))
+            if pending:
+                outputs = run_batch(session, buffer, [slot for slot, _, _ in pending], fixed_batch)
+                for (_, path, loaded), output in zip(pending, outputs):
+                    detections = decode_detections(output, loaded["letterbox"], conf_threshold=conf_threshold)
+                    decided.append((path, loaded["image_hash"], detections, False))
+        results.put(decided)
+    if cache is not None:
+        cache.close()
+    results.put(None)
+
+
+def finish_move(source, destination):
+    """Carry out a journaled move; returns False if it already happened (or the file is gone)."""
+    if not os.path.exists(source):
+        return False
+    shutil.move(source, destination)
+    return True
+
+
+def finish_decisions(decided, catalog=None):
+    """
+    Complete an interrupted run's journaled decisions: carry out the moves that never happened
+    and record every label in the catalog, which the crash may have cut off after a move too.
+    Returns the number of moves completed.
+    """
+    finished = 0
+    for entry in decided.values():
+        finished += finish_move(entry["source"], entry["destination"])
+        if catalog is not None and os.path.exists(entry["destination"]):
+            catalog.set_label(entry["file"], entry["label"], entry["score"])
+    return finished
+
+
+def sort_sharded(onnx_model, input_folder, with_tabs_folder, without_tabs_folder, journal, processes=2,
+                 batch_size=1, threshold=CONFIDENCE_THRESHOLD, cache=None, store=None, catalog=None,
+                 thumbnails=None, progress=None, resume=True, profile=None):
+    """
+    Sort a large folder with several worker processes, each with its own InferenceSession:
+    - The CPU cores are split evenly between the workers' intra-op thread pools.
+    - profile picks one of the CPU inference profiles; the cache must use the same one.
+    - Workers pull batches of paths from a shared queue; this process journals each
+      decision, then moves the file and updates the cache, store and catalog.
+    - If the last run on this folder never finished, it is resumed: images it already
+      decided are skipped and its pending moves are completed. With resume=False every
+      unfinished run on the folder is closed in the journal and a new one starts.
+    Returns counts of the images sorted, like process_images.
+    """
+    os.makedirs(with_tabs_folder, exist_ok=True)
+    os.makedirs(without_tabs_folder, exist_ok=True)
+    folders = {"with_tabs": os.path.abspath(with_tabs_folder),
+               "without_tabs": os.path.abspath(without_tabs_folder)}
+    model_hash = cache.model_hash if cache is not None else file_hash(onnx_model)
+
+    if not resume:
+        superseded = journal.supersede(input_folder)
+        if superseded:
+            print(f"Starting fresh; {len(superseded)} interrupted run(s) will no longer be resumed.")
+    start, decided = journal.unfinished(input_folder)
+    if start is not None:
+        if start["threshold"] != threshold:
+            print(f"Resuming with the interrupted run's threshold {start['threshold']} (not {threshold}).")
+            threshold = start["threshold"]
+        journal.resume(start["run"])
+        finished = finish_decisions(decided, catalog)
+        print(f"Resuming run {start['run']}: {len(decided)} images already decided, "
+              f"{finished} pending moves completed.")
+    else:
+        journal.start(input_folder, threshold, model_hash)
+    if cache is not None and threshold < DETECTION_FLOOR:
+        # Cached detections stop at DETECTION_FLOOR, too high for this threshold
+        print(f"Threshold {threshold} is below the cached score floor {DETECTION_FLOOR}; not using the cache.")
+        cache = None
+
+    file_paths = [
+        os.path.join(os.path.abspath(input_folder), file_name)
+        for file_name in sorted(os.listdir(input_folder))
+        if file_name.lower().endswith(IMAGE_EXTENSIONS) and file_name not in decided
+    ]
+    summary = {"total": len(file_paths), "with_tabs": 0, "without_tabs": 0, "errors": 0, "cached": 0,
+               "resumed": len(decided)}
+
+    batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+    processes = max(1, min(processes, len(batches)))
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    context = mp.get_context("spawn")  # Fresh interpreters: no forked ONNX Runtime thread pools
+    tasks = context.Queue()
+    results = context.Queue()
+    for batch in batches:
+        tasks.put(batch)
+    for _ in range(processes):
+        tasks.put(None)
+
+    if profile:
+        # Quantize and optimize once here, before the workers all try to build the same files
+        create_profile_session(onnx_model, profile, threads=1)
+    cache_path = cache.db_path if cache is not None else None
+    workers = [
+        context.Process(target=shard_worker, daemon=True,
+                        args=(onnx_model, cache_path, batch_size, threads, min(threshold, DETECTION_FLOOR),
+                              tasks, results, profile))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"Sorting {len(file_paths)} images with {processes} processes x {threads} threads.")
+
+    running = processes
+    done = 0
+    while running:
+        try:
+            batch = results.get(timeout=5)
+        except queue.Empty:
+            if any(worker.exitcode not in (None, 0) for worker in workers):
+                raise RuntimeError("A sorting worker died; run again to resume from the journal.")
+            continue
+        if batch is None:
+            running -= 1
+            continue
+
+        moves = []
+        for file_path, image_hash, all_detections, cached in batch:
+            file_name = os.path.basename(file_path)
+            if all_detections is None:
+                print(f"Error reading file: {file_path}")
+                summary["errors"] += 1
+                continue
+            if cached:
+                summary["cached"] += 1
+                if cache is not None:
+                    cache.touch(image_hash)  # Workers read the cache read-only; hits are timestamped here
+            elif cache is not None:
+                cache.put(image_hash, all_detections)
+            detections = filter_detections(all_detections, threshold)
+            label = "with_tabs" if len(detections["scores"]) else "without_tabs"
+            scores = all_detections["scores"]
+            max_score = float(scores.max()) if len(scores) else 0.0
+            if store is not None:
+                store.record(file_name, label, all_detections, image_hash, model_hash, threshold)
+            moves.append((file_name, label, max_score, file_path, os.path.join(folders[label], file_name)))
+            summary[label] += 1
+
+        # Journal first, so a crash between here and the moves loses nothing
+        journal.record(moves)
+        for file_name, label, max_score, source, destination in moves:
+            finish_move(source, destination)
+            if catalog is not None:
+                catalog.set_label(file_name, label, max_score)
+            print(f"{file_name} -> {label} ({max_score:.2f})")
+
+        done += len(batch)
+        if progress:
+            progress(done, summary["total"])
+
+    for worker in workers:
+        worker.join()
+    if cache is not None:
+        cache.evict()
+    if store is not None:
+        store.commit()
+    journal.end(summary)
+    if thumbnails is not None:
+        thumbnails.backfill()
+    return summary
+
+
+if __name__ == "__main__":
+    from main import Catalog, DetectionStore, ThumbnailGenerator
+
+    parser = argparse.ArgumentParser(description="Sort a large image folder with several worker processes.")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Worker processes, each with its own inference session")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per task handed to a worker")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD, help="Tab confidence threshold")
+    parser.add_argument("--no-cache", action="store_true", help="Always run the model, ignoring cached results")
+    parser.add_argument("--profile", choices=PROFILES, help="CPU inference profile (see profiles.py)")
+    parser.add_argument("--fresh", action="store_true", help="Start a new run even if the last one was interrupted")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.join(script_dir, "../")
+
+    onnx_model_path = os.path.join(project_root, "models/best.onnx")
+    input_dir = os.path.join(project_root, "static/images")
+    cache = None if args.no_cache else ResultCache(os.path.join(project_root, "inference_cache.db"), onnx_model_path,
+                                                   profile=args.profile)
+    catalog = Catalog(os.path.join(project_root, "catalog.db"))
+    journal = SortJournal(os.path.join(project_root, "sort_journal.jsonl"))
+
+    summary = sort_sharded(onnx_model_path, input_dir, os.path.join(input_dir, "with_tabs"),
+                           os.path.join(input_dir, "without_tabs"), journal, processes=args.processes,
+                           batch_size=args.batch_size, threshold=args.threshold, cache=cache,
+                           store=DetectionStore(os.path.join(project_root, "detections.db")), catalog=catalog,
+                           thumbnails=ThumbnailGenerator(input_dir, os.path.join(project_root, "static/thumbs"),
+                                                         catalog),
+                           resume=not args.fresh, profile=args.profile)
+    journal.close()
+    print(f"Sorted {summary['total']} images: {summary['with_tabs']} with tabs, "
+          f"{summary['without_tabs']} without, {summary['cached']} from cache, {summary['errors']} errors"
+          f" ({summary['resumed']} already sorted by the interrupted run).")
@@ -1,9 +1,180 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_from_directory, url_for, g
 import os
+import sys
+import time
+import uuid
+import hashlib
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(ROOT_DIR, 'App/models/best.onnx')
+IMAGES_DIR = os.path.join(ROOT_DIR, 'App/static/images')
+WITH_TABS_DIR = os.path.join(IMAGES_DIR, 'with_tabs')
+WITHOUT_TABS_DIR = os.path.join(IMAGES_DIR, 'without_tabs')
+CACHE_PATH = os.path.join(ROOT_DIR, 'App/inference_cache.db')
+DETECTIONS_PATH = os.path.join(ROOT_DIR, 'App/detections.db')
+THUMBS_DIR = os.path.join(ROOT_DIR, 'App/static/thumbs')
+CATALOG_PATH = os.path.join(ROOT_DIR, 'App/catalog.db')
+TEST_DATA_DIR = os.path.join(ROOT_DIR, 'training/data')
+JOB_WORKERS = int(os.getenv('TABBOT_JOB_WORKERS', '2'))
+JOB_TTL = int(os.getenv('TABBOT_JOB_TTL', '3600'))  # Seconds a finished job stays pollable
+MAX_JOBS = 1000  # Finished jobs beyond this are dropped oldest first
+MAX_BATCH_SIZE = 256
+INFERENCE_PROFILE = os.getenv('TABBOT_INFERENCE_PROFILE') or None  # fp32, int8-dynamic or int8-static
+
+sys.path.insert(0, os.path.join(ROOT_DIR, 'App'))
+from scripts import load_script
+from catalog import Catalog
+from thumbnails import ThumbnailGenerator
+from metrics import TIMERS
+
+yolo = load_script('yolo_main', 'yolo/main.py')
+reclassify = load_script('yolo_reclassify', 'yolo/reclassify.py')
+
+
+class JobQueue:
+    """
+    Runs background jobs on a small thread pool and keeps their status:
+    - Each job gets an ID that can be polled for progress.
+    - Jobs that touch the same folder hold a lock so they never move the same files.
+    - Finished jobs are dropped after `ttl` seconds, and the oldest first once there are
+      more than `max_jobs`, so the table does not grow for the life of the server.
+    """
+
+    def __init__(self, workers=2, ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.folder_locks = {}
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+
+    def _prune(self):
+        finished = sorted((job["finished"], job_id) for job_id, job in self.jobs.items() if job["finished"])
+        cutoff = (datetime.now() - timedelta(seconds=self.ttl)).isoformat()
+        excess = len(self.jobs) + 1 - self.max_jobs  # Room for the job being added
+        for finished_at, job_id in finished:
+            if finished_at >= cutoff and excess <= 0:
+                break
+            del self.jobs[job_id]
+            excess -= 1
+
+    def submit(self, kind, folder, func, **kwargs):
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self._prune()
+            self.jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "done": 0,
+                "total": None,
+                "result": None,
+                "error": None,
+                "created": datetime.now().isoformat(),
+                "finished": None,
+            }
+            folder_lock = self.folder_locks.setdefault(folder, threading.Lock())
+        self.executor.submit(self._run, job_id, folder_lock, func, kwargs)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def _run(self, job_id, folder_lock, func, kwargs):
+        with folder_lock:
+            self._update(job_id, status="running")
+            try:
+                result = func(progress=lambda done, total: self._update(job_id, done=done, total=total), **kwargs)
+                self._update(job_id, status="finished", result=result)
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e))
+            finally:
+                self._update(job_id, finished=datetime.now().isoformat())
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def all(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+
+jobs = JobQueue(workers=JOB_WORKERS)
+
+
+def json_params():
+    """The request's JSON body as a dict ({} if there is none); raises ValueError for a 400 if it is not an object."""
+    params = request.get_json(silent=True)
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError("The request body must be a JSON object.")
+    return params
+
+
+def number_param(params, name, kind, default, minimum=None, maximum=None):
+    """Read an int or float from the JSON body; raises ValueError with a message for a 400."""
+    value = params.get(name, default)
+    try:
+        if isinstance(value, bool) or (kind is int and isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}.")
+    if not ((minimum is None or value >= minimum) and (maximum is None or value <= maximum)):
+        raise ValueError(f"{name} must be between {minimum} and {maximum}.")
+    return value
+
+
+# Load the model once and keep it warm for every /run_yolo call
+session = yolo.create_session(MODEL_PATH, profile=INFERENCE_PROFILE) if os.path.exists(MODEL_PATH) else None
+if session is None:
+    print(f"Warning: model not found at {MODEL_PATH}; /run_yolo is disabled.")
+cache = yolo.ResultCache(CACHE_PATH, MODEL_PATH, profile=INFERENCE_PROFILE) if session is not None else None
+store = yolo.DetectionStore(DETECTIONS_PATH)
+
+catalog = Catalog(CATALOG_PATH)
+if len(catalog) == 0:
+    # First start with a catalog: index the files that are already on disk, once
+    catalog.sync_folder(IMAGES_DIR, 'unsorted')
+    catalog.sync_folder(WITH_TABS_DIR, 'with_tabs')
+    catalog.sync_folder(WITHOUT_TABS_DIR, 'without_tabs')
+
+thumbnails = ThumbnailGenerator(IMAGES_DIR, THUMBS_DIR, catalog)
+# Make thumbnails for anything indexed before they existed, in the background. Under the same folder
+# lock as /run_yolo, which backfills too, so the two never write the same thumbnails at once
+jobs.submit('thumbnails', IMAGES_DIR, lambda progress=None: {"generated": thumbnails.backfill()})
+
+# Time every request per endpoint (e.g. http:get_images), next to the sorter's and downloader's stages
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_timer(response):
+    if 'started' in g and request.endpoint:
+        TIMERS.record(f"http:{request.endpoint}", time.perf_counter() - g.started)
+    return response
+
+# Route to read the per-stage timers: calls, items/sec and p50/p99 latency since startup
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify(TIMERS.summary())
+
+@app.route('/metrics', methods=['DELETE'])
+def reset_metrics():
+    TIMERS.reset()
+    return '', 204
+
 # Route to fetch eBay images
 @app.route('/fetch_ebay', methods=['POST'])
 def fetch_ebay():
@@ -15,21 +186,121 @@ def fetch_ebay():
 # Route to run YOLO sorting
 @app.route('/run_yolo', methods=['POST'])
 def run_yolo():
-    # Call your YOLO sorting script (e.g., App/yolo/main.py)
-    subprocess.run(['python3', 'App/yolo/main.py'])
-    return jsonify({"status": "success", "message": "Images sorted."})
+    if session is None:
+        return jsonify({"status": "error", "message": "Model not loaded."}), 503
+
+    try:
+        params = json_params()
+        # Cached and stored scores stop at DETECTION_FLOOR, so lower thresholds would decide on truncated results
+        threshold = number_param(params, 'threshold', float, yolo.CONFIDENCE_THRESHOLD, yolo.DETECTION_FLOOR, 1.0)
+        batch_size = number_param(params, 'batch_size', int, 1, 1, MAX_BATCH_SIZE)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    job_id = jobs.submit(
+        'run_yolo', IMAGES_DIR, yolo.process_images,
+        onnx_model=MODEL_PATH,
+        input_folder=IMAGES_DIR,
+        with_tabs_folder=WITH_TABS_DIR,
+        without_tabs_folder=WITHOUT_TABS_DIR,
+        batch_size=batch_size,
+        session=session,
+        cache=cache,
+        threshold=threshold,
+        store=store,
+        catalog=catalog,
+        thumbnails=thumbnails,
+    )
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+def reclassify_job(threshold, progress=None):
+    old_threshold = reclassify.current_threshold(store)
+    summary = reclassify.reclassify(store, threshold, WITH_TABS_DIR, WITHOUT_TABS_DIR, catalog)
+    test_images = os.path.join(TEST_DATA_DIR, 'images/test')
+    if os.path.isdir(test_images):
+        classify = None
+        if session is not None:
+            classify = lambda image: yolo.classify_image(session, image, conf_threshold=yolo.DETECTION_FLOOR)
+        scored = reclassify.split_scores(test_images, os.path.join(TEST_DATA_DIR, 'labels/test'), cache, classify)
+        summary['test_split'] = reclassify.threshold_shift(scored, old_threshold, threshold)
+    return summary
+
+# Route to re-sort already classified images against a new threshold, using stored scores only
+@app.route('/reclassify', methods=['POST'])
+def reclassify_images():
+    try:
+        params = json_params()
+        if 'threshold' not in params:
+            raise ValueError("threshold is required.")
+        threshold = number_param(params, 'threshold', float, None, yolo.DETECTION_FLOOR, 1.0)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    job_id = jobs.submit('reclassify', IMAGES_DIR, reclassify_job, threshold=threshold)
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+# Route to check on background jobs
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(jobs.all())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job)
 
 # Route to get sorted images for display
 @app.route('/get_images', methods=['GET'])
 def get_images():
-    image_folder = 'App/static/images/with_tabs'  # Change to 'without_tabs' if needed
-    images = os.listdir(image_folder)
+    """
+    One page of the image catalog as a JSON list; the cursor for the next page is in X-Next-Cursor.
+    Query params: label (with_tabs, without_tabs, unsorted or all), min_score, max_score,
+    since, until (download date), sort (file_name, max_score, download_date), order, limit, cursor.
+    """
+    args = request.args
+    query = {
+        "label": args.get('label', 'with_tabs'),
+        "min_score": args.get('min_score', type=float),
+        "max_score": args.get('max_score', type=float),
+        "since": args.get('since'),
+        "until": args.get('until'),
+        "sort": args.get('sort', 'file_name'),
+        "order": args.get('order', 'asc'),
+        "limit": max(1, min(args.get('limit', 100, type=int), 1000)),
+        "cursor": args.get('cursor'),
+    }
+
+    # The catalog version changes on every write, so it identifies the page contents
+    etag = hashlib.sha1(f"{catalog.version()}|{sorted(query.items())}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+
+    try:
+        rows, next_cursor = catalog.page(**query)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
     image_data = []
-    for img in images:
-        item_number = img.split('.')[0]  # Extract eBay item number from filename
+    for file_name, label, max_score, download_date, thumbnail in rows:
+        item_number = file_name.split('.')[0]  # Extract eBay item number from filename
         ebay_link = f"https://www.ebay.com/itm/{item_number}"
-        image_data.append({"filename": img, "link": ebay_link})
-    return jsonify(image_data)
+        image_data.append({"filename": file_name, "link": ebay_link, "label": label,
+                           "score": max_score, "download_date": download_date,
+                           "thumbnail": url_for('get_thumbnail', name=thumbnail) if thumbnail else None})
+
+    response = jsonify(image_data)
+    response.set_etag(etag)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# Thumbnail names contain a hash of the image bytes, so a URL never changes content
+@app.route('/thumbs/<path:name>', methods=['GET'])
+def get_thumbnail(name):
+    response = send_from_directory(THUMBS_DIR, name, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8080)
+    # The reloader would import this module twice and load a second copy of the model
+    app.run(debug=True, port=8080, use_reloader=False)
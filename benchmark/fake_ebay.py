@@ -0,0 +1,173 @@
+import re
+import time
+import threading
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+import json
+import cv2
+import numpy as np
+
+BASE_SIZE = (1024, 768)  # Long edge of the largest variant served
+IMAGE_PATH = re.compile(r"^/images/(\d+)_(\d+)/s-l(\d+)\.jpg$")
+ITEM_ID_OFFSET = 100000000000
+
+
+class SyntheticCorpus:
+    """
+    Deterministic stand-in listings and photos:
+    - Item i has `images_per_item` photos; every `lookup_every`-th summary omits its image,
+      so the client has to look those items up.
+    - Photos are textured backgrounds with a can-like shape, a third of them with a small
+      bright "tab" rectangle. Every `duplicate_every`-th item reuses the previous item's
+      primary photo bytes, to exercise content dedup.
+    - Each s-l<N> variant is encoded once and then served from memory.
+    """
+
+    def __init__(self, items=500, images_per_item=3, seed=0, lookup_every=10, duplicate_every=25):
+        self.items = items
+        self.images_per_item = images_per_item
+        self.seed = seed
+        self.lookup_every = lookup_every
+        self.duplicate_every = duplicate_every
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    def item_id(self, index):
+        return f"v1|{ITEM_ID_OFFSET + index}|0"
+
+    def image(self, index, number):
+        if number == 0 and self.duplicate_every and index % self.duplicate_every == 1 and index > 0:
+            index -= 1
+        rng = np.random.default_rng(self.seed * 1000003 + index * 31 + number)
+        width, height = BASE_SIZE
+        image = cv2.GaussianBlur(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8), (3, 3), 0)
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        color = tuple(int(c) for c in rng.integers(40, 220, 3))
+        cx, cy = int(rng.integers(300, 724)), int(rng.integers(250, 518))
+        cv2.ellipse(image, (cx, cy), (150, 220), 0, 0, 360, color, -1)
+        if (index + number) % 3 == 0:
+            cv2.rectangle(image, (cx - 30, cy - 200), (cx + 30, cy - 170), (230, 230, 230), -1)
+        return image
+
+    def jpeg(self, index, number, size):
+        key = (index, number, size)
+        with self.lock:
+            if key in self.encoded:
+                return self.encoded[key]
+        image = self.image(index, number)
+        scale = min(1.0, size / max(BASE_SIZE))
+        if scale < 1.0:
+            image = cv2.resize(image, (int(BASE_SIZE[0] * scale), int(BASE_SIZE[1] * scale)),
+                               interpolation=cv2.INTER_AREA)
+        content = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+        with self.lock:
+            self.encoded[key] = content
+        return content
+
+    def item(self, index, base_url, summary=False):
+        urls = [f"{base_url}/images/{index}_{n}/s-l1600.jpg" for n in range(self.images_per_item)]
+        item = {
+            "itemId": self.item_id(index),
+            "title": f"Synthetic beer can {index}",
+            "itemCreationDate": f"2025-01-01T00:00:{index % 60:02d}.000Z",
+            "image": {"imageUrl": urls[0]},
+            "additionalImages": [{"imageUrl": url} for url in urls[1:]],
+        }
+        if summary and self.lookup_every and index % self.lookup_every == 0:
+            del item["image"]
+        return item
+
+    def index_of(self, item_id):
+        match = re.match(r"^v1\|(\d+)\|0$", item_id)
+        index = int(match.group(1)) - ITEM_ID_OFFSET if match else -1
+        return index if 0 <= index < self.items else None
+
+
+def make_handler(corpus, latency_ms=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def base_url(self):
+            return f"http://{self.headers['Host']}"
+
+        def send(self, status, body, content_type="application/json"):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/identity/v1/oauth2/token"):
+                return self.send(200, {"access_token": "stand-in-token", "expires_in": 7200,
+                                       "token_type": "Application Access Token"})
+            self.send(404, {"errors": [{"message": "not found"}]})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            path = unquote(url.path)
+
+            match = IMAGE_PATH.match(path)
+            if match:
+                index, number, size = (int(group) for group in match.groups())
+                if index >= corpus.items or number >= corpus.images_per_item:
+                    return self.send(404, b"", "image/jpeg")
+                return self.send(200, corpus.jpeg(index, number, size), "image/jpeg")
+
+            if path == "/buy/browse/v1/item_summary/search":
+                limit = int(query.get("limit", ["50"])[0])
+                offset = int(query.get("offset", ["0"])[0])
+                page = {"total": corpus.items, "limit": limit, "offset": offset,
+                        "itemSummaries": [corpus.item(i, self.base_url(), summary=True)
+                                          for i in range(offset, min(offset + limit, corpus.items))]}
+                if offset + limit < corpus.items:
+                    page["next"] = (f"{self.base_url()}{url.path}?limit={limit}&offset={offset + limit}"
+                                    f"&fieldgroups=EXTENDED")
+                return self.send(200, page)
+
+            if path == "/buy/browse/v1/item/" and "item_ids" in query:
+                indexes = [corpus.index_of(item_id) for item_id in query["item_ids"][0].split(",")]
+                return self.send(200, {"items": [corpus.item(i, self.base_url()) for i in indexes if i is not None]})
+
+            if path.startswith("/buy/browse/v1/item/"):
+                index = corpus.index_of(path.rsplit("/", 1)[1])
+                if index is not None:
+                    return self.send(200, corpus.item(index, self.base_url()))
+            self.send(404, {"errors": [{"message": "not found"}]})
+
+    return Handler
+
+
+def start_server(corpus, host="127.0.0.1", port=0, latency_ms=0.0):
+    """Serve the corpus on a background thread; returns (server, base_url). Call server.shutdown() to stop."""
+    server = ThreadingHTTPServer((host, port), make_handler(corpus, latency_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the eBay Browse API and image CDN.")
+    parser.add_argument("--items", type=int, default=500, help="Listings in the synthetic catalog")
+    parser.add_argument("--images-per-item", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every response")
+    args = parser.parse_args()
+
+    server, base_url = start_server(SyntheticCorpus(args.items, args.images_per_item), port=args.port,
+                                    latency_ms=args.latency_ms)
+    print(f"Stand-in eBay API at {base_url} (set EBAY_API_BASE={base_url}); Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "../App")
+sys.path.insert(0, os.path.abspath(APP_DIR))
+from fake_ebay import SyntheticCorpus, start_server
+from metrics import TIMERS
+from scripts import load_script
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+COMPARED = ("items_per_sec", "p50_ms", "p99_ms")
+
+
+def run_benchmark(workdir, items=300, images_per_item=3, model=None, profile=None, batch_size=8, workers=8,
+                  latency_ms=0.0, seed=0):
+    """
+    Fetch -> sort -> serve against a local stand-in eBay server, in an isolated workdir:
+    - fetch: search pages, bulk item lookups and image downloads through EbayBrowseAPI.
+    - sort: process_images on everything fetched (skipped if there is no model).
+    - serve: every catalog page, as /get_images reads them.
+    Returns a report with per-phase results and the per-stage timers (App/metrics.py).
+    report["failures"] counts failed downloads and unreadable images; a run with any is not a valid measurement.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    started_at = datetime.now().isoformat()
+    corpus = SyntheticCorpus(items, images_per_item, seed=seed)
+    server, base_url = start_server(corpus, latency_ms=latency_ms)
+    # Before the eBay module loads, so its load_dotenv() does not override them
+    os.environ.update(EBAY_API_BASE=base_url, EBAY_APP_ID="benchmark", EBAY_CERT_ID="benchmark",
+                      EBAY_REQUESTS_PER_SECOND="0", EBAY_DOWNLOAD_WORKERS=str(workers))
+    ebay = load_script("ebay_main", "ebay/main.py")
+    TIMERS.reset()
+    phases = {}
+
+    api = ebay.EbayBrowseAPI(root_dir=workdir)
+    stats = ebay.DownloadStats()
+    started = time.perf_counter()
+    calls = 0
+    chunk = []
+    for item in api.iter_items("benchmark", max_items=items):
+        chunk.append(item)
+        if len(chunk) == ebay.DOWNLOAD_CHUNK:
+            tasks, harvest = api.harvest_images(chunk)
+            calls += harvest["api_calls"]
+            api.download_images(tasks, stats)
+            chunk = []
+    if chunk:
+        tasks, harvest = api.harvest_images(chunk)
+        calls += harvest["api_calls"]
+        api.download_images(tasks, stats)
+    phases["fetch"] = dict(stats.summary(), seconds=round(time.perf_counter() - started, 3), lookup_calls=calls)
+
+    images_dir = os.path.join(workdir, "static", "images")
+    if model and os.path.exists(model):
+        yolo = load_script("yolo_main", "yolo/main.py")
+        session = yolo.create_session(model, profile=profile)
+        started = time.perf_counter()
+        summary = yolo.process_images(model, images_dir, os.path.join(images_dir, "with_tabs"),
+                                      os.path.join(images_dir, "without_tabs"), batch_size=batch_size,
+                                      workers=workers, session=session, catalog=api.catalog)
+        seconds = time.perf_counter() - started
+        phases["sort"] = dict(summary, seconds=round(seconds, 3),
+                              images_per_sec=round(summary["total"] / seconds, 1) if seconds else None)
+    else:
+        phases["sort"] = {"skipped": f"no model at {model}"}
+
+    started = time.perf_counter()
+    pages = rows_served = 0
+    cursor = None
+    while True:
+        with TIMERS.time("serve_page"):
+            rows, cursor = api.catalog.page(label="all", limit=100, cursor=cursor)
+        pages += 1
+        rows_served += len(rows)
+        if cursor is None:
+            break
+    phases["serve"] = {"pages": pages, "rows": rows_served, "seconds": round(time.perf_counter() - started, 3)}
+
+    server.shutdown()
+    return {
+        "started": started_at,
+        "failures": phases["fetch"]["failed"] + phases["sort"].get("errors", 0),
+        "config": {"items": items, "images_per_item": images_per_item, "model": model, "profile": profile,
+                   "batch_size": batch_size, "workers": workers, "latency_ms": latency_ms, "seed": seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "phases": phases,
+        "stages": TIMERS.summary(),
+    }
+
+
+def compare(report, baseline):
+    """Print each stage's images/sec and p50/p99 next to a previous run's."""
+    print(f"\n{'stage':<22}" + "".join(f"{metric:>24}" for metric in COMPARED))
+    for stage, row in report["stages"].items():
+        old = baseline["stages"].get(stage, {})
+        cells = []
+        for metric in COMPARED:
+            new_value, old_value = row.get(metric), old.get(metric)
+            if new_value is None or not old_value:
+                cells.append(f"{str(new_value):>24}")
+            else:
+                cells.append(f"{f'{old_value} -> {new_value} ({(new_value / old_value - 1) * 100:+.0f}%)':>24}")
+        print(f"{stage:<22}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end fetch -> sort -> serve benchmark on synthetic data.")
+    parser.add_argument("--items", type=int, default=300, help="Listings in the synthetic catalog")
+    parser.add_argument("--images-per-item", type=int, default=3)
+    parser.add_argument("--model", default=os.path.join(APP_DIR, "models/best.onnx"), help="ONNX model to sort with")
+    parser.add_argument("--profile", help="CPU inference profile (see App/yolo/profiles.py)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8, help="Download and preprocessing threads")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated network latency per request")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic corpus seed")
+    parser.add_argument("--workdir", help="Keep the downloaded corpus and databases here (default: a temp dir)")
+    parser.add_argument("--output", help="Report path (default: benchmark/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="A previous report to compare against")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="tabbot-bench-")
+    try:
+        report = run_benchmark(workdir, args.items, args.images_per_item, args.model, args.profile,
+                               args.batch_size, args.workers, args.latency_ms, args.seed)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for phase, result in report["phases"].items():
+        print(f"{phase}: {result}")
+    print(f"\n{'stage':<22}{'calls':>8}{'items/s':>12}{'per busy s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:<22}{row['calls']:>8}{str(row['items_per_sec']):>12}{str(row['items_per_busy_sec']):>12}"
+              f"{row['p50_ms']:>10}{row['p99_ms']:>10}")
+    print(f"\nReport written to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    if report["failures"]:
+        print(f"\nFAILED: {report['phases']['fetch']['failed']} downloads failed and "
+              f"{report['phases']['sort'].get('errors', 0)} images could not be sorted; see the log above.")
+        sys.exit(1)
@@ -1,88 +1,222 @@
 import os
+import json
 import shutil
-import random
-
-# Define paths
-project_root = os.getcwd()  # Assumes script is run from project root
-pre_batch_dir = os.path.join(project_root, 'pre_batch')
-post_batch_dir = os.path.join(project_root, 'post_batch')
-output_dir = os.path.join(project_root, 'data')
-
-# Create output directories
-output_image_dir = os.path.join(output_dir, 'images')
-output_label_dir = os.path.join(output_dir, 'labels')
-os.makedirs(os.path.join(output_image_dir, 'train'), exist_ok=True)
-os.makedirs(os.path.join(output_image_dir, 'val'), exist_ok=True)
-os.makedirs(os.path.join(output_image_dir, 'test'), exist_ok=True)
-os.makedirs(os.path.join(output_label_dir, 'train'), exist_ok=True)
-os.makedirs(os.path.join(output_label_dir, 'val'), exist_ok=True)
-os.makedirs(os.path.join(output_label_dir, 'test'), exist_ok=True)
+import hashlib
+import argparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, links fall back to copies
+    fcntl = None
+
+SPLITS = ("train", "val", "test")
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+MANIFEST_NAME = "split_manifest.json"
+FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone (btrfs, xfs)
+
 
 # Function to get all batch folders
 def get_batch_folders(root_dir):
     return [f for f in os.listdir(root_dir) if f.startswith('batch_') and os.path.isdir(os.path.join(root_dir, f))]
 
-# Get batch folders from both directories
-pre_batch_folders = get_batch_folders(pre_batch_dir)
-post_batch_folders = get_batch_folders(post_batch_dir)
-
-# Ensure both directories have the same batch folders
-if set(pre_batch_folders) != set(post_batch_folders):
-    print("Error: Batch folders in /pre_batch and /post_batch do not match.")
-    exit(1)
-
-# Collect all matched image and label pairs
-matched_files = []
-
-# Iterate through each batch folder
-for batch_folder in pre_batch_folders:
-    pre_batch_path = os.path.join(pre_batch_dir, batch_folder)
-    post_batch_path = os.path.join(post_batch_dir, batch_folder)
-
-    # Get all image files in the pre_batch folder
-    image_files = [f for f in os.listdir(pre_batch_path) if f.endswith(('.jpg', '.png', '.jpeg'))]
-
-    # Process each image file
-    for image_file in image_files:
-        image_name = os.path.splitext(image_file)[0]
-        txt_file = f"{image_name}.txt"
-
-        # Check if corresponding .txt file exists in post_batch
-        txt_path = os.path.join(post_batch_path, txt_file)
-        if os.path.exists(txt_path):
-            matched_files.append((os.path.join(pre_batch_path, image_file), txt_path))
-        else:
-            print(f"Removing {image_file} (no corresponding .txt file)")
-
-# Shuffle the matched files to ensure random distribution
-random.shuffle(matched_files)
-
-# Split the data into train, val, and test sets
-total_files = len(matched_files)
-val_size = int(total_files * 0.1)  # 10% for validation
-test_size = int(total_files * 0.1)  # 10% for testing
-train_size = total_files - val_size - test_size  # Remaining for training
-
-train_files = matched_files[:train_size]
-val_files = matched_files[train_size:train_size + val_size]
-test_files = matched_files[train_size + val_size:]
-
-# Function to copy files to their respective directories
-def copy_files(file_pairs, image_output_dir, label_output_dir):
-    for image_path, label_path in file_pairs:
-        image_name = os.path.basename(image_path)
-        label_name = os.path.basename(label_path)
-        shutil.copy(image_path, os.path.join(image_output_dir, image_name))
-        shutil.copy(label_path, os.path.join(label_output_dir, label_name))
-
-# Copy files to their respective directories
-copy_files(train_files, os.path.join(output_image_dir, 'train'), os.path.join(output_label_dir, 'train'))
-copy_files(val_files, os.path.join(output_image_dir, 'val'), os.path.join(output_label_dir, 'val'))
-copy_files(test_files, os.path.join(output_image_dir, 'test'), os.path.join(output_label_dir, 'test'))
-
-print(f"Recombination and splitting complete!")
-print(f"Total files: {total_files}")
-print(f"Training set: {train_size} files")
-print(f"Validation set: {val_size} files")
-print(f"Test set: {test_size} files")
-print(f"Check the 'data' folder for the organized dataset.")
\ No newline at end of file
+
+def collect_pairs(pre_batch_dir, post_batch_dir):
+    """
+    Return {image_file: (image_path, label_path)} for every image in pre_batch with a
+    label in post_batch. Each batch folder is listed once; no per-file exists() calls.
+    """
+    pre_batch_folders = get_batch_folders(pre_batch_dir)
+    post_batch_folders = get_batch_folders(post_batch_dir)
+
+    # Ensure both directories have the same batch folders
+    if set(pre_batch_folders) != set(post_batch_folders):
+        print("Error: Batch folders in /pre_batch and /post_batch do not match.")
+        exit(1)
+
+    pairs = {}
+    for batch_folder in sorted(pre_batch_folders):
+        pre_batch_path = os.path.join(pre_batch_dir, batch_folder)
+        post_batch_path = os.path.join(post_batch_dir, batch_folder)
+        labels = {entry.name for entry in os.scandir(post_batch_path) if entry.name.endswith('.txt')}
+
+        for entry in os.scandir(pre_batch_path):
+            if not entry.name.endswith(IMAGE_EXTENSIONS):
+                continue
+            txt_file = f"{os.path.splitext(entry.name)[0]}.txt"
+            if txt_file in labels:
+                pairs[entry.name] = (entry.path, os.path.join(post_batch_path, txt_file))
+            else:
+                print(f"Skipping {entry.name} (no corresponding .txt file)")
+    return pairs
+
+
+def assign_split(image_file, seed, val_fraction=0.1, test_fraction=0.1):
+    """
+    Seeded split by hash of the file name: the same seed always puts an image in the
+    same split, no matter which other images exist, so new batches never reshuffle old ones.
+    """
+    digest = hashlib.sha256(f"{seed}:{image_file}".encode()).hexdigest()
+    position = int(digest[:8], 16) / 0x100000000
+    if position < val_fraction:
+        return "val"
+    if position < val_fraction + test_fraction:
+        return "test"
+    return "train"
+
+
+def source_stat(path):
+    """[size, mtime_ns] of a source file, recorded in the manifest to tell whether it changed."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def link_file(source, destination):
+    """
+    Place source at destination without copying its bytes where the filesystem allows:
+    a hardlink, else a reflink (copy-on-write clone), else a plain copy.
+    Returns the method used.
+    """
+    if os.path.lexists(destination):
+        if os.path.exists(destination) and os.path.samefile(source, destination):
+            return "current"
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        pass
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            pass
+    shutil.copy2(source, destination)
+    return "copy"
+
+
+def remove_strays(output_dir, files):
+    """
+    Delete everything in data/{images,labels}/<split> that the seeded split does not put there,
+    e.g. copies left by the old unseeded script, which would otherwise leak images across splits.
+    Returns how many files were removed.
+    """
+    expected = set()
+    for image_file, entry in files.items():
+        expected.add(("images", entry["split"], image_file))
+        expected.add(("labels", entry["split"], os.path.basename(entry["label"])))
+    removed = 0
+    for kind in ("images", "labels"):
+        for split in SPLITS:
+            for entry in os.scandir(os.path.join(output_dir, kind, split)):
+                if entry.is_file(follow_symlinks=False) and (kind, split, entry.name) not in expected:
+                    os.remove(entry.path)
+                    removed += 1
+    return removed
+
+
+def split_dataset(project_root, seed=0, val_fraction=0.1, test_fraction=0.1):
+    """
+    Build data/images/<split> and data/labels/<split> from the annotated batches:
+    - Every pair gets a seeded split, recorded in data/split_manifest.json.
+    - Incremental: only new, changed (by size and mtime) or moved pairs are linked, and pairs
+      that left the batches (or changed split) are removed from data/. Without a manifest
+      (first run, or data/ built by the old copy script) anything else in the split folders is removed.
+    - Files are hardlinked (or reflinked) rather than copied, so data/ takes no extra space.
+      Edit labels in post_batch, not data/: a hardlink shares the same file.
+    """
+    output_dir = os.path.join(project_root, 'data')
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous_files = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        previous_files = previous["files"]
+        if (previous["seed"], previous["val_fraction"], previous["test_fraction"]) != (seed, val_fraction,
+                                                                                       test_fraction):
+            print("Seed or fractions changed: pairs will move between splits.")
+
+    for split in SPLITS:
+        os.makedirs(os.path.join(output_dir, 'images', split), exist_ok=True)
+        os.makedirs(os.path.join(output_dir, 'labels', split), exist_ok=True)
+
+    pairs = collect_pairs(os.path.join(project_root, 'pre_batch'), os.path.join(project_root, 'post_batch'))
+    counts = {"linked": 0, "current": 0, "removed": 0, "strays": 0, "hardlink": 0, "reflink": 0, "copy": 0}
+    files = {}
+    for image_file, (image_path, label_path) in sorted(pairs.items()):
+        split = assign_split(image_file, seed, val_fraction, test_fraction)
+        files[image_file] = {"split": split, "image": image_path, "label": label_path,
+                             "image_stat": source_stat(image_path), "label_stat": source_stat(label_path)}
+
+    if not previous_files:
+        counts["strays"] = remove_strays(output_dir, files)
+
+    # Remove links for pairs that are gone or now belong to another split
+    for image_file, old in previous_files.items():
+        if image_file in files and files[image_file]["split"] == old["split"]:
+            continue
+        for kind, name in (("images", image_file), ("labels", os.path.basename(old["label"]))):
+            path = os.path.join(output_dir, kind, old["split"], name)
+            if os.path.lexists(path):
+                os.remove(path)
+        counts["removed"] += 1
+
+    for image_file, entry in files.items():
+        split = entry["split"]
+        image_destination = os.path.join(output_dir, 'images', split, image_file)
+        label_destination = os.path.join(output_dir, 'labels', split, os.path.basename(entry["label"]))
+        # Unchanged sources already in place are skipped, whether they were linked or copied
+        old = previous_files.get(image_file)
+        if old == entry and os.path.lexists(image_destination) and os.path.lexists(label_destination):
+            counts["current"] += 1
+            continue
+        methods = [link_file(entry["image"], image_destination), link_file(entry["label"], label_destination)]
+        if methods == ["current", "current"]:
+            counts["current"] += 1
+            continue
+        counts["linked"] += 1
+        for method in methods:
+            if method != "current":
+                counts[method] += 1
+
+    manifest = {"seed": seed, "val_fraction": val_fraction, "test_fraction": test_fraction, "files": files}
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    sizes = {split: sum(1 for entry in files.values() if entry["split"] == split) for split in SPLITS}
+    return files, sizes, counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split annotated batches into data/images and data/labels.")
+    parser.add_argument("--seed", type=int, default=0, help="Split seed; the same seed always gives the same split")
+    parser.add_argument("--val", type=float, default=0.1, help="Fraction of pairs for validation")
+    parser.add_argument("--test", type=float, default=0.1, help="Fraction of pairs for testing")
+    parser.add_argument("--shards", nargs="*", choices=SPLITS,
+                        help="Also pack these splits (all if none given) into memory-mapped shards in data/shards")
+    args = parser.parse_args()
+
+    project_root = os.getcwd()  # Assumes script is run from project root
+    files, sizes, counts = split_dataset(project_root, args.seed, args.val, args.test)
+
+    print(f"Recombination and splitting complete!")
+    print(f"Total files: {len(files)}")
+    print(f"Training set: {sizes['train']} files")
+    print(f"Validation set: {sizes['val']} files")
+    print(f"Test set: {sizes['test']} files")
+    print(f"{counts['linked']} pairs linked ({counts['hardlink']} hardlinks, {counts['reflink']} reflinks, "
+          f"{counts['copy']} copies), {counts['current']} already current, {counts['removed']} removed, "
+          f"{counts['strays']} stray files cleared.")
+
+    if args.shards is not None:
+        from shards import write_shards
+
+        for split in args.shards or SPLITS:
+            pairs = [(image_file, entry["image"], entry["label"])
+                     for image_file, entry in files.items() if entry["split"] == split]
+            packed = write_shards(pairs, os.path.join(project_root, 'data', 'shards', split))
+            print(f"Shards for {split}: {packed} images packed" if packed else f"Shards for {split}: already current")
+
+    print(f"Check the 'data' folder for the organized dataset.")
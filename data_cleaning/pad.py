@@ -1,48 +1,162 @@
-from PIL import Image
 import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image
 
-def resize_and_pad(image, target_size=(640, 640)):
-    original_w, original_h = image.size
-    target_w, target_h = target_size
-
-    scale = min(target_w / original_w, target_h / original_h)
-    resized_w = int(original_w * scale)
-    resized_h = int(original_h * scale)
-    resized_image = image.resize((resized_w, resized_h), Image.Resampling.LANCZOS)
+# Same resize-and-pad code as the sorter, so training and serving see the same pixels
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../App/yolo"))
+from letterbox import letterbox_image
 
-    new_image = Image.new("RGB", target_size, (0, 0, 0))
-    paste_x = (target_w - resized_w) // 2
-    paste_y = (target_h - resized_h) // 2
-    new_image.paste(resized_image, (paste_x, paste_y))
+IMAGE_EXTENSIONS = tuple(Image.registered_extensions())  # Every format PIL can open
+MANIFEST_NAME = "manifest.json"
+SAVE_EVERY = 500  # Write the manifest every N processed files, so an interrupted run can resume
 
-    return new_image
 
-input_dir = "train"  # Replace with your directory
-output_dir = "640"  # Replace with your directory
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-print(f"Input directory: {input_dir}")
-print(f"Output directory: {output_dir}")
 
-# Walk through the input directory
-for root, dirs, files in os.walk(input_dir):
-    print(f"Scanning directory: {root}")
-    for file_name in files:
-        print(f"Found file: {file_name}")
-        if file_name.startswith("._") or not file_name.lower().endswith(".webp"):
-            print(f"Skipping: {file_name}")
-            continue
+def read_image(path):
+    """Decode any image OpenCV or PIL can read (jpg, png, webp, bmp, tiff, gif, ...) as BGR."""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is not None:
+        return image
+    with Image.open(path) as img:
+        return cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
 
-        input_path = os.path.join(root, file_name)
-        relative_path = os.path.relpath(input_path, input_dir)
-        output_path = os.path.join(output_dir, relative_path.replace(".webp", ".jpg"))
 
+def resize_and_pad(task):
+    """
+    Letterbox one image and write it as JPEG (via a temp file, so a crash never leaves
+    a half-written output). Returns its manifest entry, or an error string.
+    """
+    input_path, output_path, relative_path, target_size, quality, with_hash = task
+    try:
+        image = read_image(input_path)
+        padded, (scale, pad_left, pad_top, original_w, original_h) = letterbox_image(image, target_size)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        partial = output_path + ".tmp.jpg"
+        if not cv2.imwrite(partial, padded, [cv2.IMWRITE_JPEG_QUALITY, quality]):
+            raise OSError(f"could not write {output_path}")
+        os.replace(partial, output_path)
+    except Exception as e:
+        return relative_path, f"{type(e).__name__}: {e}"
+
+    stat = os.stat(input_path)
+    entry = {
+        "output": os.path.splitext(relative_path)[0] + ".jpg",
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": file_sha256(input_path) if with_hash else None,
+        "target": list(target_size),
+        "scale": scale,
+        "pad_left": pad_left,
+        "pad_top": pad_top,
+        "original_w": original_w,
+        "original_h": original_h,
+    }
+    return relative_path, entry
+
+
+def is_current(entry, input_path, output_path, target_size, with_hash):
+    """An output is current if it exists and its source is unchanged (same mtime and size, or same hash)."""
+    if not entry or entry.get("target") != list(target_size) or not os.path.exists(output_path):
+        return False
+    stat = os.stat(input_path)
+    if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return True
+    if with_hash and entry.get("sha256") and entry["sha256"] == file_sha256(input_path):
+        entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size  # Touched but not changed
+        return True
+    return False
+
+
+def save_manifest(manifest, path):
+    partial = path + ".tmp"
+    with open(partial, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(partial, path)
+
+
+def pad_directory(input_dir, output_dir, target_size=(640, 640), workers=None, quality=95, with_hash=False,
+                  verbose=False):
+    """
+    Letterbox every image under input_dir into output_dir (same layout, .jpg) on a process pool:
+    - Outputs whose source is unchanged since the last run are skipped.
+    - output_dir/manifest.json records, per source file, the letterbox scale and
+      offsets needed to map boxes between original and padded coordinates.
+    Returns counts of the files processed, skipped and failed.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    tasks = []
+    outputs = {}
+    summary = {"processed": 0, "skipped": 0, "failed": 0, "collisions": 0}
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.startswith(".") or not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue  # Hidden files, macOS "._" resource forks and non-images
+            input_path = os.path.join(root, file_name)
+            relative_path = os.path.relpath(input_path, input_dir)
+            output_path = os.path.join(output_dir, os.path.splitext(relative_path)[0] + ".jpg")
+            if output_path in outputs:
+                print(f"Skipping {relative_path}: {outputs[output_path]} already writes {output_path}")
+                summary["collisions"] += 1
+                continue
+            outputs[output_path] = relative_path
+            if is_current(manifest.get(relative_path), input_path, output_path, target_size, with_hash):
+                summary["skipped"] += 1
+                continue
+            tasks.append((input_path, output_path, relative_path, target_size, quality, with_hash))
+
+    print(f"{len(tasks)} images to process, {summary['skipped']} already current.")
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=cv2.setNumThreads, initargs=(1,)) as executor:
+        for done, (relative_path, result) in enumerate(executor.map(resize_and_pad, tasks, chunksize=16), 1):
+            if isinstance(result, str):
+                print(f"Failed to process {relative_path}: {result}")
+                summary["failed"] += 1
+            else:
+                manifest[relative_path] = result
+                summary["processed"] += 1
+                if verbose:
+                    print(f"Processed: {relative_path}")
+            if done % SAVE_EVERY == 0:
+                save_manifest(manifest, manifest_path)
+                print(f"{done}/{len(tasks)} done")
+    save_manifest(manifest, manifest_path)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Letterbox images for annotation (YOLO 640x640).")
+    parser.add_argument("input_dir", nargs="?", default="train", help="Folder of source images (searched recursively)")
+    parser.add_argument("output_dir", nargs="?", default="640", help="Folder for the padded .jpg files")
+    parser.add_argument("--size", type=int, default=640, help="Square output size")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG quality of the outputs")
+    parser.add_argument("--hash", action="store_true",
+                        help="Also compare content hashes, so touched-but-unchanged sources are not redone")
+    parser.add_argument("--verbose", action="store_true", help="Print a line per processed file")
+    args = parser.parse_args()
 
-        try:
-            with Image.open(input_path) as img:
-                img = img.convert("RGB")
-                resized_image = resize_and_pad(img, target_size=(640, 640))
-                resized_image.save(output_path, "JPEG")
-            print(f"Processed: {input_path} -> {output_path}")
-        except Exception as e:
-            print(f"Failed to process {input_path}: {e}")
+    print(f"Input directory: {args.input_dir}")
+    print(f"Output directory: {args.output_dir}")
+    summary = pad_directory(args.input_dir, args.output_dir, (args.size, args.size), args.workers, args.quality,
+                            args.hash, args.verbose)
+    print(f"Processed {summary['processed']}, skipped {summary['skipped']} current, "
+          f"{summary['failed']} failed, {summary['collisions']} name collisions.")
@@ -1,5 +1,11 @@
 import os
+import sys
+import json
 import shutil
+import argparse
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../App")
 
 def move_files_to_parent():
     """
@@ -34,6 +40,73 @@ def move_files_to_parent():
     print("All files moved back to parent directory.")
 
 
+def revert_run(journal_path, run=None, catalog=None, store=None):
+    """
+    Undo one sorting run by replaying its journaled moves backwards (see App/yolo/journal.py).
+    Only the files that run moved are touched; no folders are scanned.
+    Defaults to the most recent run that has not been reverted yet.
+    Each file moved back is marked unsorted in the Catalog and dropped from the DetectionStore,
+    so /get_images and /reclassify stop pointing at the folder it left.
+    """
+    records = []
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Torn line from a crash
+
+    reverted = {record["run"] for record in records if record.get("event") == "revert"}
+    if run is None:
+        runs = [record["run"] for record in records if record.get("event") == "start"
+                and record["run"] not in reverted]
+        if not runs:
+            print("Nothing to revert.")
+            return 0
+        run = runs[-1]
+    elif run in reverted:
+        print(f"Run {run} was already reverted.")
+        return 0
+
+    moved = 0
+    decisions = [record for record in records if record.get("event") == "decision" and record.get("run") == run]
+    for record in reversed(decisions):
+        # Skip moves that never happened or whose file has since been moved again
+        if os.path.exists(record["destination"]) and not os.path.exists(record["source"]):
+            shutil.move(record["destination"], record["source"])
+            moved += 1
+            if catalog is not None:
+                catalog.set_label(record["file"], "unsorted")
+            if store is not None:
+                store.forget(record["file"])
+            print(f"Moved {record['file']} from '{record['label']}' back to {os.path.dirname(record['source'])}.")
+
+    if store is not None:
+        store.commit()
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"event": "revert", "run": run, "time": datetime.now().isoformat(),
+                            "moved": moved}) + "\n")
+    print(f"Reverted run {run}: {moved} of {len(decisions)} files moved back.")
+    return moved
+
+
 if __name__ == "__main__":
-    # Move files
-    move_files_to_parent()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Move sorted images back to their parent folder.")
+    parser.add_argument("--journal", help="Sort journal to replay (e.g. App/sort_journal.jsonl) "
+                                          "instead of scanning with_tabs/without_tabs in the current folder")
+    parser.add_argument("--run", help="Run id to revert (default: the latest one not yet reverted)")
+    args = parser.parse_args()
+
+    if args.journal:
+        # The sorter keeps its catalog and detection store next to the journal (App/)
+        sys.path.append(APP_DIR)
+        sys.path.append(os.path.join(APP_DIR, "yolo"))
+        from catalog import Catalog
+        from detection_store import DetectionStore
+
+        app_dir = os.path.dirname(os.path.abspath(args.journal))
+        revert_run(args.journal, args.run, Catalog(os.path.join(app_dir, "catalog.db")),
+                   DetectionStore(os.path.join(app_dir, "detections.db")))
+    else:
+        # Move files
+        move_files_to_parent()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import hashlib
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../App/yolo"))
+from letterbox import letterbox_image
+
+SHARD_SIZE = 1024  # Images per shard file (about 1.2 GB at 640x640x3)
+INDEX_NAME = "index.json"
+
+
+def read_labels(label_path):
+    """YOLO label file -> list of [class_id, cx, cy, w, h] (normalized)."""
+    labels = []
+    with open(label_path) as f:
+        for line in f:
+            values = line.split()
+            if len(values) == 5:
+                labels.append([int(values[0])] + [float(v) for v in values[1:]])
+    return labels
+
+
+def fingerprint(pairs):
+    """Changes whenever a split gains, loses or modifies an image or label."""
+    digest = hashlib.sha256()
+    for file_name, image_path, label_path in pairs:
+        for path in (image_path, label_path):
+            stat = os.stat(path)
+            digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def write_shards(pairs, out_dir, target_size=(640, 640), shard_size=SHARD_SIZE):
+    """
+    Pack one split into memory-mappable shards:
+    - images_NNN.npy: uint8 (N, H, W, 3) BGR arrays, letterboxed exactly like the sorter does.
+    - index.json: per image its shard, row and labels (re-normalized to the padded frame).
+    pairs is a list of (file_name, image_path, label_path). An unchanged split is not rewritten.
+    Returns the number of images packed (0 if the shards were already current).
+    """
+    pairs = sorted(pairs)
+    current = fingerprint(pairs)
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            if json.load(f).get("fingerprint") == current:
+                return 0
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.startswith("images_") and name.endswith(".npy"):
+            os.remove(os.path.join(out_dir, name))
+
+    target_w, target_h = target_size
+    index = {"fingerprint": current, "target": [target_w, target_h], "shards": [], "images": []}
+    for shard_number, start in enumerate(range(0, len(pairs), shard_size)):
+        chunk = pairs[start:start + shard_size]
+        shard_name = f"images_{shard_number:03d}.npy"
+        partial = os.path.join(out_dir, shard_name + ".tmp")
+        array = np.lib.format.open_memmap(partial, mode="w+", dtype=np.uint8, shape=(len(chunk), target_h, target_w, 3))
+        for row, (file_name, image_path, label_path) in enumerate(chunk):
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if image is None:
+                print(f"Skipping {image_path}: cannot decode")
+                continue
+            array[row], (scale, pad_left, pad_top, original_w, original_h) = letterbox_image(image, target_size)
+            labels = [
+                [class_id,
+                 (cx * original_w * scale + pad_left) / target_w, (cy * original_h * scale + pad_top) / target_h,
+                 w * original_w * scale / target_w, h * original_h * scale / target_h]
+                for class_id, cx, cy, w, h in read_labels(label_path)
+            ]
+            index["images"].append({"file": file_name, "shard": shard_name, "row": row, "labels": labels})
+        array.flush()
+        del array
+        os.replace(partial, os.path.join(out_dir, shard_name))
+        index["shards"].append(shard_name)
+
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+    return len(index["images"])
+
+
+class ShardReader:
+    """
+    Stream a split written by write_shards without opening or decoding image files.
+    Images are read-only memory-mapped uint8 BGR arrays, ready for letterbox-free inference.
+    """
+
+    def __init__(self, split_dir):
+        with open(os.path.join(split_dir, INDEX_NAME)) as f:
+            index = json.load(f)
+        self.images = index["images"]
+        self.shards = {name: np.load(os.path.join(split_dir, name), mmap_mode="r") for name in index["shards"]}
+
+    def __len__(self):
+        return len(self.images)
+
+    def __iter__(self):
+        """Yield (file_name, image, labels) one image at a time."""
+        for entry in self.images:
+            yield entry["file"], self.shards[entry["shard"]][entry["row"]], entry["labels"]
+
+    def batches(self, batch_size):
+        """Yield (entries, images) with images a zero-copy (n, H, W, 3) slice of one shard where rows are contiguous."""
+        start = 0
+        while start < len(self.images):
+            first = self.images[start]
+            stop = start + 1
+            while (stop < len(self.images) and stop - start < batch_size
+                   and self.images[stop]["shard"] == first["shard"]
+                   and self.images[stop]["row"] == first["row"] + stop - start):
+                stop += 1
+            entries = self.images[start:stop]
+            yield entries, self.shards[first["shard"]][first["row"]:first["row"] + len(entries)]
+            start = stop
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app's modules import their siblings by plain name, as when run as scripts
+for folder in ("", "App", os.path.join("App", "yolo"), os.path.join("App", "ebay"), "data_cleaning"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
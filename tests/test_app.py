@@ -0,0 +1,82 @@
+import threading
+import time
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("onnxruntime")
+import app as server
+
+
+def wait_for(queue, job_id, status="finished"):
+    for _ in range(200):
+        if queue.get(job_id)["status"] == status:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_finished_jobs_are_pruned_oldest_first_and_running_ones_kept():
+    queue = server.JobQueue(workers=2, max_jobs=3)
+    release = threading.Event()
+    running = queue.submit("slow", "a", lambda progress=None: release.wait())
+    finished = [queue.submit("quick", "b", lambda progress=None: None) for _ in range(2)]
+    for job_id in finished:
+        wait_for(queue, job_id)
+
+    newest = queue.submit("quick", "b", lambda progress=None: None)
+    ids = {job["id"] for job in queue.all()}
+    assert ids == {running, finished[1], newest}
+    release.set()
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    queue = server.JobQueue(workers=1, ttl=0)
+    old = queue.submit("quick", "a", lambda progress=None: None)
+    wait_for(queue, old)
+    time.sleep(0.01)
+    new = queue.submit("quick", "a", lambda progress=None: None)
+    assert queue.get(old) is None
+    assert queue.get(new) is not None
+
+
+@pytest.mark.parametrize("value", ["abc", None, True, [1], 1.5])
+def test_number_param_rejects_non_numbers(value):
+    with pytest.raises(ValueError, match="must be an integer"):
+        server.number_param({"batch_size": value}, "batch_size", int, 1, 1, 256)
+
+
+def test_number_param_checks_the_range():
+    assert server.number_param({}, "batch_size", int, 8, 1, 256) == 8
+    assert server.number_param({"threshold": "0.5"}, "threshold", float, None, 0.1, 1.0) == 0.5
+    assert server.number_param({"batch_size": 4.0}, "batch_size", int, 1, 1, 256) == 4
+    with pytest.raises(ValueError, match="between 0.1 and 1.0"):
+        server.number_param({"threshold": 1.5}, "threshold", float, None, 0.1, 1.0)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "session", object())  # Passes the model check; nothing is queued on a 400
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("body", [{"batch_size": "many"}, {"batch_size": 0}, {"threshold": 0.01}, [1, 2]])
+def test_run_yolo_rejects_bad_parameters_with_400(client, body):
+    response = client.post("/run_yolo", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+@pytest.mark.parametrize("body", [{}, {"threshold": "high"}, {"threshold": 2}, ["threshold", 0.5]])
+def test_reclassify_rejects_bad_parameters_with_400(client, body):
+    assert client.post("/reclassify", json=body).status_code == 400
+
+
+
+@pytest.mark.parametrize("query", ["cursor=NQ%3D%3D", "cursor=!!", "sort=nope", "order=up"])
+def test_get_images_rejects_bad_queries_with_400(client, query):
+    assert client.get(f"/get_images?{query}").status_code == 400
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-5", "limit=5000"])
+def test_get_images_clamps_the_limit(client, query):
+    assert client.get(f"/get_images?{query}&label=all").status_code == 200
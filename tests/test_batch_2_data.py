@@ -0,0 +1,42 @@
+import sys
+import pytest
+from batch_2_data import assign_split, link_file
+
+
+def test_assign_split_is_stable_per_file():
+    names = [f"item_{i}_1.jpg" for i in range(2000)]
+    first = {name: assign_split(name, seed=42) for name in names}
+    # Same answer regardless of which or how many other files are split alongside it
+    again = {name: assign_split(name, seed=42) for name in reversed(names[:500])}
+    assert again == {name: first[name] for name in names[:500]}
+
+
+def test_assign_split_follows_the_fractions():
+    splits = [assign_split(f"item_{i}_1.jpg", seed=7, val_fraction=0.2, test_fraction=0.1) for i in range(10000)]
+    assert abs(splits.count("val") / len(splits) - 0.2) < 0.02
+    assert abs(splits.count("test") / len(splits) - 0.1) < 0.02
+    assert set(splits) == {"train", "val", "test"}
+
+
+def test_assign_split_depends_on_the_seed():
+    names = [f"item_{i}_1.jpg" for i in range(200)]
+    assert [assign_split(name, 1) for name in names] != [assign_split(name, 2) for name in names]
+    assert all(assign_split(name, 1, val_fraction=0, test_fraction=0) == "train" for name in names)
+
+
+def test_link_file_shares_or_copies_the_bytes(tmp_path):
+    source = tmp_path / "a.jpg"
+    source.write_bytes(b"image")
+    assert link_file(str(source), str(tmp_path / "b.jpg")) == "hardlink"
+    assert link_file(str(source), str(tmp_path / "b.jpg")) == "current"
+    (tmp_path / "c.jpg").write_bytes(b"stale")
+    assert link_file(str(source), str(tmp_path / "c.jpg")) == "hardlink"
+    assert (tmp_path / "c.jpg").read_bytes() == b"image"
+
+
+def test_imports_without_fcntl(monkeypatch):
+    monkeypatch.setitem(sys.modules, "fcntl", None)  # As on Windows
+    monkeypatch.delitem(sys.modules, "batch_2_data")
+    import batch_2_data
+    assert batch_2_data.fcntl is None
+    monkeypatch.delitem(sys.modules, "batch_2_data")
@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+from scripts import load_script
+from cascade import FIRST_PASS_SUFFIX, Cascade
+from detection_store import DetectionStore
+from reclassify import reclassify
+
+yolo = load_script('yolo_main', 'yolo/main.py')
+
+
+class FakeSession:
+    """Stands in for an InferenceSession: every image gets one centred box with the given score."""
+
+    def __init__(self, batch, size, score):
+        self.batch = batch
+        self.size = size
+        self.score = score
+        self.shapes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[self.batch, 3, self.size, self.size])]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output0")]
+
+    def run(self, names, feeds):
+        images = feeds["images"]
+        self.shapes.append(images.shape)
+        output = np.zeros((len(images), 5, 64), dtype=np.float32)
+        output[:, :, 0] = [self.size / 2, self.size / 2, self.size / 4, self.size / 4, self.score]
+        return [output]
+
+
+@pytest.fixture
+def folders(tmp_path):
+    os.makedirs(tmp_path / "input")
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / "input" / f"{i}.jpg"), np.full((60, 80, 3), 100 + i, dtype=np.uint8))
+    return str(tmp_path / "input"), str(tmp_path / "with_tabs"), str(tmp_path / "without_tabs")
+
+
+def test_fixed_batch_first_pass_sets_the_batch_size(folders):
+    full = FakeSession("batch", 640, 0.5)
+    first = FakeSession(2, 320, 0.9)
+    summary = yolo.process_images(None, *folders, batch_size=1, session=full, cascade=Cascade(first))
+
+    assert summary["first_pass"] == 3 and summary["second_pass"] == 0
+    assert first.shapes == [(2, 3, 320, 320)] * 2
+    assert sorted(os.listdir(folders[1])) == ["0.jpg", "1.jpg", "2.jpg"]
+
+
+def test_uncertain_images_go_through_the_full_model(folders):
+    full = FakeSession("batch", 640, 0.1)
+    first = FakeSession("batch", 320, 0.5)
+    summary = yolo.process_images(None, *folders, batch_size=2, session=full, cascade=Cascade(first))
+
+    assert summary["second_pass"] == 3 and summary["without_tabs"] == 3
+    assert full.shapes == [(2, 3, 640, 640), (1, 3, 640, 640)]
+
+
+def test_conflicting_fixed_batch_sizes_are_rejected(folders):
+    with pytest.raises(ValueError, match="fixed batch size"):
+        yolo.process_images(None, *folders, session=FakeSession(4, 640, 0.5), cascade=Cascade(FakeSession(2, 320, 0.9)))
+
+
+def test_reclassify_leaves_first_pass_decisions_outside_the_bands(tmp_path):
+    with_tabs, without_tabs = tmp_path / "with_tabs", tmp_path / "without_tabs"
+    with_tabs.mkdir()
+    without_tabs.mkdir()
+    store = DetectionStore(tmp_path / "detections.db")
+    for file_name, score, model_hash in (("first.jpg", 0.9, f"model{FIRST_PASS_SUFFIX}"), ("full.jpg", 0.6, "model")):
+        (with_tabs / file_name).write_bytes(b"")
+        store.record(file_name, "with_tabs", {"boxes": np.zeros((1, 4)), "scores": np.array([score])},
+                     "hash", model_hash, 0.51)
+
+    summary = reclassify(store, 0.7, str(with_tabs), str(without_tabs), low=0.2, high=0.8)
+    assert summary["to_without_tabs"] == 1 and summary["first_pass_skipped"] == []
+    assert os.listdir(without_tabs) == ["full.jpg"]
+
+    summary = reclassify(store, 0.95, str(with_tabs), str(without_tabs), low=0.2, high=0.8)
+    assert summary["first_pass_skipped"] == ["first.jpg"]
+    assert os.listdir(with_tabs) == ["first.jpg"]
@@ -0,0 +1,83 @@
+import pytest
+from catalog import SORT_COLUMNS, Catalog, encode_cursor
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.db")
+    for i in range(53):
+        # Repeated scores and dates, and some NULL scores, so the file_name tie-breaker matters
+        score = None if i % 10 == 0 else (i % 7) / 10
+        label = "with_tabs" if i % 3 else "without_tabs"
+        catalog.add(f"img_{i:03d}.jpg", label, score, f"2026-01-{i % 5 + 1:02d}T00:00:00")
+    yield catalog
+    catalog.conn.close()
+
+
+def walk(catalog, **kwargs):
+    rows, cursor = catalog.page(limit=7, **kwargs)
+    pages = [rows]
+    while cursor:
+        rows, cursor = catalog.page(limit=7, cursor=cursor, **kwargs)
+        pages.append(rows)
+    return pages
+
+
+def expected_order(rows, sort, order):
+    def key(row):
+        value = {"file_name": row[0], "max_score": -1 if row[2] is None else row[2], "download_date": row[3]}[sort]
+        return value, row[0]
+    return sorted(rows, key=key, reverse=order == "desc")
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", SORT_COLUMNS)
+def test_cursor_pages_cover_every_row_once_in_order(catalog, sort, order):
+    everything, _ = catalog.page(label="all", sort=sort, order=order, limit=1000)
+    pages = walk(catalog, label="all", sort=sort, order=order)
+
+    assert all(len(rows) == 7 for rows in pages[:-1])
+    rows = [row for page in pages for row in page]
+    assert rows == everything
+    assert rows == expected_order(everything, sort, order)
+    assert len({row[0] for row in rows}) == 53
+
+
+def test_cursor_pages_keep_filters(catalog):
+    rows = [row for page in walk(catalog, label="with_tabs", sort="max_score", min_score=0.2) for row in page]
+    assert rows
+    assert all(row[1] == "with_tabs" and row[2] >= 0.2 for row in rows)
+    assert len(rows) == sum(1 for i in range(53) if i % 3 and i % 10 and (i % 7) / 10 >= 0.2)
+
+
+def test_last_page_has_no_cursor(catalog):
+    rows, cursor = catalog.page(label="all", limit=53)
+    assert len(rows) == 53 and cursor is None
+
+
+def test_invalid_sort_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.page(sort="updated")
+    with pytest.raises(ValueError):
+        catalog.page(order="sideways")
+
+
+def test_add_keeps_existing_thumbnail(catalog):
+    catalog.set_thumbnail("img_001.jpg", "thumb.jpg")
+    version = catalog.version()
+    catalog.add("img_001.jpg", "with_tabs", 0.9)
+    assert catalog.get("img_001.jpg") == ("with_tabs", 0.9, "thumb.jpg")
+    assert catalog.version() > version
+
+
+def test_limit_below_one_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.page(limit=0)
+
+
+@pytest.mark.parametrize("values", [5, "abc", [1], [1, 2, 3], {"a": 1}, [0.5, 7], [{"a": 1}, "x.jpg"]])
+def test_malformed_cursor_is_rejected(catalog, values):
+    with pytest.raises(ValueError):
+        catalog.page(cursor=encode_cursor(values))
+    with pytest.raises(ValueError):
+        catalog.page(cursor="not a cursor!")
@@ -0,0 +1,84 @@
+import sqlite3
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+from dedup import BANDS, DedupIndex, dhash, hamming
+from image_store import ImageStore
+
+
+def flip_bits(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(tmp_path / "images.db", commit_every=1000)
+    yield store
+    store.close()
+
+
+def test_dhash_is_robust_to_small_changes():
+    x = np.linspace(0, 255, 64)
+    image = np.clip(np.add.outer(x, x[::-1] * 0.5), 0, 255).astype(np.uint8)
+    image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    brighter = cv2.convertScaleAbs(image, alpha=1.0, beta=10)
+    resized = cv2.resize(image, (200, 180))
+
+    assert hamming(dhash(image), dhash(brighter)) <= 3
+    assert hamming(dhash(image), dhash(resized)) <= 3
+    assert hamming(dhash(image), dhash(image[:, ::-1])) > 3
+    assert 0 <= dhash(image) < 1 << 64
+
+
+def test_find_exact_and_near_matches(store):
+    index = DedupIndex(store)
+    original = 0xF0F0_1234_ABCD_8001  # High bit set: stored as a negative SQLite integer
+    index.add("a_1", "sha-a", original)
+
+    assert index.find("sha-a", None)["distance"] == 0
+    # Three flipped bits, one in each of three bands: still shares a band with the original
+    match = index.find("sha-b", flip_bits(original, 0, 20, 63))
+    assert match["image_key"] == "a_1" and match["distance"] == 3
+    assert index.find("sha-b", flip_bits(original, 0, 20, 40, 63)) is None
+    assert index.find("sha-b", None) is None
+
+
+def test_max_distance_is_bounded_by_the_bands(store):
+    index = DedupIndex(store, max_distance=1)
+    index.add("a_1", "sha-a", 0)
+    assert index.find("sha-b", flip_bits(0, 5))["distance"] == 1
+    assert index.find("sha-b", flip_bits(0, 5, 6)) is None
+    with pytest.raises(ValueError):
+        DedupIndex(store, max_distance=BANDS)
+
+
+def test_match_or_add_links_copies_to_the_first_image(store):
+    index = DedupIndex(store)
+    assert index.match_or_add("a_1", "sha-a", 12345) is None
+    assert index.match_or_add("b_1", "sha-b", flip_bits(12345, 2))["image_key"] == "a_1"
+    index.set_label("a_1", "with_tabs", 0.9)
+
+    assert index.canonical("b_1") == "a_1"
+    assert index.canonical("a_1") == "a_1"
+    assert index.label_for("b_1") == ("with_tabs", pytest.approx(0.9))
+    assert index.label_for("unknown") == (None, None)
+
+
+def test_index_writes_while_the_store_holds_a_batch_open(store):
+    index = DedupIndex(store)
+    store.add("a_1", "a", 1, "https://example.com/a.jpg", "2026-01-01")  # Uncommitted: the batch stays open
+
+    # A second connection to the same file must not have to wait for that batch
+    other = sqlite3.connect(str(store.db_path), timeout=0)
+    index.match_or_add("a_1", "sha-a", 12345)
+    index.match_or_add("b_1", "sha-a", 12345)
+    store.commit()
+
+    assert other.execute("SELECT COUNT(*) FROM image_hashes").fetchone()[0] == 1
+    assert other.execute("SELECT canonical_key FROM image_links WHERE image_key = 'b_1'").fetchone() == ("a_1",)
+    other.execute("INSERT INTO image_links VALUES ('c_1', 'a_1', 0)")
+    other.commit()
+    other.close()
@@ -0,0 +1,223 @@
+import os
+from urllib.parse import parse_qsl, urlsplit
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+from scripts import load_script
+from detection_store import DetectionStore
+
+ebay = load_script('ebay_main', 'ebay/main.py')
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=b""):
+        self.status_code = status_code
+        self.payload = payload
+        self.content = content
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Answers GETs from a {url: FakeResponse or callable(url, params)} table and records every call."""
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.calls = []
+        self.headers = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.calls.append((url, params))
+        self.headers.append((headers or {}).get("Authorization"))
+        route = self.routes.get(url.split("?")[0])
+        if route is None:
+            return FakeResponse(404, {"errors": ["not found"]})
+        return route(url, params) if callable(route) else route
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        return FakeResponse(200, {"access_token": "token", "expires_in": 7200})
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setenv("EBAY_REQUESTS_PER_SECOND", "100000")
+    monkeypatch.setenv("EBAY_API_BASE", "https://ebay.test")
+    api = ebay.EbayBrowseAPI(root_dir=tmp_path)
+    api.session = FakeSession()
+    api.tokens.session = api.session
+    yield api
+    api.downloaded_images.close()
+
+
+def jpeg(width, height):
+    image = np.random.default_rng(width).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def test_fetch_tab_originals_leaves_hardlinked_duplicates_alone(api, tmp_path):
+    with_tabs = api.images_dir / "with_tabs"
+    with_tabs.mkdir()
+    (with_tabs / "1_0.jpg").write_bytes(jpeg(320, 240))
+    os.link(with_tabs / "1_0.jpg", with_tabs / "2_0.jpg")  # As place_duplicate links a copy
+    store = DetectionStore(tmp_path / "detections.db")
+    for item_id in ("1", "2"):
+        api.downloaded_images.add(f"{item_id}_0", item_id, 0, f"https://i.test/{item_id}/s-l1600.jpg",
+                                  "2026-01-01", f"{item_id}_0.jpg", full_size=False)
+        api.catalog.add(f"{item_id}_0.jpg", "with_tabs", 0.9)
+        detections = {"boxes": np.array([[10, 20, 30, 40.0]]), "scores": np.array([0.9])}
+        store.record(f"{item_id}_0.jpg", "with_tabs", detections, "hash", "model", 0.51)
+    store.commit()
+    api.session.routes["https://i.test/1/s-l1600.jpg"] = FakeResponse(content=jpeg(640, 480))
+
+    assert api.fetch_tab_originals() == 1
+    assert cv2.imread(str(with_tabs / "1_0.jpg")).shape[:2] == (480, 640)
+    assert cv2.imread(str(with_tabs / "2_0.jpg")).shape[:2] == (240, 320)
+    assert store.get("1_0.jpg")["boxes"][0][:4] == [20, 40, 60, 80]
+    assert store.get("2_0.jpg")["boxes"][0][:4] == [10, 20, 30, 40]
+    assert [name for name in os.listdir(with_tabs) if name.endswith(".tmp")] == []
+
+
+class FakeSearch:
+    """Newest-first Browse API search over a list of listings, paged with offset and a `next` link."""
+
+    def __init__(self, url):
+        self.url = url
+        self.listings = []
+
+    def list(self, *days):
+        self.listings += [{"itemId": f"v1|{day}|0", "itemCreationDate": f"2026-01-{day:02d}T00:00:00.000Z"}
+                          for day in days]
+
+    def __call__(self, url, params):
+        if params is None:
+            params = dict(parse_qsl(urlsplit(url).query))
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 200))
+        listings = sorted(self.listings, key=lambda item: item["itemCreationDate"], reverse=True)
+        page = {"itemSummaries": listings[offset:offset + limit], "offset": offset, "limit": limit,
+                "total": len(listings)}
+        if offset + limit < len(listings):
+            page["next"] = f"{self.url}?offset={offset + limit}&limit={limit}"
+        return FakeResponse(200, page)
+
+
+@pytest.fixture
+def search(api):
+    search = FakeSearch(f"{api.api_base}/buy/browse/v1/item_summary/search")
+    api.session.routes[search.url] = search
+    return search
+
+
+def crawl(api, max_items=None):
+    return sorted(int(item["itemId"].split("|")[1]) for item in api.iter_new_items("cans", max_items=max_items))
+
+
+def test_high_water_mark_advances_when_known_listings_are_reached(api, search):
+    search.list(1, 2, 3)
+    assert crawl(api) == [1, 2, 3]
+    assert crawl(api) == []
+    search.list(4, 5)
+    assert crawl(api, max_items=10) == [4, 5]
+    state = api.downloaded_images.get_crawl_state("q=cans|category=")
+    assert state["last_listing_time"].startswith("2026-01-05") and state["resume"] is None
+    assert crawl(api) == []
+
+
+def test_capped_runs_resume_the_gap_before_the_mark_advances(api, search):
+    search.list(1, 2)
+    assert crawl(api) == [1, 2]
+    search.list(*range(3, 11))
+    assert crawl(api, max_items=3) == [8, 9, 10]
+    state = api.downloaded_images.get_crawl_state("q=cans|category=")
+    assert state["last_listing_time"].startswith("2026-01-02")  # Not moved past the unread 3..7
+    search.list(11)
+    assert crawl(api, max_items=3) == [5, 6, 7]
+    assert crawl(api, max_items=3) == [3, 4]  # Reaches the known listings: the gap is closed
+    assert crawl(api, max_items=3) == [11]
+    assert crawl(api, max_items=3) == []
+
+
+def test_first_capped_crawl_sets_the_mark(api, search):
+    search.list(*range(1, 11))
+    assert crawl(api, max_items=4) == [7, 8, 9, 10]
+    assert crawl(api, max_items=4) == []
+
+
+def test_api_get_retries_a_401_with_a_new_token(api):
+    minted = []
+
+    def post(url, headers=None, data=None, timeout=None):
+        minted.append(url)
+        return FakeResponse(200, {"access_token": f"token-{len(minted)}", "expires_in": 7200})
+
+    def search(url, params):
+        if api.session.headers[-1] == "Bearer token-1":
+            return FakeResponse(401, {"errors": ["invalid token"]})
+        return FakeResponse(200, {"itemSummaries": []})
+
+    api.session.post = post
+    api.session.routes[f"{api.api_base}/buy/browse/v1/item_summary/search"] = search
+    assert api.search_items("cans") == {"itemSummaries": []}
+    assert api.session.headers == ["Bearer token-1", "Bearer token-2"]
+    assert len(minted) == 2
+
+
+@pytest.mark.parametrize("url, min_edge, expected", [
+    ("https://i.ebayimg.com/images/g/abc/s-l1600.jpg", 640, "https://i.ebayimg.com/images/g/abc/s-l640.jpg"),
+    ("https://i.ebayimg.com/images/g/abc/s-l1600.jpg", 600, "https://i.ebayimg.com/images/g/abc/s-l640.jpg"),
+    ("https://i.ebayimg.com/images/g/abc/s-l1600.webp", 1000, "https://i.ebayimg.com/images/g/abc/s-l1200.webp"),
+    ("https://i.ebayimg.com/images/g/abc/s-l500.jpg", 640, "https://i.ebayimg.com/images/g/abc/s-l500.jpg"),
+    ("https://i.ebayimg.com/images/g/abc/s-l1600.jpg", None, "https://i.ebayimg.com/images/g/abc/s-l1600.jpg"),
+    ("https://i.ebayimg.com/images/g/abc/photo.jpg", 640, "https://i.ebayimg.com/images/g/abc/photo.jpg"),
+])
+def test_sized_image_url(url, min_edge, expected):
+    assert ebay.sized_image_url(url, min_edge) == expected
+
+
+def test_sized_fetch_falls_back_to_the_original(api):
+    api.session.routes["https://i.test/a/s-l640.jpg"] = FakeResponse(content=b"small")
+    api.session.routes["https://i.test/b/s-l1600.jpg"] = FakeResponse(content=b"original")
+    assert api.fetch_sized_image("https://i.test/a/s-l1600.jpg") == (b"small", False)
+    assert api.fetch_sized_image("https://i.test/b/s-l1600.jpg") == (b"original", True)
+
+
+def summary(item_id, additional=True):
+    item = {"itemId": item_id, "image": {"imageUrl": f"https://i.test/{item_id}/0.jpg"}}
+    if additional:
+        item["additionalImages"] = [{"imageUrl": f"https://i.test/{item_id}/1.jpg"}]
+    return item
+
+
+def test_harvest_looks_up_only_incomplete_items_in_chunks(api):
+    lookups = []
+
+    def get_items(url, params):
+        ids = params["item_ids"].split(",")
+        lookups.append(ids)
+        return FakeResponse(200, {"items": [summary(item_id) for item_id in ids]})
+
+    api.session.routes[f"{api.api_base}/buy/browse/v1/item/"] = get_items
+    items = [summary(f"full{i}") for i in range(5)] + [{"itemId": f"bare{i}"} for i in range(45)]
+    tasks, stats = api.harvest_images(items)
+
+    assert sorted(len(ids) for ids in lookups) == [5, 20, 20]
+    assert sorted(item_id for ids in lookups for item_id in ids) == sorted(f"bare{i}" for i in range(45))
+    assert len(tasks) == 100
+    assert ("https://i.test/bare7/1.jpg", "bare7", 1) in tasks
+    assert stats == {"items": 50, "summary_only": 5, "looked_up": 45, "api_calls": 3, "calls_saved": 47}
+
+    _, stats = api.harvest_images([summary("partial", additional=False)], complete=True)
+    assert stats["looked_up"] == 1
+
+
+def test_bulk_lookup_falls_back_to_single_items(api):
+    api.session.routes[f"{api.api_base}/buy/browse/v1/item/"] = FakeResponse(404, {"errors": ["unsupported"]})
+    for item_id in ("a", "b"):
+        api.session.routes[f"{api.api_base}/buy/browse/v1/item/{item_id}"] = FakeResponse(200, summary(item_id))
+
+    items, calls = api.get_items(["a", "b"])
+    assert [item["itemId"] for item in items] == ["a", "b"]
+    assert calls == 3
@@ -0,0 +1,51 @@
+import json
+from image_store import ImageStore
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / "image_log.json"
+    legacy.write_text(json.dumps({
+        "v1|1234|0_0": {"image_url": "https://i.test/a.jpg", "download_date": "2026-01-01T10:00:00"},
+        "v1|1234|0_2": {"image_url": "https://i.test/b.jpg", "download_date": "2026-01-02T10:00:00"},
+        "5678_1": {"image_url": "https://i.test/a.jpg", "download_date": "2026-01-03T10:00:00"},
+    }))
+    store = ImageStore(tmp_path / "image_log.db", legacy_json=legacy)
+
+    assert len(store) == 3
+    assert "v1|1234|0_2" in store
+    assert store.get("5678_1") == {"image_url": "https://i.test/a.jpg", "download_date": "2026-01-03T10:00:00"}
+    rows = store.conn.execute("SELECT image_key, item_id, image_number FROM images ORDER BY image_key").fetchall()
+    assert rows == [("5678_1", "5678", 1), ("v1|1234|0_0", "v1|1234|0", 0), ("v1|1234|0_2", "v1|1234|0", 2)]
+    assert sorted(store.find_by_url("https://i.test/a.jpg")) == ["5678_1", "v1|1234|0_0"]
+    assert [key for key, _ in store.downloaded_between("2026-01-02", "2026-01-04")] == ["v1|1234|0_2", "5678_1"]
+    assert not legacy.exists() and (tmp_path / "image_log.json.migrated").exists()
+    store.close()
+
+    # Reopening finds nothing left to migrate and keeps the rows
+    store = ImageStore(tmp_path / "image_log.db", legacy_json=legacy)
+    assert len(store) == 3
+    store.close()
+
+
+def test_unreadable_legacy_json_is_left_in_place(tmp_path):
+    legacy = tmp_path / "image_log.json"
+    legacy.write_text('{"v1|1234|0_0": {"image_url"')  # Torn by a crash mid-rewrite
+    store = ImageStore(tmp_path / "image_log.db", legacy_json=legacy)
+    assert len(store) == 0
+    assert legacy.exists()
+    store.close()
+
+
+def test_batched_writes_and_crawl_state(tmp_path):
+    store = ImageStore(tmp_path / "image_log.db", commit_every=2)
+    store.add("1_0", "1", 0, "https://i.test/1.jpg", "2026-01-01", "1_0.jpg", full_size=False)
+    assert store.find_by_file_name("1_0.jpg") == {"image_key": "1_0", "image_url": "https://i.test/1.jpg",
+                                                  "full_size": False}
+    store.mark_full_size("1_0")
+    assert store.find_by_file_name("1_0.jpg")["full_size"] is True
+
+    store.set_crawl_state("q=cans|category=", "2026-01-01", ["a", "b"], "2026-01-02", {"before": "x"})
+    state = store.get_crawl_state("q=cans|category=")
+    assert state["last_item_ids"] == ["a", "b"] and state["resume"] == {"before": "x"}
+    assert store.get_crawl_state("other") is None
+    store.close()
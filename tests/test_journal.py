@@ -0,0 +1,46 @@
+import json
+from journal import SortJournal, read_journal
+
+
+def test_torn_last_line_is_skipped_and_not_glued_to_the_next_record(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = SortJournal(str(path))
+    run = journal.start(str(tmp_path), 0.51)
+    journal.record([("a.jpg", "with_tabs", 0.9, "in/a.jpg", "out/a.jpg")])
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"event": "decision", "run": "%s", "file": "b.j' % run)  # Crash mid-write
+
+    journal = SortJournal(str(path))
+    journal.resume(run)
+    journal.record([("c.jpg", "without_tabs", 0.1, "in/c.jpg", "out/c.jpg")])
+    journal.close()
+
+    events = [(record["event"], record.get("file")) for record in read_journal(str(path))]
+    assert events == [("start", None), ("decision", "a.jpg"), ("resume", None), ("decision", "c.jpg")]
+
+
+def test_unfinished_returns_the_open_run_with_its_decisions(tmp_path):
+    journal = SortJournal(str(tmp_path / "journal.jsonl"))
+    finished = journal.start(str(tmp_path), 0.51)
+    journal.end({})
+    run = journal.start(str(tmp_path), 0.51)
+    journal.record([("a.jpg", "with_tabs", 0.9, "in/a.jpg", "out/a.jpg")])
+
+    start, decisions = journal.unfinished(str(tmp_path))
+    assert start["run"] == run != finished
+    assert list(decisions) == ["a.jpg"]
+    assert journal.unfinished(str(tmp_path / "elsewhere")) == (None, {})
+    journal.close()
+
+
+def test_supersede_closes_open_runs(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = SortJournal(str(path))
+    run = journal.start(str(tmp_path), 0.51)
+
+    assert journal.supersede(str(tmp_path)) == [run]
+    assert journal.unfinished(str(tmp_path)) == (None, {})
+    assert journal.supersede(str(tmp_path)) == []
+    journal.close()
+    assert json.loads(path.read_text().splitlines()[-1])["event"] == "superseded"
@@ -0,0 +1,28 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+from letterbox import letterbox_image, letterbox_into, letterbox_params
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (640, 480), (640, 640), (333, 1001), (1200, 77), (10, 10)])
+def test_letterbox_into_is_bit_identical_to_the_reference(shape):
+    image = np.random.default_rng(sum(shape)).integers(0, 256, shape + (3,), dtype=np.uint8)
+    out = np.full((3, 640, 640), 7.0, dtype=np.float32)  # Stale values from a previous batch
+
+    params = letterbox_into(image, out)
+    padded, reference_params = letterbox_image(image)
+    reference = np.transpose(padded.astype(np.float32) / 255.0, (2, 0, 1))
+
+    assert params == reference_params == letterbox_params(image.shape)
+    assert out.dtype == np.float32
+    assert np.array_equal(out, reference)
+
+
+def test_swap_rb_writes_rgb_planes():
+    image = np.random.default_rng(1).integers(0, 256, (300, 500, 3), dtype=np.uint8)
+    bgr = np.empty((3, 320, 320), dtype=np.float32)
+    rgb = np.empty((3, 320, 320), dtype=np.float32)
+    letterbox_into(image, bgr)
+    letterbox_into(image, rgb, swap_rb=True)
+    assert np.array_equal(rgb, bgr[::-1])
@@ -0,0 +1,74 @@
+import pytest
+import metrics
+from metrics import StageTimers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def test_aggregates_per_stage(clock):
+    timers = StageTimers()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        clock[0] += seconds
+        timers.record("inference", seconds, count=8)
+    clock[0] += 0.05
+    timers.record("move", 0.05)
+
+    summary = timers.summary()
+    assert list(summary) == ["inference", "move"]
+    inference = summary["inference"]
+    assert (inference["calls"], inference["items"]) == (4, 32)
+    assert inference["seconds"] == inference["wall_seconds"] == 1.0
+    assert inference["items_per_sec"] == inference["items_per_busy_sec"] == 32.0
+    assert (inference["p50_ms"], inference["p99_ms"], inference["max_ms"]) == (300.0, 400.0, 400.0)
+    assert summary["move"]["calls"] == 1
+
+
+def test_overlapping_calls_report_wall_clock_throughput(clock):
+    timers = StageTimers()
+    clock[0] += 1.0
+    for _ in range(4):
+        timers.record("download", 1.0)  # Four downloads in flight over the same second
+
+    download = timers.summary()["download"]
+    assert download["seconds"] == 4.0 and download["wall_seconds"] == 1.0
+    assert download["items_per_sec"] == 4.0 and download["items_per_busy_sec"] == 1.0
+
+
+def test_percentiles_use_the_latest_window(clock):
+    timers = StageTimers(window=10)
+    for seconds in [5.0] * 10 + [0.001] * 10:
+        timers.record("search", seconds)
+    search = timers.summary()["search"]
+    assert search["calls"] == 20 and search["max_ms"] == 1.0
+
+
+def test_time_records_even_when_the_block_raises(clock):
+    timers = StageTimers()
+    with pytest.raises(RuntimeError):
+        with timers.time("decode", count=2):
+            clock[0] += 0.5
+            raise RuntimeError
+    assert timers.summary()["decode"]["items"] == 2
+    timers.reset()
+    assert timers.summary() == {}
+
+
+def test_metrics_endpoint_serves_and_resets_the_timers():
+    pytest.importorskip("flask")
+    pytest.importorskip("onnxruntime")
+    import app as server
+
+    client = server.app.test_client()
+    client.delete("/metrics")
+    client.get("/jobs")
+    summary = client.get("/metrics").get_json()
+    assert summary["http:list_jobs"]["calls"] == 1
+    assert set(summary["http:list_jobs"]) == {"calls", "items", "seconds", "wall_seconds", "items_per_sec",
+                                              "items_per_busy_sec", "p50_ms", "p99_ms", "max_ms"}
+    assert client.delete("/metrics").status_code == 204
+    assert "http:list_jobs" not in client.get("/metrics").get_json()
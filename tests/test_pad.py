@@ -0,0 +1,51 @@
+import json
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+from pad import MANIFEST_NAME, pad_directory
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "train"
+    (source / "nested").mkdir(parents=True)
+    cv2.imwrite(str(source / "wide.jpg"), np.full((100, 200, 3), 50, dtype=np.uint8))
+    cv2.imwrite(str(source / "nested" / "tall.png"), np.full((200, 100, 3), 90, dtype=np.uint8))
+    (source / "notes.txt").write_text("not an image")
+    return source
+
+
+def test_second_run_skips_files_in_the_manifest(source, tmp_path):
+    output = tmp_path / "640"
+    summary = pad_directory(str(source), str(output), (64, 64), workers=1)
+    assert summary == {"processed": 2, "skipped": 0, "failed": 0, "collisions": 0}
+    manifest = json.loads((output / MANIFEST_NAME).read_text())
+    assert manifest["wide.jpg"]["scale"] == pytest.approx(0.32)
+    assert manifest["wide.jpg"]["pad_top"] == 16
+    assert manifest["nested/tall.png"]["output"] == "nested/tall.jpg"
+    assert cv2.imread(str(output / "nested" / "tall.jpg")).shape == (64, 64, 3)
+
+    assert pad_directory(str(source), str(output), (64, 64), workers=1)["skipped"] == 2
+
+
+def test_changed_sources_and_sizes_are_redone(source, tmp_path):
+    output = tmp_path / "640"
+    pad_directory(str(source), str(output), (64, 64), workers=1)
+
+    cv2.imwrite(str(source / "wide.jpg"), np.full((100, 300, 3), 50, dtype=np.uint8))
+    summary = pad_directory(str(source), str(output), (64, 64), workers=1)
+    assert (summary["processed"], summary["skipped"]) == (1, 1)
+
+    os.remove(output / "nested" / "tall.jpg")
+    assert pad_directory(str(source), str(output), (64, 64), workers=1)["processed"] == 1
+    assert pad_directory(str(source), str(output), (32, 32), workers=1)["processed"] == 2
+
+
+def test_touched_but_unchanged_sources_are_skipped_with_hashes(source, tmp_path):
+    output = tmp_path / "640"
+    pad_directory(str(source), str(output), (64, 64), workers=1, with_hash=True)
+    os.utime(source / "wide.jpg", ns=(1, 1))
+    assert pad_directory(str(source), str(output), (64, 64), workers=1, with_hash=True)["skipped"] == 2
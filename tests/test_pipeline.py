@@ -0,0 +1,63 @@
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+import pipeline
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeSession:
+    """Serves image bytes from a {url: bytes} table; anything else is a 404."""
+
+    def __init__(self, images):
+        self.images = images
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if url not in self.images:
+            return FakeResponse(404)
+        return FakeResponse(200, self.images[url])
+
+
+@pytest.fixture
+def sorter(tmp_path, monkeypatch):
+    monkeypatch.setenv("EBAY_REQUESTS_PER_SECOND", "100000")
+    monkeypatch.setenv("EBAY_IMAGE_SIZE", "640")
+    monkeypatch.setattr(pipeline.yolo, "classify_image",
+                        lambda session, image: {"boxes": np.array([[1, 2, 3, 4.0]]), "scores": np.array([0.9])})
+    api = pipeline.ebay.EbayBrowseAPI(root_dir=tmp_path)
+    sorter = pipeline.StreamingSorter(api, None, str(tmp_path / "with_tabs"), originals_for_tabs=True, workers=1)
+    yield sorter
+    api.downloaded_images.close()
+
+
+def jpeg(width, height):
+    image = np.random.default_rng(width).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+REDUCED, ORIGINAL = jpeg(640, 480), jpeg(1280, 960)
+
+
+@pytest.mark.parametrize("original, kept", [(ORIGINAL, ORIGINAL), (b"not an image", REDUCED), (None, REDUCED)],
+                         ids=["original", "undecodable", "missing"])
+def test_tab_images_keep_the_reduced_copy_if_the_original_is_unreadable(sorter, tmp_path, original, kept):
+    images = {"https://i.test/a/s-l640.jpg": REDUCED}
+    if original is not None:
+        images["https://i.test/a/s-l1600.jpg"] = original
+    sorter.api.session = FakeSession(images)
+
+    sorter.process_image("https://i.test/a/s-l1600.jpg", "1", 0)
+    assert (tmp_path / "with_tabs" / "1_0.jpg").read_bytes() == kept
+    assert sorter.api.downloaded_images.find_by_file_name("1_0.jpg")["full_size"] == (kept is ORIGINAL)
+    thumb_name = sorter.api.thumbnails.thumbnail_name("1_0.jpg", kept)
+    assert os.path.exists(os.path.join(sorter.api.thumbnails.thumbs_dir, thumb_name))
+    assert sorter.stats["images"] == 1 and sorter.stats["failed"] == 0
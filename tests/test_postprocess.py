@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from postprocess import decode_detections, filter_detections, nms
+
+NO_LETTERBOX = (1.0, 0, 0, 640, 640)
+
+
+def raw_output(rows):
+    """
+    (4 + nc, anchors) model output from (cx, cy, w, h, *class_scores) rows, padded with
+    empty anchors: the layout is told apart by anchors outnumbering channels, as in real models.
+    """
+    rows = np.array(rows, dtype=np.float32)
+    return np.vstack([rows, np.zeros((32, rows.shape[1]), dtype=np.float32)]).T
+
+
+def test_nms_suppresses_overlaps_and_keeps_best_first():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60], [0, 0, 10, 10.5]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.7, 0.5], dtype=np.float32)
+    assert nms(boxes, scores, iou_threshold=0.45).tolist() == [1, 2]
+    assert nms(boxes, scores, iou_threshold=1.0).tolist() == [1, 2, 0, 3]
+    assert nms(boxes[:0], scores[:0]).tolist() == []
+
+
+def test_decode_filters_and_converts_to_xyxy():
+    output = raw_output([[100, 100, 20, 40, 0.9], [300, 300, 10, 10, 0.3]])
+    detections = decode_detections(output, NO_LETTERBOX, conf_threshold=0.5)
+    assert detections["boxes"].tolist() == [[90, 80, 110, 120]]
+    assert detections["scores"].tolist() == pytest.approx([0.9])
+    assert detections["class_ids"].tolist() == [0]
+    assert set(detections["timings"]) == {"decode_us", "nms_us", "unletterbox_us", "total_us"}
+
+
+def test_decode_accepts_batch_axis_and_anchor_major_layout():
+    output = raw_output([[100, 100, 20, 40, 0.9]])
+    expected = decode_detections(output, NO_LETTERBOX)["boxes"]
+    assert decode_detections(output[None], NO_LETTERBOX)["boxes"].tolist() == expected.tolist()
+    assert decode_detections(output.T, NO_LETTERBOX)["boxes"].tolist() == expected.tolist()
+
+
+def test_nms_is_class_aware():
+    output = raw_output([[100, 100, 20, 20, 0.9, 0.1], [101, 101, 20, 20, 0.1, 0.8], [102, 100, 20, 20, 0.7, 0.0]])
+    detections = decode_detections(output, NO_LETTERBOX, conf_threshold=0.5)
+    assert sorted(detections["class_ids"].tolist()) == [0, 1]
+    assert detections["scores"].tolist() == pytest.approx([0.9, 0.8])
+
+
+def test_decode_undoes_the_letterbox():
+    # A 1280x640 image letterboxed to 640x640: scale 0.5, 160 px of padding on top
+    letterbox = (0.5, 0, 160, 1280, 640)
+    output = raw_output([[320, 320, 100, 100, 0.9], [5, 165, 20, 20, 0.8]])
+    boxes = decode_detections(output, letterbox)["boxes"]
+    assert boxes.tolist() == [[540, 220, 740, 420], [0, 0, 30, 30]]  # The second box is clipped to the image
+
+
+def test_filter_matches_decoding_at_the_higher_threshold():
+    rng = np.random.default_rng(0)
+    rows = np.column_stack([rng.uniform(50, 590, (200, 2)), rng.uniform(10, 80, (200, 2)), rng.uniform(0, 1, (200, 2))])
+    output = raw_output(rows)
+    low = decode_detections(output, NO_LETTERBOX, conf_threshold=0.1)
+    high = decode_detections(output, NO_LETTERBOX, conf_threshold=0.6)
+    filtered = filter_detections(low, conf_threshold=0.6)
+    for key in ("boxes", "scores", "class_ids"):
+        assert np.array_equal(filtered[key], high[key])
@@ -0,0 +1,57 @@
+import sqlite3
+import pytest
+
+np = pytest.importorskip("numpy")
+from result_cache import ResultCache
+
+DETECTIONS = {"boxes": [[1, 2, 3, 4]], "scores": [0.75], "class_ids": [0]}
+
+
+@pytest.fixture
+def model(tmp_path):
+    path = tmp_path / "best.onnx"
+    path.write_bytes(b"model")
+    return path
+
+
+def test_round_trip_and_model_key(tmp_path, model):
+    cache = ResultCache(tmp_path / "cache.db", model)
+    cache.put("img", DETECTIONS)
+    hit = cache.get("img")
+    assert hit["boxes"].tolist() == [[1, 2, 3, 4]]
+    assert hit["scores"].tolist() == [0.75]
+    assert hit["class_ids"].tolist() == [0]
+    cache.close()
+
+    assert ResultCache(tmp_path / "cache.db", model, profile="int8").get("img") is None
+
+
+def test_read_only_reader_never_blocks_the_writer(tmp_path, model):
+    writer = ResultCache(tmp_path / "cache.db", model, commit_every=1)
+    writer.put("img", DETECTIONS)
+    writer.conn.execute("PRAGMA busy_timeout = 0")  # Fail at once instead of waiting on a lock
+
+    reader = ResultCache(tmp_path / "cache.db", model, read_only=True)
+    reader.conn.execute("BEGIN")
+    assert reader.get("img") is not None  # A hit in the reader's open transaction, as in a worker
+
+    writer.touch("img")
+    writer.put("other", DETECTIONS)
+    assert writer.evict() == 0
+    with pytest.raises(sqlite3.OperationalError):
+        reader.conn.execute("DELETE FROM results")
+    reader.conn.rollback()
+    assert reader.get("other") is not None
+    reader.close()
+    writer.close()
+
+
+def test_eviction_drops_least_recently_used(tmp_path, model):
+    cache = ResultCache(tmp_path / "cache.db", model, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, DETECTIONS)
+    cache.get("a")
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.close()
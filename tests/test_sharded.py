@@ -0,0 +1,33 @@
+import os
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+from catalog import Catalog
+from journal import SortJournal
+from sharded import finish_decisions
+
+
+def test_resumed_moves_are_completed_and_catalogued(tmp_path):
+    for folder in ("input", "with_tabs", "without_tabs"):
+        (tmp_path / folder).mkdir()
+    (tmp_path / "input" / "a.jpg").write_bytes(b"a")  # Journaled, never moved
+    (tmp_path / "with_tabs" / "b.jpg").write_bytes(b"b")  # Moved, but the catalog update was lost
+
+    journal = SortJournal(str(tmp_path / "journal.jsonl"))
+    journal.start(str(tmp_path / "input"), 0.51)
+    journal.record([
+        ("a.jpg", "without_tabs", 0.2, str(tmp_path / "input" / "a.jpg"), str(tmp_path / "without_tabs" / "a.jpg")),
+        ("b.jpg", "with_tabs", 0.8, str(tmp_path / "input" / "b.jpg"), str(tmp_path / "with_tabs" / "b.jpg")),
+    ])
+    _, decided = journal.unfinished(str(tmp_path / "input"))
+    journal.close()
+
+    catalog = Catalog(tmp_path / "catalog.db")
+    catalog.add("a.jpg")
+    catalog.add("b.jpg")
+    assert finish_decisions(decided, catalog) == 1
+    assert os.listdir(tmp_path / "input") == []
+    assert catalog.get("a.jpg")[:2] == ("without_tabs", pytest.approx(0.2))
+    assert catalog.get("b.jpg")[:2] == ("with_tabs", pytest.approx(0.8))
+    assert finish_decisions(decided) == 0
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+from letterbox import letterbox_image
+from shards import ShardReader, write_shards
+
+
+@pytest.fixture
+def pairs(tmp_path):
+    pairs = []
+    for i, shape in enumerate([(100, 200), (200, 100), (64, 64), (30, 90), (90, 30)]):
+        image = np.random.default_rng(i).integers(0, 256, shape + (3,), dtype=np.uint8)
+        image_path, label_path = tmp_path / f"{i}.png", tmp_path / f"{i}.txt"
+        cv2.imwrite(str(image_path), image)
+        label_path.write_text("0 0.5 0.5 0.5 0.25\n" if i % 2 else "")
+        pairs.append((f"{i}.png", str(image_path), str(label_path)))
+    return pairs
+
+
+def test_round_trip_through_shards(pairs, tmp_path):
+    out = str(tmp_path / "shards")
+    assert write_shards(pairs, out, target_size=(64, 64), shard_size=2) == 5
+    reader = ShardReader(out)
+    assert len(reader) == 5 and len(reader.shards) == 3
+
+    for (file_name, image_path, _), (read_name, image, labels) in zip(pairs, reader):
+        expected, (scale, pad_left, pad_top, original_w, original_h) = letterbox_image(cv2.imread(image_path), (64, 64))
+        assert read_name == file_name
+        assert np.array_equal(image, expected)
+        if labels:
+            # The box is re-normalized to the padded frame: same centre pixel, scaled size
+            class_id, cx, cy, w, h = labels[0]
+            assert class_id == 0
+            assert cx * 64 == pytest.approx(original_w * 0.5 * scale + pad_left)
+            assert h * 64 == pytest.approx(original_h * 0.25 * scale)
+
+    batches = list(reader.batches(4))
+    assert [len(entries) for entries, _ in batches] == [2, 2, 1]
+    assert batches[0][1].shape == (2, 64, 64, 3)
+
+
+def test_unchanged_split_is_not_rewritten(pairs, tmp_path):
+    out = str(tmp_path / "shards")
+    write_shards(pairs, out, target_size=(64, 64))
+    assert write_shards(pairs, out, target_size=(64, 64)) == 0
+    assert write_shards(pairs[:3], out, target_size=(64, 64)) == 3
+    assert len(ShardReader(out)) == 3
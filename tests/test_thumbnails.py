@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+from catalog import Catalog
+from thumbnails import ThumbnailGenerator
+
+
+@pytest.fixture
+def generator(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.db")
+    generator = ThumbnailGenerator(str(tmp_path / "images"), str(tmp_path / "thumbs"), catalog, size=64)
+    yield generator
+    catalog.conn.close()
+
+
+def test_concurrent_writers_leave_one_complete_thumbnail(generator):
+    image = np.random.default_rng(0).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+    content = cv2.imencode(".jpg", image)[1].tobytes()
+    generator.catalog.add("a.jpg")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        names = set(executor.map(lambda _: generator.from_image(image, "a.jpg", content), range(32)))
+
+    assert len(names) == 1
+    assert os.listdir(generator.thumbs_dir) == list(names)
+    thumbnail = cv2.imread(os.path.join(generator.thumbs_dir, names.pop()))
+    assert thumbnail.shape[:2] == (48, 64)
+    assert generator.catalog.get("a.jpg")[2].endswith(".webp")
+
+
+def test_name_changes_with_settings(generator):
+    name = generator.thumbnail_name("a.jpg", b"bytes")
+    generator.quality = 50
+    assert generator.thumbnail_name("a.jpg", b"bytes") != name
+    assert name.startswith("a.") and name.endswith(".webp")
@@ -0,0 +1,56 @@
+from token_cache import TokenManager
+
+
+class FakeTokenEndpoint:
+    """Mints token-1, token-2, ... and counts the calls."""
+
+    def __init__(self):
+        self.minted = 0
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        self.minted += 1
+        return FakeResponse({"access_token": f"token-{self.minted}", "expires_in": 7200})
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+def manager(tmp_path, endpoint):
+    return TokenManager("app", "cert", tmp_path / "token.json", endpoint)
+
+
+def test_token_is_cached_across_processes(tmp_path):
+    endpoint = FakeTokenEndpoint()
+    assert manager(tmp_path, endpoint).get_token() == "token-1"
+    assert manager(tmp_path, endpoint).get_token() == "token-1"
+    assert endpoint.minted == 1
+
+
+def test_401_replaces_only_the_rejected_token(tmp_path):
+    endpoint = FakeTokenEndpoint()
+    first, second = manager(tmp_path, endpoint), manager(tmp_path, endpoint)  # Two processes
+    assert first.get_token() == second.get_token() == "token-1"
+
+    first.invalidate("token-1")
+    assert first.get_token() == "token-2"
+    # The other process gets the same 401: it picks up the newer token instead of minting a third
+    second.invalidate("token-1")
+    assert second.get_token() == "token-2"
+    assert endpoint.minted == 2
+
+    # A 401 for a token that was already replaced leaves the current one alone
+    first.invalidate("token-1")
+    assert first.get_token() == "token-2"
+    assert endpoint.minted == 2
+
+
+def test_force_refresh_never_reloads_the_same_token(tmp_path):
+    endpoint = FakeTokenEndpoint()
+    tokens = manager(tmp_path, endpoint)
+    tokens.get_token()
+    assert tokens.get_token(force_refresh=True) == "token-2"
@@ -19,6 +19,7 @@ metrics = model.val()
 results = model("data/images/test/", save=True)  # Save results to 'runs/detect/exp'
 
 # Export the model to ONNX format for interoperability
-path = model.export(format="onnx")
+# dynamic=True keeps the batch axis open so App/yolo/main.py can run --batch-size > 1
+path = model.export(format="onnx", dynamic=True)
 print(f"Model exported to {path}")
 